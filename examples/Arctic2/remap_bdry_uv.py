@@ -181,133 +181,108 @@ def remap_bdry_uv(src_file, src_grd, dst_grd, dmax=0, cdepth=0, kk=0, dst_dir='.
     src_vz = pyroms_toolbox.BGrid_SODA.flood(src_varv, src_grd, Bpos='uv', \
                 spval=spval, dmax=dmax, cdepth=cdepth, kk=kk)
 
-    # horizontal interpolation using scrip weights
+    # horizontal interpolation using scrip weights, only to the
+    # boundary strips and the next row/column (u,v points)
     print('horizontal interpolation using scrip weights')
-    dst_uz = pyroms.remapping.remap(src_uz, wts_file, \
-                                      spval=spval)
-    dst_vz = pyroms.remapping.remap(src_vz, wts_file, \
-                                      spval=spval)
+    dst_uz_north = pyroms.remapping.remap(src_uz, \
+            pyroms.remapping.get_remap_operator(wts_file, \
+            jrange=(Mp-2,Mp), irange=(0,Lp)), spval=spval)
+    dst_uz_south = pyroms.remapping.remap(src_uz, \
+            pyroms.remapping.get_remap_operator(wts_file, \
+            jrange=(0,2), irange=(0,Lp)), spval=spval)
+    dst_uz_east = pyroms.remapping.remap(src_uz, \
+            pyroms.remapping.get_remap_operator(wts_file, \
+            jrange=(0,Mp), irange=(Lp-2,Lp)), spval=spval)
+    dst_uz_west = pyroms.remapping.remap(src_uz, \
+            pyroms.remapping.get_remap_operator(wts_file, \
+            jrange=(0,Mp), irange=(0,2)), spval=spval)
+    dst_vz_north = pyroms.remapping.remap(src_vz, \
+            pyroms.remapping.get_remap_operator(wts_file, \
+            jrange=(Mp-2,Mp), irange=(0,Lp)), spval=spval)
+    dst_vz_south = pyroms.remapping.remap(src_vz, \
+            pyroms.remapping.get_remap_operator(wts_file, \
+            jrange=(0,2), irange=(0,Lp)), spval=spval)
+    dst_vz_east = pyroms.remapping.remap(src_vz, \
+            pyroms.remapping.get_remap_operator(wts_file, \
+            jrange=(0,Mp), irange=(Lp-2,Lp)), spval=spval)
+    dst_vz_west = pyroms.remapping.remap(src_vz, \
+            pyroms.remapping.get_remap_operator(wts_file, \
+            jrange=(0,Mp), irange=(0,2)), spval=spval)
 
     # vertical interpolation from standard z level to sigma
     print('vertical interpolation from standard z level to sigma')
-    dst_u_north = pyroms.remapping.z2roms(dst_uz[::-1, Mp-2:Mp, 0:Lp], \
+    dst_u_north = pyroms.remapping.z2roms(dst_uz_north[::-1], \
                       dst_grdz, dst_grd, Cpos='rho', spval=spval, \
                       flood=False, irange=(0,Lp), jrange=(Mp-2,Mp))
-    dst_u_south = pyroms.remapping.z2roms(dst_uz[::-1, 0:2, 0:Lp], \
+    dst_u_south = pyroms.remapping.z2roms(dst_uz_south[::-1], \
                       dst_grdz, dst_grd, Cpos='rho', spval=spval, \
                       flood=False, irange=(0,Lp), jrange=(0,2))
-    dst_u_east = pyroms.remapping.z2roms(dst_uz[::-1, 0:Mp, Lp-2:Lp], \
+    dst_u_east = pyroms.remapping.z2roms(dst_uz_east[::-1], \
                       dst_grdz, dst_grd, Cpos='rho', spval=spval, \
                       flood=False, irange=(Lp-2,Lp), jrange=(0,Mp))
-    dst_u_west = pyroms.remapping.z2roms(dst_uz[::-1, 0:Mp, 0:2], \
+    dst_u_west = pyroms.remapping.z2roms(dst_uz_west[::-1], \
                       dst_grdz, dst_grd, Cpos='rho', spval=spval, \
                       flood=False, irange=(0,2), jrange=(0,Mp))
 
-    dst_v_north = pyroms.remapping.z2roms(dst_vz[::-1, Mp-2:Mp, 0:Lp], \
+    dst_v_north = pyroms.remapping.z2roms(dst_vz_north[::-1], \
                       dst_grdz, dst_grd, Cpos='rho', spval=spval, \
                       flood=False, irange=(0,Lp), jrange=(Mp-2,Mp))
-    dst_v_south = pyroms.remapping.z2roms(dst_vz[::-1, 0:2, 0:Lp], \
+    dst_v_south = pyroms.remapping.z2roms(dst_vz_south[::-1], \
                       dst_grdz, dst_grd, Cpos='rho', spval=spval, \
                       flood=False, irange=(0,Lp), jrange=(0,2))
-    dst_v_east = pyroms.remapping.z2roms(dst_vz[::-1, 0:Mp, Lp-2:Lp], \
+    dst_v_east = pyroms.remapping.z2roms(dst_vz_east[::-1], \
                       dst_grdz, dst_grd, Cpos='rho', spval=spval, \
                       flood=False, irange=(Lp-2,Lp), jrange=(0,Mp))
-    dst_v_west = pyroms.remapping.z2roms(dst_vz[::-1, 0:Mp, 0:2], \
+    dst_v_west = pyroms.remapping.z2roms(dst_vz_west[::-1], \
                       dst_grdz, dst_grd, Cpos='rho', spval=spval, \
                       flood=False, irange=(0,2), jrange=(0,Mp))
 
 
-    # rotate u,v fields
+    # rotate u,v fields and move back to u,v points, on the 2 points
+    # wide boundary strips
     src_angle = np.zeros(dst_grd.hgrid.angle_rho.shape)
     dst_angle = dst_grd.hgrid.angle_rho
     angle = dst_angle - src_angle
-    angle = np.tile(angle, (dst_grd.vgrid.N, 1, 1))
-    U_north = dst_u_north + dst_v_north*1j
-    eitheta_north = np.exp(-1j*angle[:,Mp-2:Mp, 0:Lp])
-    U_north = U_north * eitheta_north
-    dst_u_north = np.real(U_north)
-    dst_v_north = np.imag(U_north)
-
-    U_south = dst_u_south + dst_v_south*1j
-    eitheta_south = np.exp(-1j*angle[:,0:2, 0:Lp])
-    U_south = U_south * eitheta_south
-    dst_u_south = np.real(U_south)
-    dst_v_south = np.imag(U_south)
-
-    U_east = dst_u_east + dst_v_east*1j
-    eitheta_east = np.exp(-1j*angle[:,0:Mp, Lp-2:Lp])
-    U_east = U_east * eitheta_east
-    dst_u_east = np.real(U_east)
-    dst_v_east = np.imag(U_east)
-
-    U_west = dst_u_west + dst_v_west*1j
-    eitheta_west = np.exp(-1j*angle[:,0:Mp, 0:2])
-    U_west = U_west * eitheta_west
-    dst_u_west = np.real(U_west)
-    dst_v_west = np.imag(U_west)
-
-
-    # move back to u,v points
-    dst_u_north = 0.5 * np.squeeze(dst_u_north[:,-1,:-1] + dst_u_north[:,-1,1:])
-    dst_v_north = 0.5 * np.squeeze(dst_v_north[:,:-1,:] + dst_v_north[:,1:,:])
-    dst_u_south = 0.5 * np.squeeze(dst_u_south[:,0,:-1] + dst_u_south[:,0,1:])
-    dst_v_south = 0.5 * np.squeeze(dst_v_south[:,:-1,:] + dst_v_south[:,1:,:])
-    dst_u_east = 0.5 * np.squeeze(dst_u_east[:,:,:-1] + dst_u_east[:,:,1:])
-    dst_v_east = 0.5 * np.squeeze(dst_v_east[:,:-1,-1] + dst_v_east[:,1:,-1])
-    dst_u_west = 0.5 * np.squeeze(dst_u_west[:,:,:-1] + dst_u_west[:,:,1:])
-    dst_v_west = 0.5 * np.squeeze(dst_v_west[:,:-1,0] + dst_v_west[:,1:,0])
-
-    # spval
-    idxu_north = np.where(dst_grd.hgrid.mask_u[-1,:] == 0)
-    idxv_north = np.where(dst_grd.hgrid.mask_v[-1,:] == 0)
-    idxu_south = np.where(dst_grd.hgrid.mask_u[0,:] == 0)
-    idxv_south = np.where(dst_grd.hgrid.mask_v[0,:] == 0)
-    idxu_east = np.where(dst_grd.hgrid.mask_u[:,-1] == 0)
-    idxv_east = np.where(dst_grd.hgrid.mask_v[:,-1] == 0)
-    idxu_west = np.where(dst_grd.hgrid.mask_u[:,0] == 0)
-    idxv_west = np.where(dst_grd.hgrid.mask_v[:,0] == 0)
-    for n in range(dst_grd.vgrid.N):
-        dst_u_north[n, idxu_north[0]] = spval
-        dst_v_north[n, idxv_north[0]] = spval
-        dst_u_south[n, idxu_south[0]] = spval
-        dst_v_south[n, idxv_south[0]] = spval
-        dst_u_east[n, idxu_east[0]] = spval
-        dst_v_east[n, idxv_east[0]] = spval
-        dst_u_west[n, idxu_west[0]] = spval
-        dst_v_west[n, idxv_west[0]] = spval
+    uvt_north = pyroms.remapping.UVTransform(dst_grd, angle[Mp-2:Mp, 0:Lp], \
+                  irange=(0,Lp), jrange=(Mp-2,Mp))
+    dst_u_north, dst_v_north = uvt_north(dst_u_north, dst_v_north, spval=spval)
+    uvt_south = pyroms.remapping.UVTransform(dst_grd, angle[0:2, 0:Lp], \
+                  irange=(0,Lp), jrange=(0,2))
+    dst_u_south, dst_v_south = uvt_south(dst_u_south, dst_v_south, spval=spval)
+    uvt_east = pyroms.remapping.UVTransform(dst_grd, angle[0:Mp, Lp-2:Lp], \
+                  irange=(Lp-2,Lp), jrange=(0,Mp))
+    dst_u_east, dst_v_east = uvt_east(dst_u_east, dst_v_east, spval=spval)
+    uvt_west = pyroms.remapping.UVTransform(dst_grd, angle[0:Mp, 0:2], \
+                  irange=(0,2), jrange=(0,Mp))
+    dst_u_west, dst_v_west = uvt_west(dst_u_west, dst_v_west, spval=spval)
 
     # compute depth average velocity ubar and vbar
-    # get z at the right position
-    z_u_north = 0.5 * (dst_grd.vgrid.z_w[0,:,-1,:-1] + dst_grd.vgrid.z_w[0,:,-1,1:])
-    z_v_north = 0.5 * (dst_grd.vgrid.z_w[0,:,-1,:] + dst_grd.vgrid.z_w[0,:,-2,:])
-    z_u_south = 0.5 * (dst_grd.vgrid.z_w[0,:,0,:-1] + dst_grd.vgrid.z_w[0,:,0,1:])
-    z_v_south = 0.5 * (dst_grd.vgrid.z_w[0,:,0,:] + dst_grd.vgrid.z_w[0,:,1,:])
-    z_u_east = 0.5 * (dst_grd.vgrid.z_w[0,:,:,-1] + dst_grd.vgrid.z_w[0,:,:,-2])
-    z_v_east = 0.5 * (dst_grd.vgrid.z_w[0,:,:-1,-1] + dst_grd.vgrid.z_w[0,:,1:,-1])
-    z_u_west = 0.5 * (dst_grd.vgrid.z_w[0,:,:,0] + dst_grd.vgrid.z_w[0,:,:,1])
-    z_v_west = 0.5 * (dst_grd.vgrid.z_w[0,:,:-1,0] + dst_grd.vgrid.z_w[0,:,1:,0])
-
-    dst_ubar_north = np.zeros(dst_u_north.shape[1])
-    dst_ubar_south = np.zeros(dst_u_south.shape[1])
-    dst_ubar_east = np.zeros(dst_u_east.shape[1])
-    dst_ubar_west = np.zeros(dst_u_west.shape[1])
-    dst_vbar_north = np.zeros(dst_v_north.shape[1])
-    dst_vbar_south = np.zeros(dst_v_south.shape[1])
-    dst_vbar_east = np.zeros(dst_v_east.shape[1])
-    dst_vbar_west = np.zeros(dst_v_west.shape[1])
-
-    for i in range(dst_u_north.shape[1]):
-        dst_ubar_north[i] = (dst_u_north[:,i] * np.diff(z_u_north[:,i])).sum() / -z_u_north[0,i]
-        dst_ubar_south[i] = (dst_u_south[:,i] * np.diff(z_u_south[:,i])).sum() / -z_u_south[0,i]
-    for i in range(dst_v_north.shape[1]):
-        dst_vbar_north[i] = (dst_v_north[:,i] * np.diff(z_v_north[:,i])).sum() / -z_v_north[0,i]
-        dst_vbar_south[i] = (dst_v_south[:,i] * np.diff(z_v_south[:,i])).sum() / -z_v_south[0,i]
-    for j in range(dst_u_east.shape[1]):
-        dst_ubar_east[j] = (dst_u_east[:,j] * np.diff(z_u_east[:,j])).sum() / -z_u_east[0,j]
-        dst_ubar_west[j] = (dst_u_west[:,j] * np.diff(z_u_west[:,j])).sum() / -z_u_west[0,j]
-    for j in range(dst_v_east.shape[1]):
-        dst_vbar_east[j] = (dst_v_east[:,j] * np.diff(z_v_east[:,j])).sum() / -z_v_east[0,j]
-        dst_vbar_west[j] = (dst_v_west[:,j] * np.diff(z_v_west[:,j])).sum() / -z_v_west[0,j]
+    dst_ubar_north, dst_vbar_north = uvt_north.depth_average(dst_u_north, \
+                                     dst_v_north, spval=spval)
+    dst_ubar_south, dst_vbar_south = uvt_south.depth_average(dst_u_south, \
+                                     dst_v_south, spval=spval)
+    dst_ubar_east, dst_vbar_east = uvt_east.depth_average(dst_u_east, \
+                                     dst_v_east, spval=spval)
+    dst_ubar_west, dst_vbar_west = uvt_west.depth_average(dst_u_west, \
+                                     dst_v_west, spval=spval)
+
+    # boundary u,v points
+    dst_u_north = dst_u_north[:,-1,:]
+    dst_v_north = dst_v_north[:,0,:]
+    dst_ubar_north = dst_ubar_north[-1,:]
+    dst_vbar_north = dst_vbar_north[0,:]
+    dst_u_south = dst_u_south[:,0,:]
+    dst_v_south = dst_v_south[:,0,:]
+    dst_ubar_south = dst_ubar_south[0,:]
+    dst_vbar_south = dst_vbar_south[0,:]
+    dst_u_east = dst_u_east[:,:,0]
+    dst_v_east = dst_v_east[:,:,-1]
+    dst_ubar_east = dst_ubar_east[:,0]
+    dst_vbar_east = dst_vbar_east[:,-1]
+    dst_u_west = dst_u_west[:,:,0]
+    dst_v_west = dst_v_west[:,:,0]
+    dst_ubar_west = dst_ubar_west[:,0]
+    dst_vbar_west = dst_vbar_west[:,0]
 
     #mask
     dst_ubar_north = np.ma.masked_where(dst_grd.hgrid.mask_u[-1,:] == 0, dst_ubar_north)
@@ -142,49 +142,14 @@ def remap_clm_uv(src_file, src_grd, dst_grd, dmax=0, cdepth=0, kk=0, dst_dir='./
                         dst_grd, Cpos='rho', spval=spval, flood=False)
 
 
-    # rotate u,v fields
+    # rotate u,v fields and move back to u,v points
     src_angle = np.zeros(dst_grd.hgrid.angle_rho.shape)
     dst_angle = dst_grd.hgrid.angle_rho
-    angle = dst_angle - src_angle
-    angle = np.tile(angle, (dst_grd.vgrid.N, 1, 1))
-    U = dst_u + dst_v*1j
-    eitheta = np.exp(-1j*angle[:,:,:])
-    U = U * eitheta
-    dst_u = np.real(U)
-    dst_v = np.imag(U)
-
-
-    # move back to u,v points
-    dst_u = 0.5 * (dst_u[:,:,:-1] + dst_u[:,:,1:])
-    dst_v = 0.5 * (dst_v[:,:-1,:] + dst_v[:,1:,:])
-
-    # spval
-    idxu = np.where(dst_grd.hgrid.mask_u == 0)
-    idxv = np.where(dst_grd.hgrid.mask_v == 0)
-    for n in range(dst_grd.vgrid.N):
-        dst_u[n,idxu[0], idxu[1]] = spval
-        dst_v[n,idxv[0], idxv[1]] = spval
-
+    uvt = pyroms.remapping.UVTransform(dst_grd, dst_angle - src_angle)
+    dst_u, dst_v = uvt(dst_u, dst_v, spval=spval)
 
     # compute depth average velocity ubar and vbar
-    # get z at the right position
-    z_u = 0.5 * (dst_grd.vgrid.z_w[0,:,:,:-1] + dst_grd.vgrid.z_w[0,:,:,1:])
-    z_v = 0.5 * (dst_grd.vgrid.z_w[0,:,:-1,:] + dst_grd.vgrid.z_w[0,:,1:,:])
-
-    dst_ubar = np.zeros((dst_u.shape[1], dst_u.shape[2]))
-    dst_vbar = np.zeros((dst_v.shape[1], dst_v.shape[2]))
-
-    for i in range(dst_ubar.shape[1]):
-        for j in range(dst_ubar.shape[0]):
-            dst_ubar[j,i] = (dst_u[:,j,i] * np.diff(z_u[:,j,i])).sum() / -z_u[0,j,i]
-
-    for i in range(dst_vbar.shape[1]):
-        for j in range(dst_vbar.shape[0]):
-            dst_vbar[j,i] = (dst_v[:,j,i] * np.diff(z_v[:,j,i])).sum() / -z_v[0,j,i]
-
-    # spval
-    dst_ubar[idxu[0], idxu[1]] = spval
-    dst_vbar[idxv[0], idxv[1]] = spval
+    dst_ubar, dst_vbar = uvt.depth_average(dst_u, dst_v, spval=spval)
 
     # write data in destination file
     print('write data in destination file')
@@ -2,7 +2,6 @@ import matplotlib
 matplotlib.use('Agg')
 
 import subprocess
-import os
 import sys
 import numpy as np
 from multiprocessing import Pool
@@ -41,37 +40,21 @@ src_grd_file = data_dir + 'HYCOM_GLBy0.08_2018_345.nc'
 src_grd = pyroms_toolbox.Grid_HYCOM.get_nc_Grid_HYCOM2(src_grd_file)
 dst_grd = pyroms.grid.get_ROMS_grid('ARCTIC4')
 
-def do_file(file):
-    zeta = remap_bdry(file, 'ssh', src_grd, dst_grd, dst_dir=dst_dir)
-    dst_grd2 = pyroms.grid.get_ROMS_grid('ARCTIC4', zeta=zeta)
-    remap_bdry(file, 'temp', src_grd, dst_grd2, dst_dir=dst_dir)
-    remap_bdry(file, 'salt', src_grd, dst_grd2, dst_dir=dst_dir)
-#   pdb.set_trace()
-    remap_bdry_uv(file, src_grd, dst_grd2, dst_dir=dst_dir)
+class nctime(object):
+    long_name = 'time'
+    units = 'days since 1900-01-01 00:00:00'
 
-    # merge file
+def do_file(file):
+    # all the variables are written to the same boundary file
     bdry_file = dst_dir + file.rsplit('/')[-1][:-3] + '_bdry_' + dst_grd.name + '.nc'
-
-    out_file = dst_dir + file.rsplit('/')[-1][:-3] + '_ssh_bdry_' + dst_grd.name + '.nc'
-    command = ('ncks', '-a', '-O', out_file, bdry_file)
-    subprocess.check_call(command)
-    os.remove(out_file)
-    out_file = dst_dir + file.rsplit('/')[-1][:-3] + '_temp_bdry_' + dst_grd.name + '.nc'
-    command = ('ncks', '-a', '-A', out_file, bdry_file)
-    subprocess.check_call(command)
-    os.remove(out_file)
-    out_file = dst_dir + file.rsplit('/')[-1][:-3] + '_salt_bdry_' + dst_grd.name + '.nc'
-    command = ('ncks', '-a', '-A', out_file, bdry_file)
-    subprocess.check_call(command)
-    os.remove(out_file)
-    out_file = dst_dir + file.rsplit('/')[-1][:-3] + '_u_bdry_' + dst_grd.name + '.nc'
-    command = ('ncks', '-a', '-A', out_file, bdry_file)
-    subprocess.check_call(command)
-    os.remove(out_file)
-    out_file = dst_dir + file.rsplit('/')[-1][:-3] + '_v_bdry_' + dst_grd.name + '.nc'
-    command = ('ncks', '-a', '-A', out_file, bdry_file)
-    subprocess.check_call(command)
-    os.remove(out_file)
+    print('\nCreating boundary file', bdry_file)
+    with pyroms_toolbox.BdryWriter(bdry_file, dst_grd, nctime) as bdry:
+        zeta = remap_bdry(file, 'ssh', src_grd, dst_grd, dst_dir=dst_dir, nc=bdry)
+        dst_grd2 = pyroms.grid.get_ROMS_grid('ARCTIC4', zeta=zeta)
+        remap_bdry(file, 'temp', src_grd, dst_grd2, dst_dir=dst_dir, nc=bdry)
+        remap_bdry(file, 'salt', src_grd, dst_grd2, dst_dir=dst_dir, nc=bdry)
+#       pdb.set_trace()
+        remap_bdry_uv(file, src_grd, dst_grd2, dst_dir=dst_dir, nc=bdry)
 
 processes = 4
 p = Pool(processes)
@@ -19,7 +19,7 @@ from regrid_GLBy import regrid_GLBy
 class nctime(object):
     pass
 
-def remap_bdry(src_file, src_varname, src_grd, dst_grd, dxy=20, cdepth=0, kk=2, dst_dir='./'):
+def remap_bdry(src_file, src_varname, src_grd, dst_grd, dxy=20, cdepth=0, kk=2, dst_dir='./', nc=None):
 
     print(src_file)
 
@@ -27,16 +27,18 @@ def remap_bdry(src_file, src_varname, src_grd, dst_grd, dxy=20, cdepth=0, kk=2,
     nctime.long_name = 'time'
     nctime.units = 'days since 1900-01-01 00:00:00'
 
-    # create boundary file
-    dst_file = src_file.rsplit('/')[-1]
-    dst_file = dst_dir + dst_file[:-3] + '_' + src_varname + '_bdry_' + dst_grd.name + '.nc'
-    print('\nCreating boundary file', dst_file)
-    if os.path.exists(dst_file) is True:
-        os.remove(dst_file)
-    pyroms_toolbox.nc_create_roms_bdry_file(dst_file, dst_grd, nctime)
+    # create boundary file, unless writing to the shared one (BdryWriter)
+    close = nc is None
+    if nc is None:
+        dst_file = src_file.rsplit('/')[-1]
+        dst_file = dst_dir + dst_file[:-3] + '_' + src_varname + '_bdry_' + dst_grd.name + '.nc'
+        print('\nCreating boundary file', dst_file)
+        if os.path.exists(dst_file) is True:
+            os.remove(dst_file)
+        pyroms_toolbox.nc_create_roms_bdry_file(dst_file, dst_grd, nctime)
 
-    # open boundary file
-    nc = netCDF.Dataset(dst_file, 'a', format='NETCDF3_64BIT')
+        # open boundary file
+        nc = netCDF.Dataset(dst_file, 'a', format='NETCDF3_64BIT')
 
     #load var
     cdf = netCDF.Dataset(src_file)
@@ -209,7 +211,8 @@ def remap_bdry(src_file, src_varname, src_grd, dst_grd, dxy=20, cdepth=0, kk=2,
     nc.variables[dst_varname_west][0] = np.squeeze(dst_var_west)
 
     # close file
-    nc.close()
+    if close:
+        nc.close()
     cdf.close()
 
     if src_varname == 'ssh':
@@ -173,23 +173,35 @@ def remap_bdry(src_varname, src_file, src_grd, dst_grd, dst_file, dmax=0, cdepth
     else:
         src_varz = src_var
 
-    # horizontal interpolation using scrip weights
-    print('horizontal interpolation using scrip weights')
-    dst_varz = pyroms.remapping.remap(src_varz, wts_file, spval=spval)
-
     if ndim == 3:
+        # horizontal interpolation using scrip weights, only to the
+        # boundary strips
+        print('horizontal interpolation using scrip weights')
+        dst_varz_north = pyroms.remapping.remap(src_varz, \
+                pyroms.remapping.get_remap_operator(wts_file, \
+                jrange=(Mp-1,Mp), irange=(0,Lp)), spval=spval)
+        dst_varz_south = pyroms.remapping.remap(src_varz, \
+                pyroms.remapping.get_remap_operator(wts_file, \
+                jrange=(0,1), irange=(0,Lp)), spval=spval)
+        dst_varz_west = pyroms.remapping.remap(src_varz, \
+                pyroms.remapping.get_remap_operator(wts_file, \
+                jrange=(0,Mp), irange=(0,1)), spval=spval)
+
         # vertical interpolation from standard z level to sigma
         print('vertical interpolation from standard z level to sigma')
-        dst_var_north = pyroms.remapping.z2roms(dst_varz[::-1, Mp-1:Mp, 0:Lp], \
+        dst_var_north = pyroms.remapping.z2roms(dst_varz_north[::-1], \
                           dst_grdz, dst_grd, Cpos=Cpos, spval=spval, \
                           flood=False, irange=(0,Lp), jrange=(Mp-1,Mp))
-        dst_var_south = pyroms.remapping.z2roms(dst_varz[::-1, 0:1, :], \
+        dst_var_south = pyroms.remapping.z2roms(dst_varz_south[::-1], \
                           dst_grdz, dst_grd, Cpos=Cpos, spval=spval, \
                           flood=False, irange=(0,Lp), jrange=(0,1))
-        dst_var_west = pyroms.remapping.z2roms(dst_varz[::-1, :, 0:1], \
+        dst_var_west = pyroms.remapping.z2roms(dst_varz_west[::-1], \
                           dst_grdz, dst_grd, Cpos=Cpos, spval=spval, \
                           flood=False, irange=(0,1), jrange=(0,Mp))
     else:
+        # horizontal interpolation using scrip weights
+        print('horizontal interpolation using scrip weights')
+        dst_varz = pyroms.remapping.remap(src_varz, wts_file, spval=spval)
         dst_var_north = dst_varz[-1, :]
         dst_var_south = dst_varz[0, :]
         dst_var_west = dst_varz[:, 0]
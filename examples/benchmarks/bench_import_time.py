@@ -0,0 +1,60 @@
+'''
+Time the imports of pyroms and pyroms_toolbox in fresh interpreters and
+list the heavy packages (matplotlib, cartopy, pyproj, scipy) each one
+loads.
+
+usage: python bench_import_time.py [nrepeat]
+
+Every statement is run nrepeat times (default 5) in a new python
+process, the median time is reported. pyroms and pyroms_toolbox load
+their submodules on first access, so import pyroms should not load
+matplotlib or cartopy, and neither should the remapping drivers.
+'''
+import sys
+import subprocess
+import numpy as np
+
+
+STATEMENTS = [
+    'import pyroms',
+    'import pyroms_toolbox',
+    'import pyroms.grid',
+    'import pyroms.remapping',
+    'from pyroms_toolbox.remapping import remapping',
+    'from pyroms_toolbox import BdryWriter',
+    'from pyroms_toolbox import zview',
+    'from pyroms import *; from pyroms_toolbox import *',
+]
+
+HEAVY = ['matplotlib', 'matplotlib.pyplot', 'cartopy', 'pyproj', 'scipy']
+
+SCRIPT = '''
+import sys, time
+t0 = time.perf_counter()
+%s
+t = time.perf_counter() - t0
+print(t, ','.join(m for m in %r if m in sys.modules))
+'''
+
+
+def time_statement(statement, nrepeat):
+    times = []
+    for n in range(nrepeat):
+        out = subprocess.run([sys.executable, '-c', \
+                              SCRIPT % (statement, HEAVY)], \
+                             stdout=subprocess.PIPE, \
+                             stderr=subprocess.DEVNULL, \
+                             universal_newlines=True, check=True)
+        t, loaded = (out.stdout.strip().splitlines()[-1].split(' ') + [''])[:2]
+        times.append(float(t))
+    return np.median(times), loaded
+
+
+def main(nrepeat=5):
+    for statement in STATEMENTS:
+        t, loaded = time_statement(statement, nrepeat)
+        print('%-52s %7.3f s  %s' % (statement, t, loaded or '-'))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
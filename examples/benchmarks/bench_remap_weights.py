@@ -0,0 +1,109 @@
+'''
+Compare the python weight generator (pyroms.remapping.compute_scrip_weights)
+with the Fortran scrip path (pyroms.remapping.compute_remap_weights) on
+synthetic curvilinear grids.
+
+usage: python bench_remap_weights.py [src_nx src_ny dst_nx dst_ny]
+
+The scrip grid and weights files are written in a temporary directory.
+The Fortran path is skipped if scrip is not installed.
+'''
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+import netCDF4 as netCDF
+import pyroms
+
+
+def write_grid_file(filename, lon, lat, mask, name):
+    Mp, Lp = lon.shape
+    # rough cell corners, only the centers are used by bilinear/distwgt
+    dlon = np.gradient(lon, axis=1) / 2
+    dlat = np.gradient(lat, axis=0) / 2
+    corner_lon = np.stack([lon-dlon, lon+dlon, lon+dlon, lon-dlon], -1)
+    corner_lat = np.stack([lat-dlat, lat-dlat, lat+dlat, lat+dlat], -1)
+
+    nc = netCDF.Dataset(filename, 'w', format='NETCDF3_64BIT')
+    nc.title = name
+    nc.createDimension('grid_size', Lp * Mp)
+    nc.createDimension('grid_corners', 4)
+    nc.createDimension('grid_rank', 2)
+    nc.createVariable('grid_dims', 'i4', ('grid_rank'))
+    nc.variables['grid_dims'][:] = [Lp, Mp]
+    for var, val in [('grid_center_lon', lon), ('grid_center_lat', lat)]:
+        nc.createVariable(var, 'f8', ('grid_size'))
+        nc.variables[var].units = 'degrees'
+        nc.variables[var][:] = val.flatten()
+    nc.createVariable('grid_imask', 'i4', ('grid_size'))
+    nc.variables['grid_imask'][:] = mask.flatten()
+    for var, val in [('grid_corner_lon', corner_lon), \
+                     ('grid_corner_lat', corner_lat)]:
+        nc.createVariable(var, 'f8', ('grid_size', 'grid_corners'))
+        nc.variables[var].units = 'degrees'
+        nc.variables[var][:] = val.reshape((-1, 4))
+    nc.close()
+
+
+def make_grids(src_nx, src_ny, dst_nx, dst_ny):
+    # rotated, slightly sheared source grid covering the destination grid
+    jj, ii = np.mgrid[0:src_ny, 0:src_nx]
+    src_lon = 180. + 40. * ii / src_nx + 4. * jj / src_ny
+    src_lat = 40. + 30. * jj / src_ny + 2. * ii / src_nx
+    src_mask = np.ones(src_lon.shape, dtype=int)
+    src_mask[np.hypot(ii - src_nx/2., jj - src_ny/2.) < src_nx/10.] = 0
+
+    jj, ii = np.mgrid[0:dst_ny, 0:dst_nx]
+    dst_lon = 190. + 25. * ii / dst_nx - 3. * jj / dst_ny
+    dst_lat = 48. + 18. * jj / dst_ny + 1. * ii / dst_nx
+    dst_mask = np.ones(dst_lon.shape, dtype=int)
+
+    return src_lon, src_lat, src_mask, dst_lon, dst_lat, dst_mask
+
+
+def main(src_nx=400, src_ny=300, dst_nx=800, dst_ny=600):
+    src_lon, src_lat, src_mask, dst_lon, dst_lat, dst_mask = \
+        make_grids(src_nx, src_ny, dst_nx, dst_ny)
+
+    cwd = os.getcwd()
+    tmpdir = tempfile.mkdtemp()
+    os.chdir(tmpdir)
+
+    write_grid_file('grid1.nc', src_lon, src_lat, src_mask, 'SRC')
+    write_grid_file('grid2.nc', dst_lon, dst_lat, dst_mask, 'DST')
+
+    field = np.cos(np.deg2rad(src_lat)) * np.sin(np.deg2rad(3 * src_lon))
+
+    print('source grid %d x %d, destination grid %d x %d' \
+          % (src_nx, src_ny, dst_nx, dst_ny))
+
+    for method in ['bilinear', 'distwgt']:
+        t0 = time.time()
+        pyroms.remapping.compute_scrip_weights('grid1.nc', 'grid2.nc', \
+              'python_' + method + '.nc', None, 'SRC to DST', None, 1, method)
+        t_py = time.time() - t0
+        print('%-9s python  : %8.2f s' % (method, t_py))
+
+        if not hasattr(pyroms.remapping, 'scrip'):
+            print('%-9s fortran : scrip not available' % method)
+            continue
+
+        t0 = time.time()
+        pyroms.remapping.compute_remap_weights('grid1.nc', 'grid2.nc', \
+              'fortran_' + method + '.nc', 'unused.nc', 'SRC to DST', \
+              'DST to SRC', 1, method)
+        t_f = time.time() - t0
+        print('%-9s fortran : %8.2f s (speedup %.1fx)' \
+              % (method, t_f, t_f / t_py))
+
+        dst_py = pyroms.remapping.remap(field, 'python_' + method + '.nc')
+        dst_f = pyroms.remapping.remap(field, 'fortran_' + method + '.nc')
+        print('%-9s max abs difference of remapped field: %g' \
+              % (method, np.abs(dst_py - dst_f).max()))
+
+    os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:5]])
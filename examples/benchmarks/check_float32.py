@@ -0,0 +1,119 @@
+'''
+Check the float32 mode of the remapping pipeline: remap, flood, z2roms
+and UVTransform are run on synthetic grids in float32 and float64 and
+the maximum relative error of the float32 results is bounded.
+
+usage: python check_float32.py [nx ny]
+
+The scrip grid and weights files are written in a temporary directory.
+An AssertionError is raised if an error exceeds its bound.
+'''
+import os
+import sys
+import tempfile
+import numpy as np
+from pyproj import Proj
+import pyroms
+from bench_remap_weights import write_grid_file
+
+
+# maximum relative error of the float32 results, relative to the
+# largest magnitude of the float64 result
+max_rel_err = {'remap': 1e-6, 'flood': 1e-6, 'z2roms': 1e-6, \
+               'UVTransform': 1e-6}
+
+
+def make_grids(nx, ny, N=20, nz=30):
+    # rotated, slightly sheared ROMS grid with an island, the same
+    # horizontal grid on z levels, and a destination grid inside it
+    jj, ii = np.mgrid[0:ny+1, 0:nx+1]
+    lon_vert = 190. + 20. * ii / nx + 3. * jj / ny
+    lat_vert = 45. + 15. * jj / ny + 2. * ii / nx
+    hgrd = pyroms.hgrid.CGrid_geo(lon_vert, lat_vert, Proj(proj='merc'))
+    jj, ii = np.mgrid[0:ny, 0:nx]
+    hgrd.mask_rho = np.ones((ny, nx))
+    hgrd.mask_rho[np.hypot(ii - nx/2., jj - ny/2.) < nx/8.] = 0
+
+    h = 50. + 4950. * (1 + np.sin(np.pi * ii / nx) * \
+                       np.sin(np.pi * jj / ny)) / 2
+    vgrd = pyroms.vgrid.s_coordinate_4(h, 2., 7., 250., N)
+    grd = pyroms.grid.ROMS_Grid('check_float32', hgrd, vgrd)
+
+    depth = -np.linspace(5500., 0., nz)
+    grdz = pyroms.grid.ROMS_Grid('check_float32_z', hgrd, \
+                                 pyroms.vgrid.z_coordinate(h, depth, nz))
+
+    return grd, grdz
+
+
+def relative_error(var4, var8, spval=1e37):
+    # relative to the largest magnitude of the float64 field, the
+    # spval points must agree
+    var4 = np.ma.getdata(var4)
+    var8 = np.ma.getdata(var8)
+    land = abs((var8 - spval) / spval) <= 1e-5
+    assert np.all(land == (abs((var4 - spval) / spval) <= 1e-5)), \
+           'spval points differ'
+    return np.abs(var4[~land] - var8[~land]).max() / np.abs(var8[~land]).max()
+
+
+def check(name, var4, var8):
+    assert var4.dtype == np.float32 and var8.dtype == np.float64, \
+           '%s returned %s and %s' % (name, var4.dtype, var8.dtype)
+    err = relative_error(var4, var8)
+    print('%-12s max relative error %.2e (bound %.0e)' \
+          % (name, err, max_rel_err[name]))
+    assert err <= max_rel_err[name], '%s error %g too large' % (name, err)
+
+
+def main(nx=120, ny=90):
+    grd, grdz = make_grids(nx, ny)
+    hgrd = grd.hgrid
+    mask = hgrd.mask_rho
+
+    # temperature like field on the z levels, spval under the bottom
+    # and on land
+    lon = np.deg2rad(hgrd.lon_rho)
+    lat = np.deg2rad(hgrd.lat_rho)
+    z = grdz.vgrid.z
+    varz = 2. + 25. * np.exp(z / 800.) + np.sin(3 * lon) * np.cos(2 * lat)
+    varz[(z < -grdz.vgrid.h) | (mask == 0)] = 1e37
+
+    # remap the z levels to a destination grid
+    cwd = os.getcwd()
+    tmpdir = tempfile.mkdtemp()
+    os.chdir(tmpdir)
+    jj, ii = np.mgrid[0:2*ny, 0:2*nx]
+    dst_lon = 195. + 10. * ii / (2*nx) - 1. * jj / (2*ny)
+    dst_lat = 50. + 8. * jj / (2*ny) + 1. * ii / (2*nx)
+    write_grid_file('grid1.nc', hgrd.lon_rho, hgrd.lat_rho, \
+                    mask.astype(int), 'SRC')
+    write_grid_file('grid2.nc', dst_lon, dst_lat, \
+                    np.ones(dst_lon.shape, dtype=int), 'DST')
+    pyroms.remapping.compute_scrip_weights('grid1.nc', 'grid2.nc', \
+          'remap_weights.nc', None, 'SRC to DST', None, 1, 'bilinear')
+    flooded = pyroms.remapping.flood(varz, grdz, dtype='f8')
+    check('remap', \
+          pyroms.remapping.remap(flooded, 'remap_weights.nc', dtype='f4'), \
+          pyroms.remapping.remap(flooded, 'remap_weights.nc', dtype='f8'))
+    os.chdir(cwd)
+
+    check('flood', pyroms.remapping.flood(varz, grdz, dtype='f4'), \
+          pyroms.remapping.flood(varz, grdz, dtype='f8'))
+
+    check('z2roms', pyroms.remapping.z2roms(varz, grdz, grd, dtype='f4'), \
+          pyroms.remapping.z2roms(varz, grdz, grd, dtype='f8'))
+
+    # velocity like fields on the rho points, rotated by a varying angle
+    angle = 0.3 * np.sin(lon) + 0.2 * np.cos(lat)
+    u = 0.5 * np.cos(2 * lon)[np.newaxis] * np.ones((4, 1, 1))
+    v = 0.3 * np.sin(3 * lat)[np.newaxis] * np.ones((4, 1, 1))
+    uvt = pyroms.remapping.UVTransform(grd, angle)
+    u4, v4 = uvt(u, v, dtype='f4')
+    u8, v8 = uvt(u, v, dtype='f8')
+    check('UVTransform', np.concatenate((u4.ravel(), v4.ravel())), \
+          np.concatenate((u8.ravel(), v8.ravel())))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,162 @@
+'''
+Check the ROMS to ROMS drivers with rotate_uv=True: a uniform eastward
+and northward velocity is written on a rotated source grid, remapped
+and rotated to a destination grid rotated the other way by
+pyroms_toolbox.remapping (with 1 and 2 processes) and
+pyroms_toolbox.remapping_bound.
+
+usage: python check_remapping_uv.py [nx ny]
+
+The grids, weights, source and destination files are written in a
+temporary directory. An AssertionError is raised if the rotated
+velocity departs from the uniform flow, if the two remapping runs
+differ, or if a boundary strip differs from the full remap.
+'''
+import os
+import sys
+import tempfile
+import numpy as np
+import netCDF4 as netCDF
+from pyproj import Proj
+import pyroms
+import pyroms_toolbox
+from pyroms_toolbox.remapping import remapping
+from pyroms_toolbox.remapping_bound import remapping_bound
+
+
+# uniform eastward and northward velocity (m/s) and the largest error
+# allowed on the rotated destination velocity, relative to the speed
+U, V = 0.5, -0.2
+max_rel_err = 5e-3
+
+
+def make_grid(name, lon0, lat0, dlon, dlat, nx, ny, skew, N=10):
+    # sheared ROMS grid, skew sets the rotation of the grid lines
+    jj, ii = np.mgrid[0:ny+1, 0:nx+1]
+    lon_vert = lon0 + dlon * ii / nx + skew * jj / ny
+    lat_vert = lat0 + dlat * jj / ny - skew * ii / nx
+    hgrd = pyroms.hgrid.CGrid_geo(lon_vert, lat_vert, Proj(proj='merc'))
+    hgrd.mask_rho = np.ones((ny, nx))
+    jj, ii = np.mgrid[0:ny, 0:nx]
+    h = 1000. + 500. * np.sin(np.pi * ii / nx) * np.sin(np.pi * jj / ny)
+    vgrd = pyroms.vgrid.s_coordinate_4(h, 2., 7., 50., N)
+    return pyroms.grid.ROMS_Grid(name, hgrd, vgrd)
+
+
+def make_weights(srcgrd, dstgrd):
+    # bilinear rho, u and v to rho weights
+    for Cpos in ['rho', 'u', 'v']:
+        pyroms.remapping.make_remap_grid_file(srcgrd, Cpos=Cpos)
+    pyroms.remapping.make_remap_grid_file(dstgrd)
+    for Cpos in ['rho', 'u', 'v']:
+        pyroms.remapping.compute_scrip_weights( \
+              'remap_grid_SRC_%s.nc' % Cpos, 'remap_grid_DST_rho.nc', \
+              'remap_weights_SRC_to_DST_bilinear_%s_to_rho.nc' % Cpos, \
+              None, 'SRC to DST', None, 1, 'bilinear')
+
+
+def write_source_file(filename, grd, ntime=3):
+    # temp, zeta and the velocity of the uniform flow on grd
+    class Time(object):
+        long_name = 'time since initialization'
+        units = 'days since 1900-01-01 00:00:00'
+    pyroms_toolbox.nc_create_roms_file(filename, grd, Time())
+    nc = netCDF.Dataset(filename, 'a', format='NETCDF3_64BIT')
+    nc.variables['ocean_time'][:] = np.arange(ntime)
+
+    hgrd = grd.hgrid
+    N = grd.vgrid.N
+    lon = np.deg2rad(hgrd.lon_rho)
+    lat = np.deg2rad(hgrd.lat_rho)
+    angle_u = 0.5 * (hgrd.angle_rho[:,1:] + hgrd.angle_rho[:,:-1])
+    angle_v = 0.5 * (hgrd.angle_rho[1:,:] + hgrd.angle_rho[:-1,:])
+    fields = {'temp': (('eta_rho', 'xi_rho'), \
+                       10. + np.sin(3 * lon) * np.cos(2 * lat), True), \
+              'zeta': (('eta_rho', 'xi_rho'), 0.1 * np.cos(4 * lon), False), \
+              'u': (('eta_u', 'xi_u'), \
+                    U * np.cos(angle_u) + V * np.sin(angle_u), True), \
+              'v': (('eta_v', 'xi_v'), \
+                    V * np.cos(angle_v) - U * np.sin(angle_v), True)}
+    for var, (dims, val, is3d) in fields.items():
+        if is3d:
+            dims = ('ocean_time', 's_rho') + dims
+            val = val[np.newaxis] * np.ones((N, 1, 1))
+        else:
+            dims = ('ocean_time',) + dims
+        nc.createVariable(var, 'f8', dims, fill_value=1e37)
+        nc.variables[var].long_name = var
+        nc.variables[var].units = 'unit'
+        nc.variables[var].time = 'ocean_time'
+        nc.variables[var].coordinates = ' '.join(dims[::-1])
+        nc.variables[var].field = var + ', scalar, series'
+        for nt in range(ntime):
+            nc.variables[var][nt] = val * (1. + 0.1 * nt)
+    nc.close()
+
+
+def main(nx=40, ny=30):
+    # the destination grid lies inside the source grid
+    srcgrd = make_grid('SRC', 190., 50., 10., 8., nx, ny, 2.)
+    dstgrd = make_grid('DST', 193., 51., 5., 4., 3*nx//2, 3*ny//2, -1.)
+
+    tmpdir = tempfile.mkdtemp()
+    os.chdir(tmpdir)
+    make_weights(srcgrd, dstgrd)
+    write_source_file('src.nc', srcgrd)
+    wts_files = 'remap_weights_SRC_to_DST_bilinear_*'
+    varname = ['temp', 'zeta', 'u', 'v']
+
+    out = {}
+    for nprocs in [1, 2]:
+        dstdir = os.path.join(tmpdir, 'nprocs%d' % nprocs) + '/'
+        os.mkdir(dstdir)
+        remapping(list(varname), 'src.nc', wts_files, srcgrd, dstgrd, \
+                  rotate_uv=True, dstdir=dstdir, nprocs=nprocs)
+        out[nprocs] = netCDF.Dataset(dstdir + 'src_DST.nc')
+    remapping_bound(list(varname), 'src.nc', wts_files, srcgrd, dstgrd, \
+                    rotate_uv=True, dstdir=tmpdir + '/')
+    bdry = netCDF.Dataset(os.path.join(tmpdir, 'src_DST_bdry.nc'))
+
+    # the rotated velocity is the uniform flow on the destination grid
+    full = out[1]
+    hgrd = dstgrd.hgrid
+    angle_u = 0.5 * (hgrd.angle_rho[:,1:] + hgrd.angle_rho[:,:-1])
+    angle_v = 0.5 * (hgrd.angle_rho[1:,:] + hgrd.angle_rho[:-1,:])
+    for nt in range(len(full.variables['ocean_time'])):
+        scale = 1. + 0.1 * nt
+        err = max( \
+          np.abs(full.variables['u'][nt] - scale * \
+                 (U * np.cos(angle_u) + V * np.sin(angle_u))).max(), \
+          np.abs(full.variables['v'][nt] - scale * \
+                 (V * np.cos(angle_v) - U * np.sin(angle_v))).max()) \
+          / (scale * np.hypot(U, V))
+        print('record %d rotated velocity max relative error %.2e ' \
+              '(bound %.0e)' % (nt, err, max_rel_err))
+        assert err <= max_rel_err, \
+               'rotated velocity error %g too large' % err
+
+    # nprocs=2 writes the same file as nprocs=1
+    for var in varname + ['ubar', 'vbar']:
+        assert np.array_equal(out[1].variables[var][:], \
+                              out[2].variables[var][:]), \
+               '%s differs between nprocs=1 and nprocs=2' % var
+    print('nprocs=1 and nprocs=2 outputs are identical')
+
+    # the boundary strips are the edges of the full remap
+    edges = {'_north': (slice(None), Ellipsis, -1, slice(None)), \
+             '_south': (slice(None), Ellipsis, 0, slice(None)), \
+             '_east': (slice(None), Ellipsis, slice(None), -1), \
+             '_west': (slice(None), Ellipsis, slice(None), 0)}
+    for var in varname + ['ubar', 'vbar']:
+        for sid, edge in edges.items():
+            assert np.array_equal(bdry.variables[var+sid][:], \
+                                  full.variables[var][:][edge]), \
+                   '%s%s differs from the full remap' % (var, sid)
+    print('boundary strips match the full remap')
+
+    for nc in list(out.values()) + [bdry]:
+        nc.close()
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
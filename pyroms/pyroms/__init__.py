@@ -8,17 +8,24 @@ general modeling tools for dealing with arrays, diagnosing standard
 properties, curvilinear grid generation, and interpolation.
 '''
 
-from . import cf
-from . import vgrid
-from . import extern
-from . import hgrid
-from . import grid
-from . import io
-from . import sta_hgrid
-from . import sta_grid
-from . import tools
-from . import remapping
-from . import utility
+import importlib as _importlib
+
+# the submodules are imported on first access (pyroms.grid, from pyroms
+# import remapping, ...), so that import pyroms does not load the
+# plotting, projection and scipy stacks a batch job may not need
+__all__ = ['cf', 'vgrid', 'extern', 'hgrid', 'grid', 'io', 'sta_hgrid', \
+           'sta_grid', 'tools', 'remapping', 'utility']
+
+
+def __getattr__(name):
+    if name in __all__:
+        return _importlib.import_module('.' + name, __name__)
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
+
 
 __authors__ = ['Frederic Castruccio (frederic@marine.rutgers.edu)']
 
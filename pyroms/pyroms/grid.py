@@ -2,9 +2,13 @@
 
 import sys
 import os
+import copy
+import json
+import shutil
+import tempfile
+from collections import OrderedDict
 import numpy as np
 # from mpl_toolkits.basemap import Basemap
-import cartopy.crs as ccrs
 from datetime import datetime
 try:
   import netCDF4 as netCDF
@@ -24,6 +28,19 @@ from pyproj import Proj
 #values are ROMS_gridinfo objects.
 gridid_dictionary={}
 
+# parsed PYROMS_GRIDID_FILE, see _get_gridid_registry
+_gridid_registry = {}
+
+# maximum number of ROMS_Grid kept in the process-wide cache of
+# get_ROMS_grid
+cache_size = 8
+
+_grid_cache = OrderedDict()
+
+# version of the get_ROMS_grid snapshot layout, older snapshots are
+# rebuilt
+_snapshot_version = 2
+
 class ROMS_Grid(object):
     """
     grd = ROMS_Grid(hgrid, vgrid)
@@ -36,6 +53,14 @@ class ROMS_Grid(object):
         self.hgrid = hgrid
         self.vgrid = vgrid
 
+    def __reduce_ex__(self, protocol):
+        # a grid attached to a shared directory (attach_ROMS_grid) is
+        # pickled as a reference to it
+        shared = self.__dict__.get('_shared')
+        if shared is not None:
+            return (attach_ROMS_grid, shared)
+        return super(ROMS_Grid, self).__reduce_ex__(protocol)
+
 
 class ROMS_gridinfo(object):
     '''
@@ -52,6 +77,18 @@ class ROMS_gridinfo(object):
     definition accordingly to your case (Be carefull with
     space and blank line).
 
+    PYROMS_GRIDID_FILE can also be a .json, .toml or .yaml file that
+    maps each gridid to a table of name, grdfile, N, grdtype and, for
+    a roms grid, Vtrans, theta_s, theta_b and Tcline (depth for a z
+    grid), e.g. in json
+
+      {"CORAL": {"name": "CORAL", "grdfile": "coral_grd.nc", "N": 50,
+                 "grdtype": "roms", "Vtrans": 2, "theta_s": 7,
+                 "theta_b": 0.1, "Tcline": 250}}
+
+    The gridid file is parsed once per process and parsed again when it
+    is modified, the grid information of its gridid is then reloaded.
+
     If grid_file is the path to a ROMS grid file, and hist_file is the
     path to a ROMS history file, then the grid information will be
     read from those files.  Gridid can then be used to refer to this
@@ -61,7 +98,8 @@ class ROMS_gridinfo(object):
 
     def __init__(self, gridid,grid_file=None,hist_file=None):
       #first determine if the information for the gridid has already been obtained.
-      if gridid in gridid_dictionary:
+      if gridid in gridid_dictionary and \
+         _is_current(gridid_dictionary[gridid]):
         #print 'CJMP> gridid found in gridid_dictionary, grid retrieved from dictionary'
         saved_self=gridid_dictionary[gridid]
         for attrib in list(saved_self.__dict__.keys()):
@@ -80,59 +118,31 @@ class ROMS_gridinfo(object):
       #check if the grid_file and hist_files are both null; if so get data from gridid.txt
       if (type(grid_file)==type(None))&(type(hist_file)==type(None)):
         #print 'CJMP> gridid not in dictionary, data will be retrieved from gridid.txt'
-        gridid_file =  os.getenv("PYROMS_GRIDID_FILE")
-        data = open(gridid_file,'r')
-        lines = data.readlines()
-        data.close()
+        path, mtime, grids = _get_gridid_registry()
 
-        line_nb = 0
-        info = []
-        for line in lines:
-            s = line.split()
-            if s[0] == 'id':
-                if s[2] == self.id:
-                    for l in range(line_nb, line_nb+5):
-                        s = lines[l].split()
-                        info.append(s[2])
-                        line_nb = line_nb + 1
-                    if info[4] == 'roms':
-                        for l in range(line_nb, line_nb+4):
-                            s = lines[l].split()
-                            info.append(s[2])
-                    if info[4] == 'z':
-                        s = lines[line_nb].split()
-                        info.append(s[3:-1])
-                        while s[-1:] == ['\\']:
-                            line_nb = line_nb + 1
-                            s = lines[line_nb].split()
-                            info.append(s[:-1])
-            line_nb = line_nb + 1
-
-        if info == []:
+        if self.id not in grids:
             raise ValueError('Unknown gridid. Please check your gridid.txt file')
 
-        if info[4] == 'roms':
-            self.name     =          info[1]
-            self.grdfile  =          info[2]
-            self.N        =   int(info[3])
-            self.grdtype  =          info[4]
-            self.Vtrans   =   int(info[5])
-            self.theta_s  = float(info[6])
-            self.theta_b  = float(info[7])
-            self.Tcline   = float(info[8])
-
-        elif info[4] == 'z':
-            nline = len(info)
-            dep = info[5]
-            for line in range(6,nline):
-                dep = dep + info[line]
-            dep = np.array(dep, dtype=float)
-
-            self.name    =        info[1]
-            self.grdfile =        info[2]
-            self.N       =    int(info[3])
-            self.grdtype =        info[4]
-            self.depth   = dep
+        #the information is reloaded when the gridid file changes
+        self._source = (path, mtime)
+        info = grids[self.id]
+
+        if info['grdtype'] == 'roms':
+            self.name     =          info['name']
+            self.grdfile  =          info['grdfile']
+            self.N        =   int(info['N'])
+            self.grdtype  =          info['grdtype']
+            self.Vtrans   =   int(info['Vtrans'])
+            self.theta_s  = float(info['theta_s'])
+            self.theta_b  = float(info['theta_b'])
+            self.Tcline   = float(info['Tcline'])
+
+        elif info['grdtype'] == 'z':
+            self.name    =        info['name']
+            self.grdfile =        info['grdfile']
+            self.N       =    int(info['N'])
+            self.grdtype =        info['grdtype']
+            self.depth   = np.array(info['depth'], dtype=float)
 
         else:
             raise ValueError('Unknown grid type. Please check your gridid.txt file')
@@ -200,18 +210,127 @@ def list_ROMS_gridid():
     return the list of the defined gridid
     """
 
+    path, mtime, grids = _get_gridid_registry()
+    gridid_list = list(grids)
+
+    print('List of defined gridid : ', gridid_list)
+
+
+def _get_gridid_registry():
+    # (path, mtime, grids) of the gridid file PYROMS_GRIDID_FILE, grids
+    # maps each gridid to its definition. The file is parsed once, and
+    # again when it is modified.
     gridid_file = os.getenv("PYROMS_GRIDID_FILE")
-    data = open(gridid_file,'r')
+    if gridid_file is None:
+        raise ValueError('PYROMS_GRIDID_FILE is not set, it must point ' \
+                         'to your gridid file')
+
+    path = os.path.abspath(gridid_file)
+    mtime = os.path.getmtime(path)
+    if _gridid_registry.get('file') != (path, mtime):
+        _gridid_registry['grids'] = _read_gridid_file(path)
+        _gridid_registry['file'] = (path, mtime)
+
+    return path, mtime, _gridid_registry['grids']
+
+
+def _is_current(gridinfo):
+    # False if gridinfo was read from a gridid file that has changed
+    # since (or is no longer PYROMS_GRIDID_FILE)
+    source = gridinfo.__dict__.get('_source')
+    if source is None:
+        return True
+    gridid_file = os.getenv("PYROMS_GRIDID_FILE")
+    if gridid_file is None or os.path.abspath(gridid_file) != source[0]:
+        return False
+    return _get_mtime(source[0]) == source[1]
+
+
+def _read_gridid_file(filename):
+    # grid definitions of a gridid file: .json, .toml, .yaml/.yml, or
+    # the legacy gridid.txt format otherwise
+    ext = os.path.splitext(filename)[1].lower()
+
+    if ext == '.json':
+        with open(filename, 'r') as f:
+            data = json.load(f)
+    elif ext == '.toml':
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ImportError('tomllib (python >= 3.11) or tomli is ' \
+                                  'needed to read %s' % filename)
+        with open(filename, 'rb') as f:
+            data = tomllib.load(f)
+    elif ext in ['.yaml', '.yml']:
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError('PyYAML is needed to read %s' % filename)
+        with open(filename, 'r') as f:
+            data = yaml.safe_load(f)
+    else:
+        return _read_gridid_text(filename)
+
+    # {gridid: {name: ..., grdfile: ..., ...}, ...}, optionally under
+    # a grids key, or a list of definitions with an id key
+    if isinstance(data, dict) and 'grids' in data:
+        data = data['grids']
+    if isinstance(data, list):
+        data = OrderedDict((str(info['id']), info) for info in data)
+
+    grids = OrderedDict()
+    for gridid, info in data.items():
+        info = dict(info)
+        if 'grdtyp' in info:
+            info.setdefault('grdtype', info.pop('grdtyp'))
+        info.setdefault('name', str(gridid))
+        grids[str(gridid)] = info
+
+    return grids
+
+
+def _read_gridid_text(filename):
+    # grid definitions of a legacy gridid.txt file, a block of 'key = value'
+    # lines starting at each 'id = gridid' line, the first definition of
+    # a gridid is kept
+    data = open(filename,'r')
     lines = data.readlines()
     data.close()
 
-    gridid_list = []
-    for line in lines:
+    grids = OrderedDict()
+    for line_nb, line in enumerate(lines):
         s = line.split()
-        if s[0] == 'id':
-            gridid_list.append(s[2])
+        if len(s) < 3 or s[0] != 'id' or s[2] in grids:
+            continue
 
-    print('List of defined gridid : ', gridid_list)
+        info = []
+        for l in range(line_nb, line_nb+5):
+            info.append(lines[l].split()[2])
+        line_nb = line_nb + 5
+        grid = {'name': info[1], 'grdfile': info[2], 'N': info[3], \
+                'grdtype': info[4]}
+
+        if info[4] == 'roms':
+            for key, l in zip(['Vtrans', 'theta_s', 'theta_b', 'Tcline'], \
+                              range(line_nb, line_nb+4)):
+                grid[key] = lines[l].split()[2]
+
+        elif info[4] == 'z':
+            s = lines[line_nb].split()
+            dep = s[3:-1]
+            while s[-1:] == ['\\']:
+                line_nb = line_nb + 1
+                s = lines[line_nb].split()
+                dep = dep + s[:-1]
+            grid['depth'] = dep
+
+        grids[info[0]] = grid
+
+    return grids
 
 
 def get_ROMS_hgrid(gridid):
@@ -226,6 +345,12 @@ def get_ROMS_hgrid(gridid):
 
     nc = io.Dataset(grdfile)
 
+    return _read_ROMS_hgrid(nc)
+
+
+def _read_ROMS_hgrid(nc):
+    # horizontal grid object of the open grid file nc
+
     #Check for cartesian or geographical grid
     spherical = nc.variables['spherical'][0]
 
@@ -401,7 +526,10 @@ def get_ROMS_vgrid(gridid, zeta=None):
     argument. Note that the values of zeta are not calculated
     until z is indexed, so a netCDF variable for zeta may be passed,
     even if the file is large, as only the values that are required
-    will be retrieved from the file.
+    will be retrieved from the file. zeta can also be the history
+    file(s) (name with wildcards or list of names) to read it from,
+    use vgrid.iter_z_r(chunk=...) to process long time series with
+    bounded memory.
     """
 
     gridinfo = ROMS_gridinfo(gridid)
@@ -409,7 +537,13 @@ def get_ROMS_vgrid(gridid, zeta=None):
 
     nc = io.Dataset(grdfile)
 
-    #Get vertical grid
+    h, hraw = _read_ROMS_bathymetry(nc)
+
+    return _make_ROMS_vgrid(gridinfo, h, hraw, zeta)
+
+
+def _read_ROMS_bathymetry(nc):
+    # h and hraw (None if absent) of the open grid file nc
     try:
         h = nc.variables['h'][:]
     except:
@@ -420,6 +554,18 @@ def get_ROMS_vgrid(gridid, zeta=None):
     except:
         hraw = None
 
+    return h, hraw
+
+
+def _make_ROMS_vgrid(gridinfo, h, hraw, zeta):
+    # vertical grid object of gridinfo over the bathymetry h
+
+    if isinstance(zeta, str) and os.path.exists(zeta):
+        zeta = io.Dataset(zeta).variables['zeta']
+    elif isinstance(zeta, (str, list, tuple)):
+        zeta = io.MFDataset(zeta).variables['zeta']
+
+    #Get vertical grid
     if gridinfo.grdtype == 'roms':
         Vtrans = gridinfo.Vtrans
         theta_b = gridinfo.theta_b
@@ -448,7 +594,8 @@ def get_ROMS_vgrid(gridid, zeta=None):
     return vgrid
 
 
-def get_ROMS_grid(gridid, zeta=None, hist_file=None,grid_file=None):
+def get_ROMS_grid(gridid, zeta=None, hist_file=None,grid_file=None, \
+                  cache=True, snapshot=None):
     """
     grd = get_ROMS_grid(gridid,hist_file=None,grid_file=None)
 
@@ -474,6 +621,27 @@ def get_ROMS_grid(gridid, zeta=None, hist_file=None,grid_file=None):
     calculated until z is indexed, so a netCDF variable for zeta may
     be passed, even if the file is large, as only the values that
     are required will be retrieved from the file.
+
+    Grids are kept in a process-wide LRU cache keyed by gridid and the
+    path and modification time of the grid file, so the grid file is
+    only read by the first call. The cache holds the horizontal grid
+    and the bathymetry, the vertical grid is built over them for the
+    zeta of each call. Every call returns its own copy of the cached
+    grid, which can be modified (e.g. its mask) without changing the
+    grid returned by the following calls; the arrays of a shared grid
+    directory are read-only memory maps and are not copied. The cache
+    holds at most pyroms.grid.cache_size grids.
+
+    snapshot is an optional .npz file holding the horizontal grid and
+    the bathymetry. It is written the first time the grid is read,
+    rewritten when the grid file changes, and restores the grid
+    without recomputing its projections and metrics, e.g. in the
+    workers of a process pool. With the environment variable
+    PYROMS_GRID_SNAPSHOT_DIR, snapshot defaults to
+    $PYROMS_GRID_SNAPSHOT_DIR/gridid.npz. If snapshot is a directory
+    name (no .npz suffix), the arrays are stored as .npy files and the
+    grid is attached to them as read-only memory maps shared by all
+    the processes, see attach_ROMS_grid.
     """
 
     #in this first call to ROMS_gridinfo, we pass in the history file
@@ -483,14 +651,319 @@ def get_ROMS_grid(gridid, zeta=None, hist_file=None,grid_file=None):
     gridinfo = ROMS_gridinfo(gridid,hist_file=hist_file,grid_file=grid_file)
     name = gridinfo.name
 
-    #we need not pass in hist_file and grid_file here, because the
-    #gridinfo file will already have been initialized by the call to
-    #ROMS_gridinfo above.
-    hgrd = get_ROMS_hgrid(gridid)
-    vgrid = get_ROMS_vgrid(gridid, zeta=zeta)
+    path = os.path.abspath(gridinfo.grdfile)
+    mtime = _get_mtime(path)
+    key = (gridid, path, mtime, _gridinfo_key(gridinfo))
+
+    if cache and mtime is not None and key in _grid_cache:
+        _grid_cache.move_to_end(key)
+        return _copy_ROMS_grid(_grid_cache[key], gridinfo, zeta)
+
+    if snapshot is None and os.getenv('PYROMS_GRID_SNAPSHOT_DIR'):
+        snapshot = os.path.join(os.getenv('PYROMS_GRID_SNAPSHOT_DIR'), \
+                                gridid + '.npz')
+
+    if not snapshot or mtime is None:
+        snapshot = None
+    else:
+        snapshot = os.path.abspath(snapshot)
+
+    restored = None
+    if snapshot is not None:
+        restored = _read_grid_snapshot(snapshot, source=(path, mtime))
+
+    if restored is None:
+        #the grid file is read once for the horizontal and vertical grids
+        nc = io.Dataset(gridinfo.grdfile)
+        hgrd = _read_ROMS_hgrid(nc)
+        h, hraw = _read_ROMS_bathymetry(nc)
+        nc.close()
+    else:
+        hgrd, h, hraw = restored[:3]
+
+    #Get ROMS grid, without zeta until it is cached
+    grd = ROMS_Grid(name, hgrd, _make_ROMS_vgrid(gridinfo, h, hraw, None))
+
+    if snapshot is not None and not snapshot.endswith('.npz'):
+        # shared grid directory, the process writing it attaches to it
+        # as well
+        if restored is None:
+            _write_grid_snapshot(snapshot, grd, source=(path, mtime))
+            restored = _read_grid_snapshot(snapshot, source=(path, mtime))
+            if restored is not None:
+                hgrd, h, hraw = restored[:3]
+                grd = ROMS_Grid(name, hgrd, \
+                                _make_ROMS_vgrid(gridinfo, h, hraw, None))
+        if restored is not None:
+            grd._shared = (snapshot, None)
+    elif snapshot is not None and restored is None:
+        _write_grid_snapshot(snapshot, grd, source=(path, mtime))
+
+    if cache and mtime is not None:
+        # drop the grids built from an older version of the grid file
+        for k in [k for k in _grid_cache if k[:2] == key[:2] \
+                  and k[2:] != key[2:]]:
+            del _grid_cache[k]
+        _grid_cache[key] = grd
+        while len(_grid_cache) > max(cache_size, 0):
+            _grid_cache.popitem(last=False)
+        return _copy_ROMS_grid(grd, gridinfo, zeta)
+
+    if zeta is not None:
+        grd.vgrid = _make_ROMS_vgrid(gridinfo, h, hraw, zeta)
+        if '_shared' in grd.__dict__:
+            grd._shared = (grd._shared[0], zeta)
+
+    return grd
+
+
+def _copy_ROMS_grid(grd, gridinfo, zeta):
+    # copy of a cached grid, so that the caller can modify it (e.g. its
+    # mask) without changing the grid returned to the following calls.
+    # The writable arrays are copied, the read-only ones (memory maps of
+    # a shared grid) are not. The vertical grid is built over a copy of
+    # the bathymetry, with the free surface zeta of the caller.
+    def _copied(value):
+        if isinstance(value, np.ndarray) and value.flags.writeable:
+            return value.copy()
+        return value
+
+    hgrd = copy.copy(grd.hgrid)
+    for attr, value in list(hgrd.__dict__.items()):
+        if attr.startswith('_'):
+            # cached data, e.g. the spatial index of pyroms.utility
+            del hgrd.__dict__[attr]
+        else:
+            hgrd.__dict__[attr] = _copied(value)
+
+    vgrid = _make_ROMS_vgrid(gridinfo, _copied(grd.vgrid.h), \
+                             _copied(getattr(grd.vgrid, 'hraw', None)), zeta)
+
+    new = ROMS_Grid(grd.name, hgrd, vgrid)
+    if '_shared' in grd.__dict__:
+        new._shared = (grd._shared[0], zeta)
+    return new
+
+
+def clear_ROMS_grid_cache():
+    """
+    clear_ROMS_grid_cache()
+
+    Empty the process-wide ROMS_Grid cache of get_ROMS_grid.
+    """
+
+    _grid_cache.clear()
+
+
+def _get_mtime(path):
+    # modification time of the grid file, None for a remote (OPeNDAP)
+    # grid, which is not cached
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _gridinfo_key(gridinfo):
+    # the vertical grid parameters, which may change with the gridid file
+    return tuple((k, tuple(np.ravel(v)) if isinstance(v, np.ndarray) else v) \
+                 for k, v in sorted(gridinfo.__dict__.items()) \
+                 if k not in ['id', '_source'])
+
+
+def _pack_array(arrays, name, value):
+    # store a (masked) array, the mask in name + '.mask'
+    if isinstance(value, np.ma.MaskedArray):
+        arrays[name] = np.ma.getdata(value)
+        arrays[name + '.mask'] = np.ma.getmaskarray(value)
+    else:
+        arrays[name] = np.asarray(value)
+
+
+def _unpack_array(data, name):
+    value = data[name]
+    if name + '.mask' in data:
+        value = np.ma.MaskedArray(value, mask=data[name + '.mask'])
+    return value
+
+
+def _vgrid_meta(vgrid):
+    # parameters rebuilding vgrid over h, see attach_ROMS_grid
+    cls = type(vgrid).__name__
+    if cls == 'z_coordinate':
+        return {'class': cls, 'depth': np.asarray(vgrid.depth).tolist(), \
+                'N': vgrid.N}
+    return {'class': cls, 'theta_b': float(vgrid.theta_b), \
+            'theta_s': float(vgrid.theta_s), 'Tcline': float(vgrid.Tcline), \
+            'N': vgrid.N}
+
+
+def _write_grid_snapshot(filename, grd, source=None):
+    # save the horizontal grid, the bathymetry and the parameters of the
+    # vertical grid of grd, with the grid file path and mtime it was
+    # read from. filename is an .npz file, or a directory of .npy files
+    # that can be memory mapped
+    hgrd = grd.hgrid
+    arrays = {}
+    attrs = {}
+    for attr, value in hgrd.__dict__.items():
+        if attr.startswith('_'):
+            # cached data, e.g. the spatial index of pyroms.utility
+            continue
+        elif value is None:
+            attrs[attr] = None
+        elif isinstance(value, Proj):
+            attrs[attr] = {'proj': value.srs}
+        elif isinstance(value, (np.ndarray, np.generic, bool, int, float, \
+                                str)):
+            _pack_array(arrays, 'hgrid.' + attr, value)
+            attrs[attr] = 'array'
+        else:
+            print('%s is not saved in a grid snapshot, %s not written' \
+                  % (type(value).__name__, filename))
+            return
+
+    _pack_array(arrays, 'h', grd.vgrid.h)
+    if getattr(grd.vgrid, 'hraw', None) is not None:
+        _pack_array(arrays, 'hraw', grd.vgrid.hraw)
+
+    meta = {'version': _snapshot_version, 'name': grd.name, \
+            'source': None if source is None else source[0], \
+            'mtime': None if source is None else source[1], \
+            'class': type(hgrd).__name__, 'attrs': attrs, \
+            'vgrid': _vgrid_meta(grd.vgrid), 'arrays': sorted(arrays)}
+
+    # write to a temporary file or directory renamed in place, the
+    # workers of a pool may build the same snapshot concurrently
+    filename = os.path.abspath(filename)
+    dirname = os.path.dirname(filename)
+    if not os.path.isdir(dirname):
+        os.makedirs(dirname)
+
+    if filename.endswith('.npz'):
+        arrays['meta'] = np.array(json.dumps(meta))
+        fd, tmpfile = tempfile.mkstemp(suffix='.npz', dir=dirname)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, **arrays)
+            os.replace(tmpfile, filename)
+        except:
+            os.remove(tmpfile)
+            raise
+        return
+
+    tmpdir = tempfile.mkdtemp(dir=dirname)
+    try:
+        for name, value in arrays.items():
+            np.save(os.path.join(tmpdir, name + '.npy'), value)
+        with open(os.path.join(tmpdir, 'meta.json'), 'w') as f:
+            json.dump(meta, f)
+        if os.path.isdir(filename):
+            # move the older snapshot out of the way, the memory maps
+            # attached to it stay valid
+            olddir = tempfile.mkdtemp(dir=dirname)
+            os.rename(filename, os.path.join(olddir, 'old'))
+            shutil.rmtree(olddir, ignore_errors=True)
+        os.rename(tmpdir, filename)
+    except OSError:
+        # written meanwhile by another process
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        if not os.path.exists(os.path.join(filename, 'meta.json')):
+            raise
+
+
+def _load_grid_snapshot(filename):
+    # (meta, arrays) of the snapshot filename, the arrays of a
+    # directory snapshot are read-only memory maps
+    if filename.endswith('.npz'):
+        with np.load(filename, allow_pickle=False) as data:
+            arrays = dict(data)
+        meta = json.loads(str(arrays.pop('meta')))
+    else:
+        with open(os.path.join(filename, 'meta.json')) as f:
+            meta = json.load(f)
+        arrays = {}
+        for name in meta.get('arrays', []):
+            arrays[name] = np.load(os.path.join(filename, name + '.npy'), \
+                                   mmap_mode='r', allow_pickle=False)
+    return meta, arrays
+
+
+def _read_grid_snapshot(filename, source=None):
+    # (hgrd, h, hraw, meta) saved in filename, None if there is no
+    # snapshot or if it was not made from source (grid file path, mtime)
+    if not os.path.exists(os.path.join(filename, 'meta.json') \
+                          if os.path.isdir(filename) else filename):
+        return None
+
+    meta, data = _load_grid_snapshot(filename)
+    if meta['version'] != _snapshot_version:
+        return None
+    if source is not None and \
+       (meta['source'] != source[0] or meta['mtime'] != source[1]):
+        return None
+
+    cls = getattr(pyroms.hgrid, meta['class'])
+    hgrd = cls.__new__(cls)
+    for attr, value in meta['attrs'].items():
+        if value == 'array':
+            value = _unpack_array(data, 'hgrid.' + attr)
+            if value.ndim == 0:
+                value = value[()]
+        elif isinstance(value, dict):
+            value = Proj(value['proj'])
+        hgrd.__dict__[attr] = value
+
+    h = _unpack_array(data, 'h')
+    hraw = _unpack_array(data, 'hraw') if 'hraw' in data else None
+
+    return hgrd, h, hraw, meta
+
+
+def share_ROMS_grid(grd, dirname):
+    """
+    grd = share_ROMS_grid(grd, dirname)
+
+    Write the arrays of the horizontal grid and the bathymetry of grd
+    to the directory dirname (e.g. on /dev/shm) and return the grid
+    attached to them, see attach_ROMS_grid. The arrays are written once
+    by the parent process, the workers attach to them without copying.
+    """
+
+    _write_grid_snapshot(dirname, grd)
+    return attach_ROMS_grid(dirname)
+
+
+def attach_ROMS_grid(dirname, zeta=None):
+    """
+    grd = attach_ROMS_grid(dirname, zeta=None)
+
+    Return the ROMS_Grid saved in dirname by share_ROMS_grid (or by
+    get_ROMS_grid with a directory snapshot). Its horizontal grid
+    arrays, h and hraw are read-only np.memmap of the files of dirname,
+    so all the processes attached to dirname share the same physical
+    memory. The vertical grid is rebuilt over h with the free surface
+    zeta. The grid is pickled as a reference to dirname, so it is sent
+    to the workers of a process pool without its arrays.
+    """
+
+    dirname = os.path.abspath(dirname)
+    restored = _read_grid_snapshot(dirname)
+    if restored is None or not os.path.isdir(dirname):
+        raise ValueError('%s is not a shared ROMS grid directory' % dirname)
+    hgrd, h, hraw, meta = restored
+
+    vmeta = meta['vgrid']
+    if vmeta['class'] == 'z_coordinate':
+        vgrid = z_coordinate(h, np.array(vmeta['depth']), vmeta['N'])
+    else:
+        vgrid = getattr(pyroms.vgrid, vmeta['class'])(h, vmeta['theta_b'], \
+                    vmeta['theta_s'], vmeta['Tcline'], vmeta['N'], \
+                    hraw=hraw, zeta=zeta)
 
-    #Get ROMS grid
-    return ROMS_Grid(name, hgrd, vgrid)
+    grd = ROMS_Grid(meta['name'], hgrd, vgrid)
+    grd._shared = (dirname, zeta)
+    return grd
 
 
 def write_ROMS_grid(grd, filename='roms_grd.nc'):
@@ -10,11 +10,8 @@ from warnings import warn
 from copy import deepcopy
 
 import numpy as np
-import matplotlib as mpl
-import matplotlib.pyplot as plt
-from matplotlib.artist import Artist
-from matplotlib.patches import Polygon, CirclePolygon
-from matplotlib.lines import Line2D
+# matplotlib is imported by the interactive tools and mask_polygon only,
+# so that reading a grid does not load it
 #from matplotlib.mlab import dist_point_to_segment      # gone in 3.1.0
 #from matplotlib.nxutils import points_inside_poly      #decrepeted in version 1.3.0. Use maplotlib.path instead.
 
@@ -144,6 +141,7 @@ class BoundaryInteractor(object):
 
     def _poly_changed(self, poly):
         'this method is called whenever the polygon object is called'
+        from matplotlib.artist import Artist
         # only copy the artist props to the line (except visibility)
         vis = self._line.get_visible()
         Artist.update_from(self._line, poly)
@@ -321,6 +319,10 @@ class BoundaryInteractor(object):
 
         assert len(x) >= 4, 'Boundary must have at least four points.'
 
+        import matplotlib.pyplot as plt
+        from matplotlib.patches import Polygon
+        from matplotlib.lines import Line2D
+
         if ax is None:
             ax = plt.gca()
 
@@ -794,7 +796,8 @@ class CGrid(object):
         #inside = points_inside_poly(
         #    np.vstack( (self.x_rho.flatten(), self.y_rho.flatten()) ).T,
         #    polyverts)
-        path = mpl.path.Path(polyverts)
+        from matplotlib.path import Path
+        path = Path(polyverts)
         inside = path.contains_points(np.vstack( (self.x_rho.flatten(), self.y_rho.flatten()) ).T)
         if np.any(inside):
             self.mask_rho.flat[inside] = mask_value
@@ -1369,12 +1372,14 @@ class edit_mask_mesh_ij(object):
     """
 
     def _on_key(self, event):
+        import matplotlib.pyplot as plt
         if event.key == 'e':
             self._clicking = not self._clicking
             plt.title('Editing %s -- click "e" to toggle' % self._clicking)
             plt.draw()
 
     def _on_click(self, event):
+        import matplotlib.pyplot as plt
         x, y = event.xdata, event.ydata
         if event.button==1 and event.inaxes is not None and self._clicking == True:
             d = (x-self._xc)**2 + (y-self._yc)**2
@@ -1393,6 +1398,7 @@ class edit_mask_mesh_ij(object):
             plt.draw()
 
     def __init__(self, grd, coast=None, **kwargs):
+        import matplotlib.pyplot as plt
 
         if type(grd).__name__ == 'ROMS_Grid':
             try:
@@ -1574,6 +1580,8 @@ def uvp_masks(rmask):
 
 
 if __name__ == '__main__':
+    import matplotlib.pyplot as plt
+
     geographic = False
     if geographic:
         import cartopy.crs as ccrs
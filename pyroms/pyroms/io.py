@@ -36,6 +36,7 @@ with an input of a netCDF4.Dataset or MFnetCDF4.Dataset object:
 __docformat__ = "restructuredtext en"
 
 from glob import glob
+from collections import OrderedDict
 
 try:
     try:
@@ -97,6 +98,69 @@ except:
     Dataset.__doc__ = __doc__
 
 
+class DatasetPool(object):
+    """
+    pool = DatasetPool(maxopen=16)
+
+    Pool of open datasets, keyed by file name (or list of files).
+
+      nc = pool.dataset(filename)
+      var = pool.variable(filename, varname)
+
+    open filename with Dataset the first time it is asked for, and
+    return the same handle afterwards, so that the loops over time
+    records and variables parse the file metadata once. At most
+    maxopen datasets are kept open, the least recently used one is
+    closed first.
+
+      pool.close(filename=None)
+
+    close the dataset of filename, or all of them. The pool can be
+    used as a context manager, all the datasets are closed on exit.
+    """
+
+    def __init__(self, maxopen=16):
+        self.maxopen = maxopen
+        self._datasets = OrderedDict()
+
+    def _key(self, filename):
+        if isinstance(filename, (list, tuple)):
+            return tuple(sorted(filename))
+        return filename
+
+    def dataset(self, filename):
+        key = self._key(filename)
+        if key in self._datasets:
+            self._datasets.move_to_end(key)
+            return self._datasets[key]
+        nc = Dataset(filename)
+        self._datasets[key] = nc
+        while len(self._datasets) > max(self.maxopen, 1):
+            self._datasets.popitem(last=False)[1].close()
+        return nc
+
+    def variable(self, filename, varname):
+        return self.dataset(filename).variables[varname]
+
+    def close(self, filename=None):
+        if filename is None:
+            while self._datasets:
+                self._datasets.popitem(last=False)[1].close()
+        else:
+            nc = self._datasets.pop(self._key(filename), None)
+            if nc is not None:
+                nc.close()
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
 if __name__ == '__main__':
     pass
 
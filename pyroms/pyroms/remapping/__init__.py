@@ -5,18 +5,33 @@ A set of tools for remapping
 
 import logging
 
-from .make_remap_grid_file import make_remap_grid_file
+from .make_remap_grid_file import make_remap_grid_file, get_remap_grid, \
+                                  write_remap_grid_file
 from .compute_remap_weights import compute_remap_weights
+from .compute_scrip_weights import compute_scrip_weights, \
+                                   read_remap_grid_file, write_scrip_weights
 from .test_remap_weights import test_remap_weights
 from .remap import remap
 from .remap2 import remap2
+from .remap_operator import RemapOperator, get_remap_operator, \
+                            clear_remap_operator_cache
+from .remap_batch import remap_batch
+from .remap_gradients import remap_gradients
+from .weight_store import WeightStore
 try:
     from pyroms import scrip
 except ImportError:
     logging.warning(' scrip could not be imported. Remapping functions will not be available')
-from .roms2z import roms2z
+from .roms2z import roms2z, roms2z_interp
 from .sta2z import sta2z
-from .z2roms import z2roms
+from .z2roms import z2roms, z2roms_interp
+from .precision import get_dtype, set_dtype
+from .vinterp import VerticalInterp, get_vertical_interp, \
+                     clear_vertical_interp_cache
+from .uv_transform import UVTransform, DepthAverage, get_uv_transform, \
+                          get_depth_average, clear_uv_transform_cache
 from .flood import flood
+from .flood_plan import FloodPlan, make_flood_plan, load_flood_plan
 from .flood2d import flood2d
+from .creeping_sea import creeping_sea
 
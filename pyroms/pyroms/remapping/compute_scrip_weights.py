@@ -0,0 +1,384 @@
+# encoding: utf-8
+
+import os
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.spatial import cKDTree
+try:
+    import netCDF4 as netCDF
+except:
+    import netCDF3 as netCDF
+
+
+# bilinear iteration parameters, same as scrip
+max_iter = 100
+converge = 1.e-10
+
+
+def read_remap_grid_file(grid_file):
+    '''
+    grid = read_remap_grid_file(grid_file)
+
+    Read a scrip grid file, as written by make_remap_grid_file, and
+    return a dictionary with the grid name, dims (nx, ny), the
+    center and corner coordinates in radians and the mask.
+    '''
+
+    nc = netCDF.Dataset(grid_file, 'r')
+
+    grid = {}
+    try:
+        grid['name'] = nc.title
+    except AttributeError:
+        grid['name'] = os.path.basename(grid_file)
+    grid['dims'] = np.array(nc.variables['grid_dims'][:], dtype=int)
+    grid['center_lon'] = np.array(nc.variables['grid_center_lon'][:], dtype='f8')
+    grid['center_lat'] = np.array(nc.variables['grid_center_lat'][:], dtype='f8')
+    grid['imask'] = np.array(nc.variables['grid_imask'][:], dtype='i4')
+    if 'grid_corner_lon' in nc.variables:
+        grid['corner_lon'] = np.array(nc.variables['grid_corner_lon'][:], dtype='f8')
+        grid['corner_lat'] = np.array(nc.variables['grid_corner_lat'][:], dtype='f8')
+    else:
+        grid['corner_lon'] = None
+        grid['corner_lat'] = None
+    try:
+        grid['units'] = nc.variables['grid_center_lat'].units
+    except AttributeError:
+        grid['units'] = 'radians'
+
+    nc.close()
+
+    # work in radians, like scrip
+    if grid['units'].startswith('degree'):
+        for key in ['center_lon', 'center_lat', 'corner_lon', 'corner_lat']:
+            if grid[key] is not None:
+                grid[key] = np.deg2rad(grid[key])
+
+    return grid
+
+
+def _xyz(lon, lat):
+    # position on the unit sphere
+    coslat = np.cos(lat)
+    return np.c_[coslat * np.cos(lon), coslat * np.sin(lon), np.sin(lat)]
+
+
+def _wrap(dlon):
+    # longitude differences in [-3pi/2, 3pi/2], as scrip does
+    dlon = np.where(dlon > 1.5 * np.pi, dlon - 2 * np.pi, dlon)
+    return np.where(dlon < -1.5 * np.pi, dlon + 2 * np.pi, dlon)
+
+
+class _SourceSearch(object):
+    # KD-trees on the unit sphere for the source grid centers
+
+    def __init__(self, src):
+        self.nx, self.ny = src['dims']
+        self.lon = src['center_lon']
+        self.lat = src['center_lat']
+        self.mask = src['imask'] != 0
+        xyz = _xyz(self.lon, self.lat)
+        self.tree = cKDTree(xyz)
+        self.wet = np.where(self.mask)[0]
+        self.wet_tree = cKDTree(xyz[self.wet])
+
+    def nearest_wet(self, xyz, k):
+        # k nearest unmasked source points and their angular distance
+        k = min(k, len(self.wet))
+        chord, idx = self.wet_tree.query(xyz, k=k)
+        chord = chord.reshape((len(xyz), k))
+        idx = idx.reshape((len(xyz), k))
+        return self.wet[idx], 2 * np.arcsin(np.minimum(chord / 2, 1.))
+
+
+def _distwgt_weights(dist):
+    # inverse distance weights, an exact match takes all the weight
+    exact = dist <= 1.e-12
+    dist = np.where(exact, 1., dist)
+    wgts = np.where(np.any(exact, axis=1)[:, np.newaxis], \
+                    exact.astype(float), 1. / dist)
+    return wgts / wgts.sum(axis=1)[:, np.newaxis]
+
+
+def _distwgt_links(search, plon, plat, num_neighbors):
+    src_add, dist = search.nearest_wet(_xyz(plon, plat), num_neighbors)
+    return src_add, _distwgt_weights(dist)
+
+
+def _bilinear_links(search, plon, plat, periodic):
+    nx, ny = search.nx, search.ny
+    npts = len(plon)
+
+    # candidate cells: the source cells that have one of the 4 nearest
+    # source centers as a corner. Cell (j,i) has corners (j,i),
+    # (j,i+1), (j+1,i+1) and (j+1,i).
+    _, near = search.tree.query(_xyz(plon, plat), k=min(4, nx*ny))
+    near = near.reshape((npts, -1))
+    jn = near // nx
+    iin = near % nx
+    cj = (jn[:, :, np.newaxis] + np.array([0, 0, -1, -1])).reshape((npts, -1))
+    ci = (iin[:, :, np.newaxis] + np.array([0, -1, 0, -1])).reshape((npts, -1))
+    if periodic:
+        ci = ci % nx
+        valid = (cj >= 0) & (cj < ny - 1)
+    else:
+        valid = (cj >= 0) & (cj < ny - 1) & (ci >= 0) & (ci < nx - 1)
+    cj = np.where(valid, cj, 0)
+    ci = np.where(valid, ci, 0)
+    ip1 = (ci + 1) % nx
+    corners = np.stack([cj * nx + ci, cj * nx + ip1, \
+                        (cj + 1) * nx + ip1, (cj + 1) * nx + ci], axis=-1)
+
+    lat = search.lat[corners]
+    lon = search.lon[corners]
+    plat = plat[:, np.newaxis]
+    plon = plon[:, np.newaxis]
+
+    # iterate to find i,j for bilinear approximation
+    dth1 = lat[..., 1] - lat[..., 0]
+    dth2 = lat[..., 3] - lat[..., 0]
+    dth3 = lat[..., 2] - lat[..., 1] - dth2
+    dph1 = _wrap(lon[..., 1] - lon[..., 0])
+    dph2 = _wrap(lon[..., 3] - lon[..., 0])
+    dph3 = _wrap(lon[..., 2] - lon[..., 1]) - dph2
+    dphp0 = _wrap(plon - lon[..., 0])
+
+    iguess = np.full(valid.shape, 0.5)
+    jguess = np.full(valid.shape, 0.5)
+    converged = np.zeros(valid.shape, dtype=bool)
+    failed = ~valid
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for n in range(max_iter):
+            active = ~(converged | failed)
+            if not active.any():
+                break
+            dthp = plat - lat[..., 0] - dth1 * iguess - dth2 * jguess - \
+                   dth3 * iguess * jguess
+            dphp = dphp0 - dph1 * iguess - dph2 * jguess - \
+                   dph3 * iguess * jguess
+            mat1 = dth1 + dth3 * jguess
+            mat2 = dth2 + dth3 * iguess
+            mat3 = dph1 + dph3 * jguess
+            mat4 = dph2 + dph3 * iguess
+            determinant = mat1 * mat4 - mat2 * mat3
+            deli = (dthp * mat4 - mat2 * dphp) / determinant
+            delj = (mat1 * dphp - dthp * mat3) / determinant
+            bad = active & (~np.isfinite(deli) | ~np.isfinite(delj))
+            failed |= bad
+            step = active & ~bad
+            iguess += np.where(step, deli, 0.)
+            jguess += np.where(step, delj, 0.)
+            converged |= step & (np.abs(deli) < converge) & \
+                                (np.abs(delj) < converge)
+
+    tol = 1.e-6
+    inside = converged & (iguess >= -tol) & (iguess <= 1 + tol) & \
+             (jguess >= -tol) & (jguess <= 1 + tol)
+    found = inside.any(axis=1)
+    cand = np.argmax(inside, axis=1)
+    rows = np.arange(npts)
+    ig = np.clip(iguess[rows, cand], 0., 1.)
+    jg = np.clip(jguess[rows, cand], 0., 1.)
+    src_add = corners[rows, cand]
+
+    wgts = np.stack([(1 - ig) * (1 - jg), ig * (1 - jg), ig * jg, \
+                     (1 - ig) * jg], axis=-1)
+
+    # land corners are dropped and the weights renormalized
+    wgts = np.where(search.mask[src_add], wgts, 0.)
+    wsum = wgts.sum(axis=1)
+    good = found & (wsum > 0)
+    wgts[good] /= wsum[good][:, np.newaxis]
+
+    # cell found but surrounded by land, use the nearest wet neighbours
+    land = found & ~good
+    if land.any():
+        nbr_add, nbr_wgts = _distwgt_links(search, plon[land, 0], \
+                                           plat[land, 0], 4)
+        k = nbr_add.shape[1]
+        src_add[land] = 0
+        wgts[land] = 0.
+        src_add[land, :k] = nbr_add
+        wgts[land, :k] = nbr_wgts
+
+    # points outside of the source grid are left without links
+    wgts[~found] = 0.
+
+    return src_add, wgts
+
+
+def _compute_links(src, dst, map_method, num_neighbors=4, \
+                   grid1_periodic=False, nthreads=None, tile_size=100000):
+    # return (src_address, dst_address, weights), 1-based addresses
+    # sorted by destination address
+
+    search = _SourceSearch(src)
+    dst_wet = np.where(dst['imask'] != 0)[0]
+
+    if nthreads is None:
+        nthreads = os.cpu_count() or 1
+    ntiles = max(int(np.ceil(len(dst_wet) / float(tile_size))), 1)
+    tiles = np.array_split(dst_wet, ntiles)
+
+    def _tile(dst_add):
+        plon = dst['center_lon'][dst_add]
+        plat = dst['center_lat'][dst_add]
+        if map_method == 'bilinear':
+            src_add, wgts = _bilinear_links(search, plon, plat, grid1_periodic)
+        else:
+            src_add, wgts = _distwgt_links(search, plon, plat, num_neighbors)
+        dst_add = np.repeat(dst_add[:, np.newaxis], wgts.shape[1], axis=1)
+        keep = wgts != 0
+        return src_add[keep], dst_add[keep], wgts[keep]
+
+    if nthreads > 1 and ntiles > 1:
+        with ThreadPoolExecutor(max_workers=nthreads) as pool:
+            links = list(pool.map(_tile, tiles))
+    else:
+        links = [_tile(tile) for tile in tiles]
+
+    src_add = np.concatenate([l[0] for l in links]).astype('i4') + 1
+    dst_add = np.concatenate([l[1] for l in links]).astype('i4') + 1
+    wgts = np.concatenate([l[2] for l in links])
+
+    return src_add, dst_add, wgts
+
+
+def write_scrip_weights(interp_file, map_name, src, dst, src_add, \
+                        dst_add, wgts, map_method, normalize_opt='fracarea'):
+    '''
+    write_scrip_weights(interp_file, map_name, src, dst, src_add, \
+                        dst_add, wgts, map_method)
+
+    Write addresses and weights to interp_file following the scrip
+    conventions. src and dst are grids as returned by
+    read_remap_grid_file.
+    '''
+
+    method_names = {'bilinear': 'Bilinear remapping', \
+                    'distwgt': 'Distance weighted avg of nearest neighbors'}
+
+    if wgts.ndim == 1:
+        wgts = wgts[:, np.newaxis]
+
+    nc = netCDF.Dataset(interp_file, 'w', format='NETCDF3_64BIT')
+    nc.title = map_name
+    nc.normalization = normalize_opt
+    nc.map_method = method_names[map_method]
+    nc.history = 'Created: ' + datetime.now().strftime("%m-%d-%Y")
+    nc.conventions = 'SCRIP'
+    nc.source_grid = src['name']
+    nc.dest_grid = dst['name']
+
+    for pre, grd in [('src', src), ('dst', dst)]:
+        size = len(grd['imask'])
+        nc.createDimension(pre + '_grid_size', size)
+        if grd['corner_lon'] is not None:
+            nc.createDimension(pre + '_grid_corners', grd['corner_lon'].shape[1])
+        nc.createDimension(pre + '_grid_rank', len(grd['dims']))
+    nc.createDimension('num_links', len(src_add))
+    nc.createDimension('num_wgts', wgts.shape[1])
+
+    for pre, grd in [('src', src), ('dst', dst)]:
+        nc.createVariable(pre + '_grid_dims', 'i4', (pre + '_grid_rank',))
+        nc.variables[pre + '_grid_dims'][:] = grd['dims']
+
+        # coordinates are written back in the units of the grid file
+        if grd['units'].startswith('degree'):
+            conv = np.rad2deg
+        else:
+            conv = np.asarray
+        for coord in ['center_lat', 'center_lon']:
+            name = pre + '_grid_' + coord
+            nc.createVariable(name, 'f8', (pre + '_grid_size',))
+            nc.variables[name].units = grd['units']
+            nc.variables[name][:] = conv(grd[coord])
+        if grd['corner_lon'] is not None:
+            for coord in ['corner_lat', 'corner_lon']:
+                name = pre + '_grid_' + coord
+                nc.createVariable(name, 'f8', \
+                                  (pre + '_grid_size', pre + '_grid_corners'))
+                nc.variables[name].units = grd['units']
+                nc.variables[name][:] = conv(grd[coord])
+
+        nc.createVariable(pre + '_grid_imask', 'i4', (pre + '_grid_size',))
+        nc.variables[pre + '_grid_imask'].units = 'unitless'
+        nc.variables[pre + '_grid_imask'][:] = grd['imask']
+
+        nc.createVariable(pre + '_grid_area', 'f8', (pre + '_grid_size',))
+        nc.variables[pre + '_grid_area'].units = 'square radians'
+        nc.variables[pre + '_grid_area'][:] = 0.
+
+    frac = np.zeros(len(dst['imask']))
+    frac[dst_add - 1] = 1.
+    nc.createVariable('src_grid_frac', 'f8', ('src_grid_size',))
+    nc.variables['src_grid_frac'].units = 'unitless'
+    nc.variables['src_grid_frac'][:] = 0.
+    nc.createVariable('dst_grid_frac', 'f8', ('dst_grid_size',))
+    nc.variables['dst_grid_frac'].units = 'unitless'
+    nc.variables['dst_grid_frac'][:] = frac
+
+    nc.createVariable('src_address', 'i4', ('num_links',))
+    nc.variables['src_address'][:] = src_add
+    nc.createVariable('dst_address', 'i4', ('num_links',))
+    nc.variables['dst_address'][:] = dst_add
+    nc.createVariable('remap_matrix', 'f8', ('num_links', 'num_wgts'))
+    nc.variables['remap_matrix'][:] = wgts
+
+    nc.close()
+
+
+def compute_scrip_weights(grid1_file, grid2_file, \
+       interp_file1, interp_file2, map1_name, \
+       map2_name, num_maps, map_method, \
+       normalize_opt='fracarea', grid1_periodic=False, \
+       grid2_periodic=False, num_neighbors=4, nthreads=None, \
+       tile_size=100000):
+    '''
+    compute remap weights and addresses in python
+
+    Drop-in replacement of compute_remap_weights for the
+    'bilinear', 'distwgt' (inverse distance weighted average of the
+    num_neighbors nearest neighbours) and 'nearest' (distwgt with a
+    single neighbour) methods. It does not write any namelist, so
+    several weights can be computed at the same time in the same
+    directory.
+
+    optional switch:
+      - num_neighbors=4              number of neighbours for distwgt
+      - nthreads=None                number of threads working on
+                                     destination tiles, default to the
+                                     number of cpus
+      - tile_size=100000             number of destination points
+                                     per tile
+
+    The source points are searched with KD-trees on the unit sphere
+    and the destination grid is processed by tiles of tile_size points
+    in parallel. The weights are written to interp_file1 (and
+    interp_file2 for the reverse mapping when num_maps=2) following
+    the scrip conventions.
+    '''
+
+    if map_method == 'nearest':
+        map_method = 'distwgt'
+        num_neighbors = 1
+    if map_method not in ['bilinear', 'distwgt']:
+        raise ValueError('map_method must be bilinear, distwgt or nearest')
+
+    grid1 = read_remap_grid_file(grid1_file)
+    grid2 = read_remap_grid_file(grid2_file)
+
+    maps = [(grid1, grid2, interp_file1, map1_name, grid1_periodic)]
+    if num_maps == 2:
+        maps.append((grid2, grid1, interp_file2, map2_name, grid2_periodic))
+
+    for src, dst, interp_file, map_name, periodic in maps:
+        src_add, dst_add, wgts = _compute_links(src, dst, map_method, \
+                                     num_neighbors=num_neighbors, \
+                                     grid1_periodic=periodic, \
+                                     nthreads=nthreads, tile_size=tile_size)
+        write_scrip_weights(interp_file, map_name, src, dst, src_add, \
+                            dst_add, wgts, map_method, \
+                            normalize_opt=normalize_opt)
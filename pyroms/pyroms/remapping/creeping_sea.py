@@ -0,0 +1,117 @@
+# encoding: utf-8
+
+import numpy as np
+from scipy import ndimage
+
+from .precision import get_dtype
+
+
+# neighbour weights, direct neighbours count twice
+_weights = np.array([[1., 2., 1.], \
+                     [2., 0., 2.], \
+                     [1., 2., 1.]])
+
+
+def creeping_sea(varz, spval=1e37, validmin=None, validmax=None, \
+                 mask=None, nmax=3500, min_weight=3, verbose=False, \
+                 dtype=None):
+    """
+    var = creeping_sea(var)
+
+    optional switch:
+      - spval=1e37                   define spval value
+      - validmin=None                values <= validmin are missing
+      - validmax=None                values >= validmax are missing
+      - mask=None                    if given (y,x), only the missing
+                                     points where mask is 1 are filled
+      - nmax=3500                    maximum number of iterations
+      - min_weight=3                 a missing point is filled once the
+                                     weight of its wet neighbours is at
+                                     least min_weight
+      - verbose=False                print the number of iterations
+      - dtype=None                   dtype of var ('f4' or 'f8'), default
+                                     to pyroms.remapping.get_dtype()
+
+    Creeping sea extrapolation of var (2D, or nD with the horizontal
+    dimensions last): at each iteration, every missing point whose
+    wet neighbours weigh at least min_weight (direct neighbours count
+    2, diagonal ones 1) takes the weighted average of their values,
+    and becomes wet for the next iteration. All the levels are filled
+    together. The iterations stop when every point is filled, when an
+    iteration does not fill any new point, or after nmax iterations.
+    The points that could not be filled are set to spval.
+
+    Same algorithm as the cslf routine of the creeping_sea.f90 module
+    of pyroms_toolbox, without the dependency on the compiled module.
+    """
+
+    dtype = get_dtype(dtype)
+    var = np.array(np.ma.filled(varz, spval), dtype=dtype)
+    shape = var.shape
+    var = var.reshape((-1,) + shape[-2:])
+
+    with np.errstate(invalid='ignore'):
+        wet = ~np.isnan(var) & (abs((var - spval) / spval) > 1e-5)
+        if validmin is not None:
+            wet &= var > validmin
+        if validmax is not None:
+            wet &= var < validmax
+    fill = ~wet
+    if mask is not None:
+        fill &= (np.asarray(mask) == 1)[np.newaxis,:,:]
+
+    if wet.any():
+        vmin = var[wet].min()
+        vmax = var[wet].max()
+    var[~wet] = 0.
+
+    # weighted sum (num) and weight (cnt) of the wet neighbours, with
+    # a one point halo that is never filled
+    halo = ((0,0), (1,1), (1,1))
+    wet = np.pad(wet, halo)
+    fill = np.pad(fill, halo)
+    var = np.pad(var, halo)
+    weights = _weights[np.newaxis,:,:].astype(dtype)
+    cnt = ndimage.correlate(wet.astype(dtype), weights, mode='constant')
+    num = ndimage.correlate(var, weights, mode='constant')
+    wet = wet.reshape(-1)
+    fill = fill.reshape(-1)
+    var = var.reshape(-1)
+    cnt = cnt.reshape(-1)
+    num = num.reshape(-1)
+
+    # flat offsets of the neighbours
+    nx = shape[-1] + 2
+    offsets = [(dj * nx + di, _weights[dj+1,di+1]) \
+               for dj in (-1,0,1) for di in (-1,0,1) if dj or di]
+
+    # points filled at each iteration, the count of a missing point
+    # only changes when one of its neighbours has just been filled
+    new = np.where(fill & (cnt >= min_weight))[0]
+    nt = 0
+    while len(new) and nt < nmax:
+        var[new] = num[new] / cnt[new]
+        wet[new] = True
+        fill[new] = False
+        nt = nt + 1
+        for off, w in offsets:
+            cnt[new + off] += w
+            num[new + off] += w * var[new]
+        near = np.unique(np.concatenate([new + off for off, w in offsets]))
+        new = near[fill[near] & (cnt[near] >= min_weight)]
+
+    if verbose:
+        print('creeping_sea: ', nt, ' iterations')
+    if len(new):
+        print('WARNING: creeping_sea did not converge after ', nmax, \
+              ' iterations')
+
+    var = var.reshape((-1, shape[-2]+2, nx))[:,1:-1,1:-1]
+    wet = wet.reshape((-1, shape[-2]+2, nx))[:,1:-1,1:-1]
+
+    # bound the values with the min/max of the input
+    if wet.any():
+        var = np.clip(var, vmin, vmax)
+    var[~wet] = spval
+
+    return var.reshape(shape)
@@ -4,11 +4,107 @@ import numpy as np
 
 import pyroms
 from scipy.spatial import cKDTree
-
+from .compute_scrip_weights import _xyz, _distwgt_weights
+from .precision import get_dtype
+
+
+class _NearestWet(object):
+    # nearest wet point search for successive levels. The KD-tree of
+    # the wet points is kept as long as the wet set does not change.
+    # When the wet set of a level is included in the one of the
+    # previous level, the nearest wet point found for the previous
+    # level is still the nearest one if it is wet, so only the other
+    # dry points are searched again.
+
+    def __init__(self, x, y):
+        self.xy = np.c_[np.asarray(x, dtype='f8').reshape(-1), \
+                        np.asarray(y, dtype='f8').reshape(-1)]
+        self.wet = None
+        self.tree = None
+        self.near = -np.ones(self.xy.shape[0], dtype=np.int64)
+
+    def nearest(self, wet, dry):
+        # return the index of the nearest wet point of each dry point
+        # (wet is a boolean array, dry an index array over the grid)
+        if self.wet is None or np.any(wet & ~self.wet):
+            self.near[:] = -1
+            self.tree = None
+        elif np.any(self.wet & ~wet):
+            self.tree = None
+        self.wet = wet
+
+        near = self.near[dry]
+        known = near >= 0
+        known[known] = wet[near[known]]
+        need = dry[~known]
+
+        if len(need):
+            if self.tree is None:
+                self.iwet = np.where(wet)[0]
+                self.tree = cKDTree(self.xy[self.iwet], balanced_tree=False, \
+                                    compact_nodes=False)
+            _, ii = self.tree.query(self.xy[need], k=1)
+            self.near[need] = self.iwet[ii]
+
+        return self.near[dry]
+
+
+def _idw_flood(varz, x, y, c1, kk, nnear, dmax):
+    # inverse distance weighted flood of the levels 1 to nlev-1 of
+    # varz (nan at dry points), in place. The wet points of all the
+    # levels are put in one KD-tree on the unit sphere, the levels
+    # being kept apart by a 4th coordinate (4 * level) larger than
+    # any chord, so all the dry points are searched in one query.
+    nlev = varz.shape[0]
+    var = varz.reshape((nlev, -1))
+    nan = np.isnan(var)
+
+    xyz = _xyz(np.deg2rad(np.asarray(x, dtype='f8').reshape(-1)), \
+               np.deg2rad(np.asarray(y, dtype='f8').reshape(-1)))
+    wet_lev, wet_pt = np.where(~nan)
+    if len(wet_lev) == 0:
+        return
+    dry_lev, dry_pt = np.where(c1[np.newaxis,:] & nan)
+    keep = dry_lev > 0
+    dry_lev = dry_lev[keep]
+    dry_pt = dry_pt[keep]
+    if len(dry_lev) == 0:
+        return
+
+    if dmax > 0:
+        bound = min(2 * np.sin(np.deg2rad(dmax) / 2), 3.)
+    else:
+        bound = 3.
+    tree = cKDTree(np.c_[xyz[wet_pt], 4. * wet_lev])
+    chord, ii = tree.query(np.c_[xyz[dry_pt], 4. * dry_lev], k=nnear, \
+                           distance_upper_bound=bound)
+    chord = chord.reshape((len(dry_lev), -1))
+    ii = ii.reshape((len(dry_lev), -1))
+    found = ii < len(wet_lev)
+    reach = found.any(axis=1)
+
+    # with kk, a dry point is only flooded if the point kk levels
+    # above it is wet, or has been flooded
+    if kk != 0:
+        wet = ~nan
+        bounds = np.searchsorted(dry_lev, np.arange(nlev+1))
+        for k in range(nlev-1,0,-1):
+            sel = slice(bounds[k], bounds[k+1])
+            above = wet[min(k+kk,nlev-1), dry_pt[sel]]
+            reach[sel] &= above
+            wet[k, dry_pt[sel][reach[sel]]] = True
+
+    # neighbours beyond dmax get no weight
+    dist = 2 * np.arcsin(np.minimum(chord[reach] / 2, 1.))
+    dist = np.where(found[reach], dist, np.inf)
+    wgts = _distwgt_weights(dist)
+    ii = np.where(found[reach], ii[reach], 0)
+    values = var[wet_lev[ii], wet_pt[ii]]
+    var[dry_lev[reach], dry_pt[reach]] = (wgts * values).sum(axis=1)
 
 
 def flood(varz, grdz, Cpos='rho', irange=None, jrange=None, \
-          spval=1e37, dmax=0, cdepth=0, kk=0):
+          spval=1e37, dmax=0, cdepth=0, kk=0, nnear=1, dtype=None):
     """
     var = flood(var, grdz)
 
@@ -19,18 +115,26 @@ def flood(varz, grdz, Cpos='rho', irange=None, jrange=None, \
       - jrange                       specify grid sub-sample for j direction
       - spval=1e37                   define spval value
       - dmax=0                       if dmax>0, maximum horizontal
-                                     flooding distance
+                                     flooding distance (degrees)
       - cdepth=0                     critical depth for flooding
                                      if depth<cdepth => no flooding
       - kk
+      - nnear=1                      number of wet points used to
+                                     flood a dry point
+      - dtype=None                   dtype of var ('f4' or 'f8'), default
+                                     to pyroms.remapping.get_dtype()
 
     Flood varz on gridz
+
+    With nnear=1 a dry point takes the value of the nearest wet point
+    of its level (distance in lon/lat). With nnear>1 it takes the
+    inverse distance weighted average of the nnear nearest wet points
+    (great circle distance), searched for all the dry points of all
+    the levels with a single KD-tree query. Such a flood is not a
+    gather, make_flood_plan only accepts nnear=1.
     """
-    # from pyroms import _remapping
-    from .. import _remapping
 
-    varz = varz.copy()
-    varz = np.array(varz)
+    varz = np.array(varz, dtype=get_dtype(dtype))
 
     assert len(varz.shape) == 3, 'var must be 3D'
 
@@ -94,44 +198,32 @@ def flood(varz, grdz, Cpos='rho', irange=None, jrange=None, \
         msk[idx] = 1
     else:
         msk = mask.copy()
-    for k in range(nlev-1,0,):
-        c1 = np.array(msk, dtype=bool)
-        c2 = np.isnan(varz[k,:,:]) == 1
-        if kk == 0:
-            c3 = np.ones(mask.shape).astype(bool)
-        else:
-            c3 = np.isnan(varz[min(k+kk,nlev-1),:,:]) == 0
-        c = c1 & c2 & c3
-        idxnan = np.where(c == True)
-        idx = np.where(c2 == False)
-        if list(idx[0]):
-            wet = np.zeros((len(idx[0]),2))
-            dry = np.zeros((len(idxnan[0]),2))
-            wet[:,0] = idx[0]+1
-            wet[:,1] = idx[1]+1
-            dry[:,0] = idxnan[0]+1
-            dry[:,1] = idxnan[1]+1
-            xwet = x[wet[:,0], wet[:,1]]
-            ywet = y[wet[:,0], wet[:,1]]
-            xdry = x[dry[:,0], dry[:,1]]
-            ydry = y[dry[:,0], dry[:,1]]
-
-            xy = np.array([xdry,ydry])
-            tree = cKDTree(np.c_[xwet, ywet])
-            _, ii = tree.query(xy.T, k=1)
-            varz[k,dry[:,0], dry[:,1]] = varz[k,wet[ii,0],wet[ii,1]]
-
+    c1 = np.array(msk, dtype=bool).flatten()
+    if nnear > 1:
+        _idw_flood(varz, x, y, c1, kk, nnear, dmax)
+    else:
+        search = _NearestWet(x, y)
+        xy = search.xy
+        for k in range(nlev-1,0,-1):
+            var = varz[k,:,:].reshape(-1)
+            c2 = np.isnan(var)
+            if kk == 0:
+                c3 = True
+            else:
+                c3 = ~np.isnan(varz[min(k+kk,nlev-1),:,:].reshape(-1))
+            dry = np.where(c1 & c2 & c3)[0]
+            if len(dry) and not c2.all():
+                near = search.nearest(~c2, dry)
+                if dmax > 0:
+                    d = np.hypot(*(xy[dry] - xy[near]).T)
+                    dry = dry[d < dmax]
+                    near = near[d < dmax]
+                var[dry] = var[near]
 
     # drop the deepest values down
     idx = np.where(np.isnan(varz) == 1)
     varz[idx] = spval
-    bottom = pyroms.utility.get_bottom(varz, mask, spval=spval)
-    surface = pyroms.utility.get_surface(varz, mask, spval=spval)
-    for i in range(Lm):
-        for j in range(Mm):
-            if mask[j,i] == 1:
-                varz[:int(bottom[j,i]),j,i] = varz[int(bottom[j,i]),j,i]
-                varz[int(surface[j,i]):,j,i] = varz[int(surface[j,i]),j,i]
+    varz = pyroms.utility.fill_columns(varz, mask, spval=spval)
 
     return varz
 
@@ -240,12 +332,7 @@ def flood_modified(varz, Cgrd, Cpos='t', irange=None, jrange=None, \
     # drop the deepest values down
     idx = np.where(np.isnan(varz) == 1)
     varz[idx] = spval
-    bottom = pyroms.utility.get_bottom(varz[::-1,:,:], mask, spval=spval)
-    bottom = (nlev-1) - bottom
-    for i in range(Lm):
-        for j in range(Mm):
-            if mask[j,i] == 1:
-                varz[int(bottom[j,i]):,j,i] = varz[int(bottom[j,i]),j,i]
+    varz = pyroms.utility.fill_columns(varz, mask, spval=spval, first=False)
 
     return varz
 
@@ -357,12 +444,6 @@ def flood_original(varz, grdz, Cpos='rho', irange=None, jrange=None, \
     # drop the deepest values down
     idx = np.where(np.isnan(varz) == 1)
     varz[idx] = spval
-    bottom = pyroms.utility.get_bottom(varz, mask, spval=spval)
-    surface = pyroms.utility.get_surface(varz, mask, spval=spval)
-    for i in range(Lm):
-        for j in range(Mm):
-            if mask[j,i] == 1:
-                varz[:int(bottom[j,i]),j,i] = varz[int(bottom[j,i]),j,i]
-                varz[int(surface[j,i]):,j,i] = varz[int(surface[j,i]),j,i]
+    varz = pyroms.utility.fill_columns(varz, mask, spval=spval)
 
     return varz
@@ -2,8 +2,10 @@
 
 import numpy as np
 
+from .precision import get_dtype
+
 def flood2d(varz, grdz, Cpos='rho', irange=None, jrange=None, \
-          spval=1e37, dmax=0, cdepth=0, kk=0):
+          spval=1e37, dmax=0, cdepth=0, kk=0, dtype=None):
     """
     var = flood(var, grdz)
 
@@ -15,6 +17,8 @@ def flood2d(varz, grdz, Cpos='rho', irange=None, jrange=None, \
       - spval=1e37                   define spval value
       - dmax=0                       if dmax>0, maximum horizontal
                                      flooding distance
+      - dtype=None                   dtype of var ('f4' or 'f8'), default
+                                     to pyroms.remapping.get_dtype()
     Flood varz on gridz
     """
     from .. import _remapping
@@ -90,4 +94,4 @@ def flood2d(varz, grdz, Cpos='rho', irange=None, jrange=None, \
 
         varz = _remapping.flood(varz, wet, dry, x, y, dmax)
 
-    return varz
+    return np.asarray(varz, dtype=get_dtype(dtype))
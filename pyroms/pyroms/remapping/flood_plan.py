@@ -0,0 +1,185 @@
+# encoding: utf-8
+
+import json
+import inspect
+import numpy as np
+
+
+# floods that copy to every dry point the value of one wet point (the
+# nearest one), the only ones a FloodPlan can reproduce. Averaging
+# floods (creeping_sea, Grid_HYCOM.flood_fast and flood_fast_weighted,
+# CGrid_GLORYS.flood2d, ...) are not gathers.
+_gather_floods = ['pyroms.remapping.flood.flood', \
+                  'pyroms.remapping.flood.flood_modified', \
+                  'pyroms.remapping.flood.flood_original', \
+                  'pyroms_toolbox.BGrid_GFDL.flood.flood', \
+                  'pyroms_toolbox.BGrid_POP.flood.flood', \
+                  'pyroms_toolbox.BGrid_SODA.flood.flood', \
+                  'pyroms_toolbox.CGrid_GLORYS.flood.flood', \
+                  'pyroms_toolbox.Grid_HYCOM.flood.flood']
+
+
+def _missing(varz, spval):
+    # spval, nan or masked points of varz
+    missing = np.ma.getmaskarray(varz)
+    varz = np.ma.getdata(varz)
+    with np.errstate(invalid='ignore'):
+        missing = missing | np.isnan(varz) | \
+                  (abs((varz - spval) / spval) <= 1e-5)
+    return missing
+
+
+class FloodPlan(object):
+    """
+    plan = FloodPlan(shape, spval, target, source, empty, valid)
+
+    Precomputed flood of the fields of a given source grid and mask.
+    Flooding only copies wet values to dry points, so for a fixed
+    pattern of missing values it reduces to a gather: the points
+    target (flat indices) take the values of the points source and
+    the points empty are set to spval.
+
+    Plans are built with make_flood_plan, saved with plan.save and
+    read back with load_flood_plan.
+
+    varz = plan(varz)
+
+    flood varz, with the trailing dimensions (z,y,x) of plan.shape.
+    Leading dimensions (time records) are flooded together. With
+    check=True (default) a ValueError is raised if the missing values
+    of varz do not match the ones the plan has been built for.
+    """
+
+    def __init__(self, shape, spval, target, source, empty, valid, \
+                 flood=None, kwargs=None):
+        self.shape = tuple(int(n) for n in shape)
+        self.spval = spval
+        self.target = target
+        self.source = source
+        self.empty = empty
+        self.valid = valid
+        self.flood = flood
+        self.kwargs = kwargs
+
+    @property
+    def size(self):
+        return int(np.prod(self.shape))
+
+    def __call__(self, varz, check=True):
+        shape = varz.shape
+        if shape[-len(self.shape):] != self.shape:
+            raise ValueError('varz shape %s does not match the flood ' \
+                             'plan shape %s' % (shape, self.shape))
+
+        if check:
+            valid = ~_missing(varz, self.spval).reshape((-1, self.size))
+            if not np.all(valid == self.get_valid()):
+                raise ValueError('varz missing values do not match ' \
+                                 'the flood plan')
+
+        src = np.ma.getdata(varz).reshape((-1, self.size))
+        dst = src.copy()
+        dst[:, self.target] = src[:, self.source]
+        dst[:, self.empty] = self.spval
+
+        return dst.reshape(shape)
+
+    def get_valid(self):
+        """
+        Return the boolean array of the non missing points the plan
+        has been built for (flattened).
+        """
+        return np.unpackbits(self.valid, count=self.size).astype(bool)
+
+    def save(self, filename):
+        """
+        plan.save(filename)
+
+        Write the flood plan to filename (.npz).
+        """
+        np.savez(filename, shape=np.array(self.shape), \
+                 spval=np.array(self.spval), target=self.target, \
+                 source=self.source, empty=self.empty, valid=self.valid, \
+                 flood=np.array(str(self.flood)), \
+                 kwargs=np.array(json.dumps(self.kwargs, default=str)))
+
+
+def make_flood_plan(varz, grd, flood=None, spval=1e37, **kwargs):
+    """
+    plan = make_flood_plan(varz, grd, flood=None, spval=1e37, **kwargs)
+
+    Build the FloodPlan of flood(varz, grd, spval=spval, **kwargs).
+
+    varz is a (z,y,x) field of the source grid, only its missing
+    values (spval, nan or masked) are used. flood default to
+    pyroms.remapping.flood. The nearest neighbour floods of
+    pyroms_toolbox (CGrid_GLORYS.flood, BGrid_SODA.flood,
+    BGrid_GFDL.flood, BGrid_POP.flood, Grid_HYCOM.flood) can be
+    given, with their grid position and dmax, cdepth, kk options as
+    kwargs. Floods that average several wet points (creeping_sea,
+    Grid_HYCOM.flood_fast, CGrid_GLORYS.flood2d, ...) cannot be
+    reduced to a gather, a ValueError is raised, as for
+    pyroms.remapping.flood with nnear > 1.
+
+    The flood is run once on the field of the flat indices of the
+    points, which gives for every flooded point the point its value
+    comes from.
+    """
+
+    if flood is None:
+        from .flood import flood
+
+    name = '%s.%s' % (getattr(flood, '__module__', None), \
+                      getattr(flood, '__name__', None))
+    if name not in _gather_floods:
+        raise ValueError('%s is not a nearest neighbour flood, it cannot ' \
+                         'be reduced to a FloodPlan' % name)
+    if kwargs.get('nnear', 1) > 1:
+        # the inverse distance weighted flood averages the wet points
+        raise ValueError('nnear=%s flood cannot be reduced to a ' \
+                         'FloodPlan, use nnear=1' % kwargs['nnear'])
+
+    shape = varz.shape
+    assert len(shape) == 3, 'var must be 3D'
+    size = int(np.prod(shape))
+
+    missing = _missing(varz, spval).reshape(-1)
+    index = np.arange(size, dtype='f8')
+    index[missing] = spval
+
+    # the flat indices are exact in float64 only, whatever the dtype
+    # of pyroms.remapping.get_dtype
+    options = dict(kwargs)
+    if 'dtype' in inspect.signature(flood).parameters:
+        options['dtype'] = 'f8'
+    index = flood(index.reshape(shape), grd, spval=spval, **options)
+    index = np.array(index, dtype='f8').reshape(-1)
+    flooded = _missing(index, spval)
+
+    itype = np.int32 if size < 2**31 else np.int64
+    target = np.where(~flooded & (index != np.arange(size)))[0]
+    source = np.rint(index[target]).astype(itype)
+    target = target.astype(itype)
+    empty = np.where(flooded)[0].astype(itype)
+    valid = np.packbits(~missing)
+
+    return FloodPlan(shape, spval, target, source, empty, valid, \
+                     flood=getattr(flood, '__module__', None), \
+                     kwargs=kwargs)
+
+
+def load_flood_plan(filename):
+    """
+    plan = load_flood_plan(filename)
+
+    Read a FloodPlan written by plan.save(filename).
+    """
+
+    data = np.load(filename)
+    plan = FloodPlan(data['shape'], data['spval'].item(), \
+                     data['target'], data['source'], data['empty'], \
+                     data['valid'], flood=str(data['flood']), \
+                     kwargs=json.loads(str(data['kwargs'])))
+    data.close()
+
+    return plan
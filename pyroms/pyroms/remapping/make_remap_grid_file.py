@@ -7,20 +7,15 @@ except:
 import pyroms
 
 
-def make_remap_grid_file(grid, Cpos='rho', irange=None, jrange=None):
-    '''
-    make_remap_grid_file(grid)
-
-    generate grid file to be used with scrip to compute
-    the weights for remapping.
-    '''
+def _remap_grid(grid, Cpos='rho', irange=None, jrange=None):
+    # return the grid, its shape (Mp, Lp), the cell centers, mask and
+    # corners (in degrees) of the scrip grid at Cpos
 
     # get grid
     if type(grid).__name__ == 'ROMS_Grid':
         grd = grid
     else:
         grd = pyroms.grid.get_ROMS_grid(grid)
-
     Mp, Lp = grd.vgrid.h.shape
     if irange is None:
         irange = (0,Lp-1)
@@ -34,14 +29,6 @@ def make_remap_grid_file(grid, Cpos='rho', irange=None, jrange=None):
         assert jrange[1]-jrange[0] > 0, \
                'jrange must span a positive range'
 
-    #create remap file
-    remap_filename = 'remap_grid_' + grd.name + '_' + Cpos + '.nc'
-    nc = netCDF.Dataset(remap_filename, 'w', format='NETCDF3_CLASSIC')
-    nc.Description = 'remap grid file on' + Cpos + 'points'
-    nc.Author = 'pyroms.remapping.make_remap_grid_file'
-    nc.Created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    nc.title = grd.name
-
     if Cpos == 'rho':
         if jrange != (0,Mp-1) or irange != (0,Lp-1):
             lon_corner = grd.hgrid.lon_vert[jrange[0]:jrange[1]+1, \
@@ -117,22 +104,61 @@ def make_remap_grid_file(grid, Cpos='rho', irange=None, jrange=None):
         raise ValueError('Cpos must be rho, u or v')
 
     grid_size = Lp * Mp
-    print('grid shape', Mp, Lp)
 
-    grid_corner_lon = np.zeros((grid_size, 4))
-    grid_corner_lat = np.zeros((grid_size, 4))
-    k = 0
-    for j in range(Mp):
-        for i in range(Lp):
-            grid_corner_lon[k,0] = lon_corner[j,i]
-            grid_corner_lat[k,0] = lat_corner[j,i]
-            grid_corner_lon[k,1] = lon_corner[j,i+1]
-            grid_corner_lat[k,1] = lat_corner[j,i+1]
-            grid_corner_lon[k,2] = lon_corner[j+1,i+1]
-            grid_corner_lat[k,2] = lat_corner[j+1,i+1]
-            grid_corner_lon[k,3] = lon_corner[j+1,i]
-            grid_corner_lat[k,3] = lat_corner[j+1,i]
-            k = k + 1
+    # corners are counterclockwise, starting from the south-west one
+    grid_corner_lon = np.stack([lon_corner[0:Mp,0:Lp], \
+                                lon_corner[0:Mp,1:Lp+1], \
+                                lon_corner[1:Mp+1,1:Lp+1], \
+                                lon_corner[1:Mp+1,0:Lp]], -1)
+    grid_corner_lat = np.stack([lat_corner[0:Mp,0:Lp], \
+                                lat_corner[0:Mp,1:Lp+1], \
+                                lat_corner[1:Mp+1,1:Lp+1], \
+                                lat_corner[1:Mp+1,0:Lp]], -1)
+    grid_corner_lon = grid_corner_lon.reshape((grid_size, 4))
+    grid_corner_lat = grid_corner_lat.reshape((grid_size, 4))
+
+    return grd, Mp, Lp, grid_center_lon, grid_center_lat, grid_imask, \
+           grid_corner_lon, grid_corner_lat
+
+
+def get_remap_grid(grid, Cpos='rho', irange=None, jrange=None):
+    '''
+    remap_grid = get_remap_grid(grid, Cpos='rho')
+
+    Return the scrip grid description written by make_remap_grid_file
+    as a dictionary, in the format of read_remap_grid_file (center
+    and corner coordinates in radians), without writing any file.
+    '''
+
+    grd, Mp, Lp, lon, lat, imask, corner_lon, corner_lat = \
+        _remap_grid(grid, Cpos=Cpos, irange=irange, jrange=jrange)
+
+    remap_grid = {}
+    remap_grid['name'] = grd.name
+    remap_grid['Cpos'] = Cpos
+    remap_grid['dims'] = np.array([Lp, Mp])
+    remap_grid['center_lon'] = np.deg2rad(np.array(lon, dtype='f8').flatten())
+    remap_grid['center_lat'] = np.deg2rad(np.array(lat, dtype='f8').flatten())
+    remap_grid['imask'] = np.array(imask, dtype='i4').flatten()
+    remap_grid['corner_lon'] = np.deg2rad(np.array(corner_lon, dtype='f8'))
+    remap_grid['corner_lat'] = np.deg2rad(np.array(corner_lat, dtype='f8'))
+    remap_grid['units'] = 'degrees'
+
+    return remap_grid
+
+
+def _write_remap_grid_file(remap_filename, name, Cpos, Mp, Lp, \
+                           grid_center_lon, grid_center_lat, grid_imask, \
+                           grid_corner_lon, grid_corner_lat):
+    # write a scrip grid file, coordinates in degrees
+
+    nc = netCDF.Dataset(remap_filename, 'w', format='NETCDF3_CLASSIC')
+    nc.Description = 'remap grid file on' + Cpos + 'points'
+    nc.Author = 'pyroms.remapping.make_remap_grid_file'
+    nc.Created = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    nc.title = name
+
+    grid_size = Lp * Mp
 
     #Write netcdf file
     nc.createDimension('grid_size', grid_size)
@@ -170,3 +196,45 @@ def make_remap_grid_file(grid, Cpos='rho', irange=None, jrange=None):
     nc.variables['grid_corner_lat'][:] = grid_corner_lat
 
     nc.close()
+
+
+def make_remap_grid_file(grid, Cpos='rho', irange=None, jrange=None):
+    '''
+    make_remap_grid_file(grid)
+
+    generate grid file to be used with scrip to compute
+    the weights for remapping.
+    '''
+
+    grd, Mp, Lp, grid_center_lon, grid_center_lat, grid_imask, \
+        grid_corner_lon, grid_corner_lat = \
+        _remap_grid(grid, Cpos=Cpos, irange=irange, jrange=jrange)
+
+    print('grid shape', Mp, Lp)
+
+    #create remap file
+    remap_filename = 'remap_grid_' + grd.name + '_' + Cpos + '.nc'
+    _write_remap_grid_file(remap_filename, grd.name, Cpos, Mp, Lp, \
+                           grid_center_lon, grid_center_lat, grid_imask, \
+                           grid_corner_lon, grid_corner_lat)
+
+
+def write_remap_grid_file(remap_grid, remap_filename):
+    '''
+    write_remap_grid_file(remap_grid, remap_filename)
+
+    Write the scrip grid description remap_grid (as returned by
+    get_remap_grid or read_remap_grid_file) to remap_filename.
+    '''
+
+    Lp, Mp = [int(n) for n in remap_grid['dims']]
+    if remap_grid['corner_lon'] is None:
+        raise ValueError('remap_grid has no cell corners')
+
+    _write_remap_grid_file(remap_filename, remap_grid['name'], \
+                           remap_grid.get('Cpos', ''), Mp, Lp, \
+                           np.rad2deg(remap_grid['center_lon']), \
+                           np.rad2deg(remap_grid['center_lat']), \
+                           remap_grid['imask'], \
+                           np.rad2deg(remap_grid['corner_lon']), \
+                           np.rad2deg(remap_grid['corner_lat']))
@@ -0,0 +1,41 @@
+# encoding: utf-8
+
+import numpy as np
+
+
+# dtype of the fields computed by remap, flood, flood2d, roms2z, z2roms
+# and the velocity transforms, 'f8' or 'f4'. The remap weights, the
+# coordinates, the depths and the vertical interpolation plans are
+# always float64, only the fields (and their temporaries) follow dtype.
+dtype = 'f8'
+
+_dtypes = [np.dtype('f4'), np.dtype('f8')]
+
+
+def get_dtype(dtype=None):
+    """
+    dtype = get_dtype(dtype=None)
+
+    Return the numpy dtype of the remapped fields: dtype if given
+    ('f4', 'f8', np.float32, ...), otherwise the process-wide default
+    pyroms.remapping.precision.dtype.
+    """
+
+    if dtype is None:
+        dtype = globals()['dtype']
+    dtype = np.dtype(dtype)
+    if dtype not in _dtypes:
+        raise ValueError('%s not supported, dtype must be f4 or f8' % dtype)
+    return dtype
+
+
+def set_dtype(dtype):
+    """
+    set_dtype(dtype)
+
+    Set the process-wide dtype of the remapped fields, 'f4' to keep
+    them in float32 through remap, flood and the vertical
+    interpolation, 'f8' (default) for float64.
+    """
+
+    globals()['dtype'] = get_dtype(dtype).str[1:]
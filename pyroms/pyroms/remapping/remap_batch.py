@@ -0,0 +1,43 @@
+# encoding: utf-8
+
+import os
+import numpy as np
+from .remap_operator import get_remap_operator
+
+
+def remap_batch(src_stack, remap_file, spval=1e37, nthreads=None, \
+                verbose=False):
+    '''
+    dst_stack = remap_batch(src_stack, remap_file)
+
+    optional switch:
+      - spval=1e37                   define spval value
+      - nthreads=None                number of threads used for the
+                                     sparse products, default to the
+                                     number of cpus
+      - verbose=False
+
+    Remap in one pass a stack of 2D fields src_stack of shape
+    (nrec, ny, nx) that share the same scrip weights file. nrec is
+    typically nvar*ntime*nlev: stack all the variables, time records
+    and levels that use remap_file and remap them together instead of
+    calling remap for each of them. The destination mask is applied
+    once to the whole stack and the returned array has shape
+    (nrec, dst_ny, dst_nx). remap_file can also be a RemapOperator.
+    '''
+
+    op = get_remap_operator(remap_file)
+
+    if verbose is True:
+        op.info()
+
+    if len(src_stack.shape) == 2:
+        src_stack = src_stack[np.newaxis]
+
+    if len(src_stack.shape) != 3:
+        raise ValueError('src_stack must be a (nrec, ny, nx) array')
+
+    if nthreads is None:
+        nthreads = os.cpu_count() or 1
+
+    return op(src_stack, spval=spval, nthreads=nthreads)
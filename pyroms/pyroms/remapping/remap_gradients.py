@@ -0,0 +1,96 @@
+# encoding: utf-8
+
+import numpy as np
+from .remap_operator import get_remap_operator
+
+
+def _centered_diff(var, mask, axis, periodic=False, period=None):
+    # centered difference 0.5*(var[+1]-var[-1]) along axis (-1 for i,
+    # -2 for j). Like scrip, a masked or missing neighbour is replaced
+    # by the point itself and the difference becomes one-sided.
+    n = var.shape[axis]
+    idx = np.arange(n)
+    if periodic:
+        ip = (idx + 1) % n
+        im = (idx - 1) % n
+    else:
+        ip = np.minimum(idx + 1, n - 1)
+        im = np.maximum(idx - 1, 0)
+
+    shape = [1] * mask.ndim
+    shape[axis] = n
+    valid_p = np.take(mask, ip, axis=axis) & (ip != idx).reshape(shape)
+    valid_m = np.take(mask, im, axis=axis) & (im != idx).reshape(shape)
+
+    var_p = np.where(valid_p, np.take(var, ip, axis=axis), var)
+    var_m = np.where(valid_m, np.take(var, im, axis=axis), var)
+    delta = np.where(valid_p & valid_m, 0.5, 1.0)
+
+    diff = var_p - var_m
+    if period is not None:
+        diff = (diff + 0.5 * period) % period - 0.5 * period
+
+    return np.where(mask, delta * diff, 0.)
+
+
+def remap_gradients(src_array, remap_file, periodic=False):
+    '''
+    grads = remap_gradients(src_array, remap_file)
+
+    optional switch:
+      - periodic=False               source grid is periodic in the
+                                     i direction
+
+    Compute with vectorized finite differences on the source grid the
+    gradients needed to remap src_array with the second order weights
+    of remap_file (a scrip weights file or a RemapOperator):
+      - conservative: grads = (grad1, grad2), the gradients with
+        respect to latitude and longitude (divided by cos(lat)),
+        in radians, as expected by scrip.
+      - bicubic: grads = (grad1, grad2, grad3), the gradients in
+        logical space along i, along j and the cross derivative.
+
+    src_array can be 2D (y,x) or have any number of leading dimensions,
+    the gradients of all the levels are computed together. The source
+    grid centers and mask are read from remap_file.
+    '''
+
+    op = get_remap_operator(remap_file)
+    op.load_src_grid()
+
+    var = np.array(np.ma.getdata(src_array), dtype='f8')
+    if var.shape[-2:] != op.src_shape:
+        raise ValueError('src_array horizontal shape does not match ' \
+                         'the source grid of %s' % op.remap_file)
+
+    mask = op.src_grid_imask != 0
+
+    # gradients in logical space
+    di = _centered_diff(var, mask, -1, periodic=periodic)
+    dj = _centered_diff(var, mask, -2)
+
+    if op.method == 'bicubic':
+        dij = _centered_diff(di, mask, -2)
+        return di, dj, dij
+
+    elif op.method == 'conservative':
+        lon = np.deg2rad(op.src_grid_center_lon)
+        lat = np.deg2rad(op.src_grid_center_lat)
+        dlon_di = _centered_diff(lon, mask, -1, periodic=periodic, \
+                                 period=2*np.pi)
+        dlon_dj = _centered_diff(lon, mask, -2, period=2*np.pi)
+        dlat_di = _centered_diff(lat, mask, -1, periodic=periodic)
+        dlat_dj = _centered_diff(lat, mask, -2)
+
+        # invert the jacobian of (i,j) -> (lon,lat)
+        det = dlon_di * dlat_dj - dlat_di * dlon_dj
+        valid = np.abs(det) > 0
+        det = np.where(valid, det, 1.)
+        dvar_dlon = np.where(valid, (di * dlat_dj - dj * dlat_di) / det, 0.)
+        dvar_dlat = np.where(valid, (dj * dlon_di - di * dlon_dj) / det, 0.)
+
+        return dvar_dlat, dvar_dlon / np.cos(lat)
+
+    else:
+        raise ValueError('second order remapping requires conservative ' \
+                         'or bicubic weights')
@@ -0,0 +1,315 @@
+# encoding: utf-8
+
+import os
+import copy
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+try:
+    import netCDF4 as netCDF
+except:
+    import netCDF3 as netCDF
+
+from .precision import get_dtype
+
+# maximum number of RemapOperator kept in the process-wide cache
+cache_size = 16
+
+_operator_cache = OrderedDict()
+
+
+def _method_name(map_method):
+    # scrip writes 'Conservative remapping', 'Bilinear remapping', ...
+    map_method = map_method.lower()
+    for name in ['conservative', 'bilinear', 'bicubic']:
+        if map_method.startswith(name[:6]):
+            return name
+    if map_method.startswith('distance') or map_method.startswith('distwgt'):
+        return 'distwgt'
+    return map_method
+
+
+class RemapOperator(object):
+    """
+    op = RemapOperator(remap_file)
+
+    Sparse matrix representation of the addresses and weights computed
+    by scrip and stored in remap_file. The weights are read once and
+    kept as a (dst_grid_size, src_grid_size) CSR matrix, so remapping a
+    field is a single sparse-dense product.
+
+    dst_array = op(src_array, spval=1e37, nthreads=1, dtype=None)
+
+    src_array can be 2D (y,x), 3D (z,y,x) or 4D (t,z,y,x). All the
+    leading dimensions are remapped together, destination land points
+    are set to spval. With nthreads > 1 the records are split in
+    nthreads blocks remapped by concurrent threads (the sparse kernels
+    release the GIL). dst_array is of dtype (default to
+    pyroms.remapping.get_dtype()), the weights are float64.
+
+    dst_array = op(src_array, src_grad1=grad1, src_grad2=grad2, ...)
+
+    second order remapping (conservative or bicubic weights). The
+    gradients have the shape of src_array, or are 2D and shared by
+    all the levels. They can be computed with op.gradients(src_array).
+    """
+
+    def __init__(self, remap_file):
+        data = netCDF.Dataset(remap_file, 'r')
+        self.remap_file = remap_file
+        self.title = data.title
+        self.map_method = data.map_method
+        self.method = _method_name(self.map_method)
+        self.normalization = data.normalization
+        self.src_grid_name = data.source_grid
+        self.dst_grid_name = data.dest_grid
+        self.src_grid_size = len(data.dimensions['src_grid_size'])
+        self.dst_grid_size = len(data.dimensions['dst_grid_size'])
+        self.num_links = len(data.dimensions['num_links'])
+        self.src_grid_dims = np.array(data.variables['src_grid_dims'][:])
+        self.dst_grid_dims = np.array(data.variables['dst_grid_dims'][:])
+
+        # get weights and addresses from remap_file
+        map_wts = np.array(data.variables['remap_matrix'][:], dtype='f8')
+        self.num_wgts = map_wts.shape[1]
+        dst_add = np.array(data.variables['dst_address'][:], dtype=np.int64)
+        src_add = np.array(data.variables['src_address'][:], dtype=np.int64)
+
+        # get destination mask
+        self.dst_mask = np.array(data.variables['dst_grid_imask'][:])
+
+        data.close()
+
+        # scrip addresses are 1-based, duplicated links are summed.
+        # Each weight column is kept as its own sparse matrix, the
+        # first one is used for first order remapping, the others
+        # multiply the source gradients for second order remapping.
+        shape = (self.dst_grid_size, self.src_grid_size)
+        self.matrices = [sp.csr_matrix((map_wts[:,n], \
+                             (dst_add-1, src_add-1)), shape=shape) \
+                         for n in range(self.num_wgts)]
+        self.matrix = self.matrices[0]
+        self._matrix2 = None
+        self.dst_land = np.where(self.dst_mask == 0)[0]
+
+        self.src_grid_center_lon = None
+        self.src_grid_center_lat = None
+        self.src_grid_imask = None
+
+        # destination window of a reduced operator, see subset
+        self.dst_range = None
+        self._subsets = {}
+
+    @property
+    def dst_shape(self):
+        return (int(self.dst_grid_dims[1]), int(self.dst_grid_dims[0]))
+
+    def info(self):
+        print('Reading remapping: ', self.title)
+        print('From file: ', self.remap_file)
+        print(' ')
+        print('Remapping between:')
+        print(self.src_grid_name)
+        print('and')
+        print(self.dst_grid_name)
+        print('Remapping method: ', self.map_method)
+
+    @property
+    def src_shape(self):
+        return (int(self.src_grid_dims[1]), int(self.src_grid_dims[0]))
+
+    def subset(self, jrange, irange):
+        """
+        op2 = op.subset(jrange, irange)
+
+        Return the RemapOperator restricted to the destination window
+        [jrange[0]:jrange[1], irange[0]:irange[1]]: only the rows of the
+        weights of these destination points are kept, so remapping to
+        a boundary strip costs in proportion to the strip, not to the
+        destination grid. op2 gives the same values as op on the window.
+        Reduced operators are kept by op, each window is built once.
+        """
+        Mm, Lm = self.dst_shape
+        j0, j1 = (int(jrange[0]), int(jrange[1]))
+        i0, i1 = (int(irange[0]), int(irange[1]))
+        if not (0 <= j0 < j1 <= Mm and 0 <= i0 < i1 <= Lm):
+            raise ValueError('window %s, %s outside of the destination ' \
+                             'grid %s' % (jrange, irange, self.dst_shape))
+
+        key = (j0, j1, i0, i1)
+        if key in self._subsets:
+            return self._subsets[key]
+
+        rows = (np.arange(j0, j1)[:,np.newaxis] * Lm + \
+                np.arange(i0, i1)[np.newaxis,:]).reshape(-1)
+
+        op = copy.copy(self)
+        op.dst_grid_size = len(rows)
+        op.dst_grid_dims = np.array([i1-i0, j1-j0])
+        op.dst_mask = self.dst_mask[rows]
+        op.dst_land = np.where(op.dst_mask == 0)[0]
+        op.matrices = [matrix[rows] for matrix in self.matrices]
+        op.matrix = op.matrices[0]
+        op.num_links = op.matrix.nnz
+        op._matrix2 = None
+        op.dst_range = ((j0, j1), (i0, i1))
+        op._subsets = {}
+
+        self._subsets[key] = op
+        return op
+
+    def load_src_grid(self):
+        """
+        Read the source grid centers (in degrees) and mask from
+        remap_file. They are only needed to compute gradients.
+        """
+        if self.src_grid_imask is not None:
+            return
+
+        data = netCDF.Dataset(self.remap_file, 'r')
+        lon = np.array(data.variables['src_grid_center_lon'][:], dtype='f8')
+        lat = np.array(data.variables['src_grid_center_lat'][:], dtype='f8')
+        try:
+            units = data.variables['src_grid_center_lat'].units
+        except AttributeError:
+            units = 'radians'
+        imask = np.array(data.variables['src_grid_imask'][:])
+        data.close()
+
+        if not units.startswith('degree'):
+            lon = np.rad2deg(lon)
+            lat = np.rad2deg(lat)
+
+        self.src_grid_center_lon = lon.reshape(self.src_shape)
+        self.src_grid_center_lat = lat.reshape(self.src_shape)
+        self.src_grid_imask = imask.reshape(self.src_shape)
+
+    def gradients(self, src_array, periodic=False):
+        """
+        grads = op.gradients(src_array)
+
+        Return the source gradients needed for second order remapping
+        with these weights, see pyroms.remapping.remap_gradients.
+        """
+        from .remap_gradients import remap_gradients
+        return remap_gradients(src_array, self, periodic=periodic)
+
+    def _second_order_matrix(self, nwgts):
+        # [W1 W2 W3 (W4)] so that [src; grad1; grad2; (grad3)] is
+        # remapped in a single sparse product
+        if self._matrix2 is None or self._matrix2.shape[1] != \
+                nwgts * self.src_grid_size:
+            self._matrix2 = sp.hstack(self.matrices[:nwgts], format='csr')
+        return self._matrix2
+
+    def __call__(self, src_array, spval=1e37, nthreads=1, \
+                 src_grad1=None, src_grad2=None, src_grad3=None, \
+                 dtype=None):
+        src_array = np.ma.getdata(src_array)
+        shape = src_array.shape
+
+        if len(shape) < 2 or shape[-2] * shape[-1] != self.src_grid_size:
+            raise ValueError('src_array horizontal shape does not match ' \
+                             'the source grid of %s' % self.remap_file)
+
+        src = src_array.reshape((-1, self.src_grid_size))
+        nrec = src.shape[0]
+        matrix = self.matrix
+
+        if src_grad1 is not None:
+            # second order remapping
+            if self.method == 'conservative':
+                grads = [src_grad1, src_grad2]
+            elif self.method == 'bicubic':
+                grads = [src_grad1, src_grad2, src_grad3]
+            else:
+                raise ValueError('Unknown method')
+            if self.num_wgts < len(grads) + 1:
+                raise ValueError('%s does not hold second order weights' \
+                                 % self.remap_file)
+            for grad in grads:
+                if grad is None:
+                    raise ValueError('missing gradient for %s second ' \
+                                     'order remapping' % self.map_method)
+            grads = [np.broadcast_to(np.ma.getdata(grad), shape) \
+                        .reshape((-1, self.src_grid_size)) for grad in grads]
+            src = np.concatenate([src] + grads, axis=1)
+            matrix = self._second_order_matrix(len(grads)+1)
+
+        dst = np.empty((nrec, self.dst_grid_size), dtype=get_dtype(dtype))
+
+        def _dot(rec):
+            # (src_grid_size, nrec) so that every record is remapped at once
+            dst[rec] = matrix.dot(src[rec].T).T
+
+        nthreads = max(min(int(nthreads), nrec), 1)
+        if nthreads == 1:
+            _dot(slice(None))
+        else:
+            bounds = np.linspace(0, nrec, nthreads+1).astype(int)
+            blocks = [slice(bounds[n], bounds[n+1]) for n in range(nthreads)]
+            with ThreadPoolExecutor(max_workers=nthreads) as pool:
+                list(pool.map(_dot, blocks))
+
+        # mask dst_array
+        dst[:, self.dst_land] = spval
+
+        return dst.reshape(shape[:-2] + self.dst_shape)
+
+
+def get_remap_operator(remap_file, jrange=None, irange=None):
+    """
+    op = get_remap_operator(remap_file, jrange=None, irange=None)
+
+    Return the RemapOperator for remap_file. Operators are kept in a
+    process-wide LRU cache keyed by the absolute path and modification
+    time of remap_file, so the weights are only read from disk the
+    first time they are used (or when the file has been regenerated).
+    The cache holds at most pyroms.remapping.remap_operator.cache_size
+    operators. A RemapOperator is returned unchanged.
+
+    With jrange and/or irange, return the operator reduced to this
+    destination window (op.subset), e.g. a boundary strip.
+    """
+
+    if jrange is not None or irange is not None:
+        op = get_remap_operator(remap_file)
+        Mm, Lm = op.dst_shape
+        if jrange is None:
+            jrange = (0, Mm)
+        if irange is None:
+            irange = (0, Lm)
+        return op.subset(jrange, irange)
+
+    if isinstance(remap_file, RemapOperator):
+        return remap_file
+
+    path = os.path.abspath(remap_file)
+    key = (path, os.path.getmtime(path))
+
+    if key in _operator_cache:
+        _operator_cache.move_to_end(key)
+        return _operator_cache[key]
+
+    # drop the operators built from an older version of this file
+    for k in [k for k in _operator_cache if k[0] == path]:
+        del _operator_cache[k]
+
+    op = RemapOperator(remap_file)
+    _operator_cache[key] = op
+    while len(_operator_cache) > max(cache_size, 1):
+        _operator_cache.popitem(last=False)
+
+    return op
+
+
+def clear_remap_operator_cache():
+    """
+    clear_remap_operator_cache()
+
+    Empty the process-wide RemapOperator cache.
+    """
+
+    _operator_cache.clear()
@@ -2,8 +2,67 @@
 
 import numpy as np
 
+from .vinterp import VerticalInterp, get_vertical_interp
+
+def roms2z_interp(grd, grdz, Cpos='rho', irange=None, jrange=None, \
+                  mode='linear'):
+    """
+    vi = roms2z_interp(grd, grdz)
+
+    optional switch:
+      - Cpos='rho', 'u' 'v' or 'w'   specify the C-grid position where
+                                     the variable rely
+      - irange                       specify grid sub-sample for i direction
+      - jrange                       specify grid sub-sample for j direction
+      - mode='linear' or 'spline'    specify the type of interpolation
+
+    Return the VerticalInterp used by roms2z to interpolate from ROMS
+    grid grd (first record of zeta) to z vertical grid grdz. Plans are
+    cached, see pyroms.remapping.vinterp.get_vertical_interp.
+    """
+
+    if mode not in ['linear', 'spline']:
+        raise Warning('%s not supported, defaulting to linear' % mode)
+
+    if Cpos not in ['rho', 'u', 'v', 'w']:
+        raise Warning('%s unknown position. Cpos must be rho, u, v or w.' % Cpos)
+
+    def build():
+        if Cpos == 'rho':
+            z = grd.vgrid.z_r[0,:]
+            depth = grdz.vgrid.z
+            mask = grd.hgrid.mask_rho
+        elif Cpos == 'u':
+            z = 0.5 * (grd.vgrid.z_r[0,:,:,:-1] + grd.vgrid.z_r[0,:,:,1:])
+            depth = 0.5 * (grdz.vgrid.z[:,:,:-1] + grdz.vgrid.z[:,:,1:])
+            mask = grd.hgrid.mask_u
+        elif Cpos == 'v':
+            z = 0.5 * (grd.vgrid.z_r[0,:,:-1,:] + grd.vgrid.z_r[0,:,1:,:])
+            depth = 0.5 * (grdz.vgrid.z[:,:-1,:] + grdz.vgrid.z[:,1:,:])
+            mask = grd.hgrid.mask_v
+        elif Cpos == 'w':
+            z = grd.vgrid.z_w[0,:]
+            depth = grdz.vgrid.z
+            mask = grd.hgrid.mask_rho
+
+        Mm, Lm = z.shape[1:]
+        i0, i1 = (0, Lm) if irange is None else irange
+        j0, j1 = (0, Mm) if jrange is None else jrange
+
+        # copy the surface level high in the sky
+        z = np.concatenate((z, 100*np.ones((1,z.shape[1], z.shape[2]))), 0)
+
+        return VerticalInterp(z[:,j0:j1,i0:i1], depth[:,j0:j1,i0:i1], \
+                              mask[j0:j1,i0:i1], mode=mode)
+
+    key = ('roms2z', Cpos, None if irange is None else tuple(irange), \
+           None if jrange is None else tuple(jrange), mode)
+
+    return get_vertical_interp([grd, grdz], key, build)
+
+
 def roms2z(var, grd, grdz, Cpos='rho', irange=None, jrange=None, \
-           spval=1e37, mode='linear'):
+           spval=1e37, mode='linear', vinterp=None, dtype=None):
     """
     varz = roms2z(var, grd, grdz)
 
@@ -14,69 +73,34 @@ def roms2z(var, grd, grdz, Cpos='rho', irange=None, jrange=None, \
       - jrange                       specify grid sub-sample for j direction
       - spval=1e37                   define spval value
       - mode='linear' or 'spline'    specify the type of interpolation
+      - vinterp=None                 VerticalInterp to use, default to
+                                     the cached roms2z_interp plan
+      - dtype=None                   dtype of varz ('f4' or 'f8'), default
+                                     to pyroms.remapping.get_dtype()
 
     Interpolate the variable from ROMS grid grd to z vertical grid grdz
     """
-    from .. import _interp
-
     var = var.copy()
 
     assert len(var.shape) == 3, 'var must be 3D'
 
-    if mode=='linear':
-        imode=0
-    elif mode=='spline':
-        imode=1
-    else:
-        imode=0
-        raise Warning('%s not supported, defaulting to linear' % mode)
-
-
-    if Cpos == 'rho':
-        z = grd.vgrid.z_r[0,:]
-        depth = grdz.vgrid.z
-        mask = grd.hgrid.mask_rho
-    elif Cpos == 'u':
-        z = 0.5 * (grd.vgrid.z_r[0,:,:,:-1] + grd.vgrid.z_r[0,:,:,1:])
-        depth = 0.5 * (grdz.vgrid.z[:,:,:-1] + grdz.vgrid.z[:,:,1:])
-        mask = grd.hgrid.mask_u
-    elif Cpos == 'v':
-        z = 0.5 * (grd.vgrid.z_r[0,:,:-1,:] + grd.vgrid.z_r[0,:,1:,:])
-        depth = 0.5 * (grdz.vgrid.z[:,:-1,:] + grdz.vgrid.z[:,1:,:])
-        mask = grd.hgrid.mask_v
-    elif Cpos == 'w':
-        z = grd.vgrid.z_w[0,:]
-        depth = grdz.vgrid.z
-        mask = grd.hgrid.mask_rho
-    else:
-        raise Warning('%s unknown position. Cpos must be rho, u, v or w.' % Cpos)
+    if vinterp is None:
+        vinterp = roms2z_interp(grd, grdz, Cpos=Cpos, irange=irange, \
+                                jrange=jrange, mode=mode)
 
     Nm, Mm, Lm = var.shape
-    nlev = grdz.vgrid.N
 
-    var = np.concatenate((var, var[-2:-1,:,:]), 0)
-    z = np.concatenate((z, 100*np.ones((1,z.shape[1], z.shape[2]))), 0)
-
-    if irange is None:
-        irange = (0,Lm)
-    else:
+    if irange is not None:
         assert var.shape[2] == irange[1]-irange[0], \
                'var shape and irange must agree'
 
-    if jrange is None:
-        jrange = (0,Mm)
-    else:
+    if jrange is not None:
         assert var.shape[1] == jrange[1]-jrange[0], \
                'var shape and jrange must agree'
 
-    varz = np.zeros((nlev, jrange[1]-jrange[0], irange[1]-irange[0]))
+    var = np.concatenate((var, var[-2:-1,:,:]), 0)
 
-    for k in range(nlev):
-        varz[k,:,:] = _interp.xhslice(var, \
-                        z[:,jrange[0]:jrange[1], irange[0]:irange[1]], \
-                        depth[k,jrange[0]:jrange[1], irange[0]:irange[1]], \
-                        mask[jrange[0]:jrange[1], irange[0]:irange[1]], \
-                        imode, spval)
+    varz = vinterp(var, spval=spval, dtype=dtype)
 
     #mask
     idx = np.where(abs((varz-spval)/spval)<=1e-5)
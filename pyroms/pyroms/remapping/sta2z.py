@@ -3,6 +3,8 @@
 import numpy as np
 import pdb
 
+from .vinterp import VerticalInterp
+
 def sta2z(var, grd, grdz, Cpos='rho', srange=None, \
            spval=1e37, mode='linear'):
     """
@@ -16,18 +18,11 @@ def sta2z(var, grd, grdz, Cpos='rho', srange=None, \
 
     Interpolate the variable from stations grid grd to z vertical grid grdz
     """
-    from .. import _interp
-
     var = var.copy()
 
     assert len(var.shape) == 2, 'var must be 2D'
 
-    if mode=='linear':
-        imode=0
-    elif mode=='spline':
-        imode=1
-    else:
-        imode=0
+    if mode not in ['linear', 'spline']:
         raise Warning('%s not supported, defaulting to linear' % mode)
 
     if Cpos == 'rho':
@@ -41,7 +36,6 @@ def sta2z(var, grd, grdz, Cpos='rho', srange=None, \
 
     var = var.T
     Nm, Sm = var.shape
-    nlev = grdz.vgrid.N
 
     # putting in a fake i dimension
     var = np.dstack(var).T
@@ -63,14 +57,11 @@ def sta2z(var, grd, grdz, Cpos='rho', srange=None, \
         assert var.shape[1] == srange[1]-srange[0], \
                'var shape and srange must agree'
 
-    varz = np.zeros((nlev, srange[1]-srange[0], 1))
-
-    for k in range(nlev):
-        varz[k,:] = _interp.xhslice(var, \
-                        z[:, srange[0]:srange[1], :], \
-                        depth[k, srange[0]:srange[1], :], \
+    vi = VerticalInterp(z[:, srange[0]:srange[1], :], \
+                        depth[:, srange[0]:srange[1], :], \
                         mask[srange[0]:srange[1], :], \
-                        imode, spval)
+                        mode=mode)
+    varz = vi(var, spval=spval)
 
 #    pdb.set_trace()
     #mask
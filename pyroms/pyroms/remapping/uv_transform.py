@@ -0,0 +1,275 @@
+# encoding: utf-8
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+import pyroms
+from .vinterp import _grid_key, _memoized
+from .precision import get_dtype
+
+
+# maximum number of UVTransform and DepthAverage kept in the
+# process-wide cache
+cache_size = 16
+
+_uv_cache = OrderedDict()
+
+
+def _window(shape, irange, jrange):
+    Mm, Lm = shape
+    i0, i1 = (0, Lm) if irange is None else irange
+    j0, j1 = (0, Mm) if jrange is None else jrange
+    return int(j0), int(j1), int(i0), int(i1)
+
+
+class DepthAverage(object):
+    """
+    da = DepthAverage(grd, Cpos='u', irange=None, jrange=None)
+
+    Depth average (ubar, vbar) of the fields at the Cpos points
+    (rho, u or v) of the window [jrange[0]:jrange[1],
+    irange[0]:irange[1]] of ROMS grid grd (first record of zeta). The
+    layer thicknesses divided by the water depth are computed once.
+
+    varbar = da(var, spval=1e37, dtype=None)
+
+    average var, with the trailing dimensions (N,y,x). Leading
+    dimensions (time records) are averaged together. The land points
+    are set to spval. varbar is of dtype, default to
+    pyroms.remapping.get_dtype().
+    """
+
+    def __init__(self, grd, Cpos='u', irange=None, jrange=None):
+        if Cpos == 'u':
+            mask = grd.hgrid.mask_u
+        elif Cpos == 'v':
+            mask = grd.hgrid.mask_v
+        elif Cpos == 'rho':
+            mask = grd.hgrid.mask_rho
+        else:
+            raise Warning('%s unknown position. Cpos must be rho, u or v.' \
+                          % Cpos)
+
+        j0, j1, i0, i1 = _window(mask.shape, irange, jrange)
+        self.Cpos = Cpos
+        self.land = (mask[j0:j1,i0:i1] == 0)
+
+        # z_w squeezes the strips one point wide
+        if Cpos == 'u':
+            z = grd.vgrid.z_w[0,:,j0:j1,i0:i1+1]
+            z = z.reshape((-1, j1-j0, i1-i0+1))
+            z = 0.5 * (z[:,:,:-1] + z[:,:,1:])
+        elif Cpos == 'v':
+            z = grd.vgrid.z_w[0,:,j0:j1+1,i0:i1]
+            z = z.reshape((-1, j1-j0+1, i1-i0))
+            z = 0.5 * (z[:,:-1,:] + z[:,1:,:])
+        else:
+            z = grd.vgrid.z_w[0,:,j0:j1,i0:i1]
+            z = z.reshape((-1, j1-j0, i1-i0))
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.weights = np.diff(z, axis=0) / -z[0]
+
+    def __call__(self, var, spval=1e37, dtype=None):
+        dtype = get_dtype(dtype)
+        var = np.asarray(np.ma.getdata(var), dtype=dtype)
+        if var.shape[-3:] != self.weights.shape:
+            raise ValueError('var shape %s does not match the levels ' \
+                             'shape %s' % (var.shape, self.weights.shape))
+
+        with np.errstate(invalid='ignore', over='ignore'):
+            varbar = np.einsum('...kji,kji->...ji', var, \
+                               self.weights.astype(dtype, copy=False))
+        varbar[..., self.land] = spval
+
+        return varbar
+
+
+class UVTransform(object):
+    """
+    uvt = UVTransform(grd, angle, irange=None, jrange=None)
+
+    Rotation of the velocity components (u,v) given at the rho points
+    of the window [jrange[0]:jrange[1], irange[0]:irange[1]] of ROMS
+    grid grd by angle (the rotation angle at these rho points), and
+    move back to the u,v points. cos and sin of angle are computed once.
+
+    u, v = uvt(u, v, spval=1e37, dtype=None)
+
+    rotate u and v, with the trailing dimensions (y,x) of the window,
+    average them to the (y,x-1) u points and the (y-1,x) v points and
+    set the land points to spval. Leading dimensions (levels, time
+    records) are transformed together. u and v are overwritten when
+    they are already of dtype (default to pyroms.remapping.get_dtype()),
+    the returned arrays are views of them.
+
+    ubar, vbar = uvt.depth_average(u, v, spval=1e37, dtype=None)
+
+    depth average of the transformed 3D u and v.
+    """
+
+    def __init__(self, grd, angle, irange=None, jrange=None):
+        mask = grd.hgrid.mask_rho
+        j0, j1, i0, i1 = _window(mask.shape, irange, jrange)
+        self.grd = grd
+        self.irange = (i0, i1)
+        self.jrange = (j0, j1)
+
+        angle = np.asarray(angle, dtype='f8')
+        self.shape = angle.shape
+        assert self.shape == (j1-j0, i1-i0), \
+               'angle shape and the window must agree'
+        self.cos = np.cos(angle)
+        self.sin = np.sin(angle)
+
+        self.land_u = (grd.hgrid.mask_u[j0:j1,i0:i1-1] == 0)
+        self.land_v = (grd.hgrid.mask_v[j0:j1-1,i0:i1] == 0)
+        self._davg = None
+
+    def __call__(self, u, v, spval=1e37, dtype=None):
+        dtype = get_dtype(dtype)
+        u = np.asarray(np.ma.getdata(u), dtype=dtype)
+        v = np.asarray(np.ma.getdata(v), dtype=dtype)
+        if u.shape[-2:] != self.shape or v.shape != u.shape:
+            raise ValueError('u, v shapes %s, %s do not match the ' \
+                             'window shape %s' \
+                             % (u.shape, v.shape, self.shape))
+
+        cos = self.cos.astype(dtype, copy=False)
+        sin = self.sin.astype(dtype, copy=False)
+        with np.errstate(invalid='ignore', over='ignore'):
+            # (u + i v) * exp(-i angle)
+            tmp = u * sin
+            u *= cos
+            u += v * sin
+            v *= cos
+            v -= tmp
+
+            # move back to u,v points
+            np.add(u[...,:-1], u[...,1:], out=u[...,:-1])
+            u = u[...,:-1]
+            u *= 0.5
+            np.add(v[...,:-1,:], v[...,1:,:], out=v[...,:-1,:])
+            v = v[...,:-1,:]
+            v *= 0.5
+
+        u[..., self.land_u] = spval
+        v[..., self.land_v] = spval
+
+        return u, v
+
+    def depth_average(self, u, v, spval=1e37, dtype=None):
+        if self._davg is None:
+            j0, j1 = self.jrange
+            i0, i1 = self.irange
+            self._davg = ( \
+                get_depth_average(self.grd, Cpos='u', \
+                                  irange=(i0,i1-1), jrange=(j0,j1)), \
+                get_depth_average(self.grd, Cpos='v', \
+                                  irange=(i0,i1), jrange=(j0,j1-1)))
+        return self._davg[0](u, spval=spval, dtype=dtype), \
+               self._davg[1](v, spval=spval, dtype=dtype)
+
+
+def _cached(key, build):
+    if key in _uv_cache:
+        _uv_cache.move_to_end(key)
+        return _uv_cache[key]
+
+    obj = build()
+    _uv_cache[key] = obj
+    while len(_uv_cache) > max(cache_size, 0):
+        _uv_cache.popitem(last=False)
+
+    return obj
+
+
+def _angle_key(grd):
+    # kept by grd as long as hgrid and angle_rho are the same objects
+    def compute():
+        angle = np.ascontiguousarray(grd.hgrid.angle_rho, dtype='f8')
+        return hashlib.sha1(angle.tobytes()).hexdigest()
+
+    return _memoized(grd, '_angle_key', \
+                     (grd.hgrid, grd.hgrid.angle_rho), compute)
+
+
+def get_uv_transform(grd, srcgrd=None, wts_file=None, irange=None, \
+                     jrange=None, src_irange=None, src_jrange=None):
+    """
+    uvt = get_uv_transform(grd, srcgrd=None, wts_file=None)
+
+    optional switch:
+      - srcgrd, wts_file             source ROMS grid and its rho_to_rho
+                                     remap weights file, the velocity is
+                                     rotated by the angle of grd minus the
+                                     remapped angle of srcgrd. Without
+                                     srcgrd, by the angle of grd only
+                                     (eastward/northward components)
+      - irange                       specify grid sub-sample for i direction
+      - jrange                       specify grid sub-sample for j direction
+      - src_irange, src_jrange       source sub-sample remapped by wts_file
+
+    Return the UVTransform of the window of grd. Transforms are kept in
+    a process-wide LRU cache keyed by the content of the grids and the
+    windows, so the angle is remapped once for all the time records.
+    The content keys are computed once per grid object, see
+    pyroms.remapping.get_vertical_interp.
+    The cache holds at most pyroms.remapping.uv_transform.cache_size
+    transforms and depth averages.
+    """
+
+    if srcgrd is not None and wts_file is None:
+        raise ValueError('wts_file is needed to remap the angle of srcgrd')
+
+    def build():
+        j0, j1, i0, i1 = _window(grd.hgrid.mask_rho.shape, irange, jrange)
+        angle = grd.hgrid.angle_rho[j0:j1,i0:i1]
+        if srcgrd is not None:
+            Mm, Lm = srcgrd.hgrid.angle_rho.shape
+            si0, si1 = (0, Lm) if src_irange is None else src_irange
+            sj0, sj1 = (0, Mm) if src_jrange is None else src_jrange
+            src_ang = srcgrd.hgrid.angle_rho[sj0:sj1,si0:si1]
+            src_angle = pyroms.remapping.remap(src_ang, \
+                  pyroms.remapping.get_remap_operator(wts_file, \
+                  jrange=jrange, irange=irange), dtype='f8')
+            angle = angle - src_angle
+        return UVTransform(grd, angle, irange=(i0,i1), jrange=(j0,j1))
+
+    key = ('uv', _grid_key(grd), _angle_key(grd), \
+           None if irange is None else tuple(irange), \
+           None if jrange is None else tuple(jrange))
+    if srcgrd is not None:
+        key += (_angle_key(srcgrd), wts_file, \
+                None if src_irange is None else tuple(src_irange), \
+                None if src_jrange is None else tuple(src_jrange))
+
+    return _cached(key, build)
+
+
+def get_depth_average(grd, Cpos='u', irange=None, jrange=None):
+    """
+    da = get_depth_average(grd, Cpos='u', irange=None, jrange=None)
+
+    Return the DepthAverage of the window of grd at the Cpos points,
+    from the process-wide cache of get_uv_transform.
+    """
+
+    key = ('depth_average', _grid_key(grd), Cpos, \
+           None if irange is None else tuple(irange), \
+           None if jrange is None else tuple(jrange))
+
+    return _cached(key, lambda: DepthAverage(grd, Cpos=Cpos, \
+                                             irange=irange, jrange=jrange))
+
+
+def clear_uv_transform_cache():
+    """
+    clear_uv_transform_cache()
+
+    Empty the process-wide UVTransform and DepthAverage cache.
+    """
+
+    _uv_cache.clear()
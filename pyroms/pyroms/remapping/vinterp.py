@@ -0,0 +1,283 @@
+# encoding: utf-8
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+from .precision import get_dtype
+
+# maximum number of VerticalInterp kept in the process-wide cache
+cache_size = 8
+
+_vinterp_cache = OrderedDict()
+
+
+def _search(z, depth, right=False):
+    # vectorized bisection along the first axis: for every column of
+    # z (km,P), the number of levels z < depth (z <= depth if right)
+    # for all the target levels of depth (n,P) at once
+    km = z.shape[0]
+    lo = np.zeros(depth.shape, dtype=np.int32)
+    hi = np.full(depth.shape, km, dtype=np.int32)
+    while True:
+        todo = lo < hi
+        if not todo.any():
+            break
+        mid = (lo + hi) // 2
+        zmid = np.take_along_axis(z, np.minimum(mid, km-1), axis=0)
+        if right:
+            below = zmid <= depth
+        else:
+            below = zmid < depth
+        lo = np.where(todo & below, mid + 1, lo)
+        hi = np.where(todo & ~below, mid, hi)
+    return lo
+
+
+class VerticalInterp(object):
+    """
+    vi = VerticalInterp(z, depth, mask=None, mode='linear')
+
+    Interpolation of (km,y,x) fields given at the depths z (increasing
+    along the first axis) to the (n,y,x) target depths depth.
+
+    The bracketing levels and the weights of all the target levels are
+    computed once, with a vectorized bisection of every column, so
+    interpolating a field is a couple of gathers. The same vi can be
+    used for all the variables sharing z and depth.
+
+    var = vi(varz, spval=1e37, dtype=None)
+
+    interpolate varz, with the trailing dimensions (km,y,x). Leading
+    dimensions (time records) are interpolated together. The target
+    depths outside [z[0], z[-1]] and the points where mask is not 1
+    are set to spval. var is of dtype (default to
+    pyroms.remapping.get_dtype()), the linear interpolation is done
+    in dtype, the spline in float64.
+
+    mode='linear' or 'spline' (natural cubic spline), with the same
+    results as the xhslice (lintrp, spline, splint) Fortran routines.
+    """
+
+    def __init__(self, z, depth, mask=None, mode='linear'):
+        if mode not in ['linear', 'spline']:
+            raise ValueError('%s not supported, mode must be linear ' \
+                             'or spline' % mode)
+
+        z = np.asarray(z, dtype='f8')
+        depth = np.asarray(depth, dtype='f8')
+        if depth.ndim == z.ndim - 1:
+            depth = depth[np.newaxis]
+        assert z.ndim == depth.ndim and z.shape[1:] == depth.shape[1:], \
+               'z and depth must have the same horizontal shape'
+
+        self.mode = mode
+        self.src_shape = z.shape
+        self.shape = depth.shape
+        km = z.shape[0]
+        z = z.reshape((km, -1))
+        depth = depth.reshape((depth.shape[0], -1))
+
+        valid = (z[0] <= depth) & (depth <= z[-1])
+        if mask is not None:
+            valid &= (np.asarray(mask) == 1).reshape(-1)[np.newaxis,:]
+        self.valid = valid
+
+        # lower bracketing level, x(lo) < depth <= x(lo+1) for linear
+        # (lintrp), x(lo) <= depth < x(lo+1) for spline (splint)
+        lo = _search(z, depth, right=(mode == 'spline')) - 1
+        lo = np.clip(lo, 0, max(km-2, 0))
+        hi = np.minimum(lo + 1, km - 1)
+        self.lo = lo
+
+        # weight of the upper level, the lower one is 1 - w
+        zlo = np.take_along_axis(z, lo, axis=0)
+        zhi = np.take_along_axis(z, hi, axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            if mode == 'linear':
+                d1 = depth - zlo
+                d2 = zhi - depth
+                w = np.where(d1 + d2 > 0, d1 / (d1 + d2), 0.)
+                # lintrp takes the end values outside the levels
+                w[depth >= z[-1]] = 1.
+                w[depth <= z[0]] = 0.
+            else:
+                self.h = zhi - zlo
+                w = (depth - zlo) / self.h
+                self._spline_coefs(z)
+        self.w = w
+        self._weights = {np.dtype('f8'): (1. - w, w)}
+
+    def _spline_coefs(self, z):
+        # factorization of the tridiagonal system giving the second
+        # derivatives of the natural spline, it only depends on z
+        km = z.shape[0]
+        self.dz = np.diff(z, axis=0)
+        self.sig = np.zeros(z.shape)
+        self.rp = np.zeros(z.shape)
+        self.c = np.zeros(z.shape)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for i in range(1, km-1):
+                sig = (z[i] - z[i-1]) / (z[i+1] - z[i-1])
+                p = sig * self.c[i-1] + 2.
+                self.sig[i] = sig
+                self.rp[i] = 1. / p
+                self.c[i] = (sig - 1.) / p
+
+    def _second_derivatives(self, f):
+        # y2 of the spline routine for f (nrec,km,P)
+        km = f.shape[1]
+        dz = self.dz
+        y2 = np.zeros(f.shape)
+        u = np.zeros(f.shape)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            for i in range(1, km-1):
+                u[:,i] = (6. * ((f[:,i+1] - f[:,i]) / dz[i] - \
+                                (f[:,i] - f[:,i-1]) / dz[i-1]) / \
+                          (dz[i] + dz[i-1]) - self.sig[i] * u[:,i-1]) \
+                         * self.rp[i]
+            for k in range(km-2, -1, -1):
+                y2[:,k] = self.c[k] * y2[:,k+1] + u[:,k]
+        return y2
+
+    def __call__(self, varz, spval=1e37, dtype=None):
+        dtype = get_dtype(dtype)
+        if self.mode == 'spline':
+            ctype = np.dtype('f8')
+        else:
+            ctype = dtype
+        varz = np.asarray(np.ma.getdata(varz), dtype=ctype)
+        shape = varz.shape
+        if shape[-len(self.src_shape):] != self.src_shape:
+            raise ValueError('varz shape %s does not match the source ' \
+                             'levels shape %s' % (shape, self.src_shape))
+
+        lead = shape[:-len(self.src_shape)]
+        km = self.src_shape[0]
+        f = varz.reshape((-1, km, self.valid.shape[1]))
+        lo = np.broadcast_to(self.lo, (f.shape[0],) + self.lo.shape)
+        hi = np.minimum(lo + 1, km - 1)
+
+        if ctype not in self._weights:
+            self._weights[ctype] = tuple(w.astype(ctype) \
+                                         for w in self._weights[self.w.dtype])
+        a, b = self._weights[ctype]
+        with np.errstate(invalid='ignore', over='ignore'):
+            var = a * np.take_along_axis(f, lo, axis=1) + \
+                  b * np.take_along_axis(f, hi, axis=1)
+            if self.mode == 'spline':
+                y2 = self._second_derivatives(f)
+                h2 = self.h * self.h / 6.
+                var += (a * a * a - a) * h2 * \
+                           np.take_along_axis(y2, lo, axis=1) + \
+                       (b * b * b - b) * h2 * \
+                           np.take_along_axis(y2, hi, axis=1)
+
+        var = var.astype(dtype, copy=False)
+        var[:, ~self.valid] = spval
+
+        return var.reshape(lead + self.shape)
+
+
+def _memoized(grd, name, refs, compute):
+    # compute() kept by grd as long as the objects refs it depends on
+    # are the same (identity, as for the records cached by the vgrid
+    # depths), so the grid content is only hashed once per grid and
+    # zeta. A grid modified in place keeps its key.
+    memo = grd.__dict__.get(name)
+    if memo is not None and len(memo[0]) == len(refs) and \
+            all(a is b for a, b in zip(memo[0], refs)):
+        return memo[1]
+    key = compute()
+    try:
+        setattr(grd, name, (refs, key))
+    except AttributeError:
+        pass
+    return key
+
+
+_grid_key_names = ['h', 'zeta', 'hc', 'N', 's_rho', 'Cs_r', 's_w', 'Cs_w', \
+                   'Vtrans', 'depth']
+
+
+def _grid_key(grd):
+    # hash of what defines the vertical levels and the mask of grd:
+    # the bathymetry, the first record of zeta, the s-coordinate
+    # parameters or the z levels, so that grids rebuilt for every
+    # variable (or a changed zeta) map to the right plan
+    vgrid = grd.vgrid
+    hgrid = getattr(grd, 'hgrid', None)
+    names = list(_grid_key_names)
+    if getattr(vgrid, 'depth', None) is None:
+        names.append('z')
+    masks = ['mask_rho', 'mask_u', 'mask_v']
+
+    def compute():
+        h = hashlib.sha1()
+        h.update(type(vgrid).__name__.encode())
+        for var in names:
+            val = getattr(vgrid, var, None)
+            if val is None:
+                continue
+            if var == 'zeta' and len(val.shape) > np.ndim(vgrid.h):
+                # only the first record, zeta can be a netCDF variable
+                val = val[0]
+            val = np.ascontiguousarray(np.ma.getdata(val), dtype='f8')
+            h.update(('%s %s' % (var, val.shape)).encode())
+            h.update(val.tobytes())
+        for var in masks:
+            val = getattr(hgrid, var, None)
+            if val is None:
+                continue
+            val = np.ascontiguousarray(val, dtype='f8')
+            h.update(('%s %s' % (var, val.shape)).encode())
+            h.update(val.tobytes())
+        return h.hexdigest()
+
+    # the masks of CGrid are properties computed from mask_rho
+    refs = (vgrid, hgrid) + \
+           tuple(vgrid.__dict__.get(var) for var in names) + \
+           tuple(getattr(hgrid, '__dict__', {}).get(var) for var in masks)
+
+    return _memoized(grd, '_vinterp_key', refs, compute)
+
+
+def get_vertical_interp(grids, key, build):
+    """
+    vi = get_vertical_interp(grids, key, build)
+
+    Return the VerticalInterp build() for the pyroms grids grids
+    (source, destination) and key (Cpos, ranges, mode, ...). Plans are
+    kept in a process-wide LRU cache keyed by the content of the grids
+    (bathymetry, first record of zeta, vertical coordinate and masks)
+    and key, so z2roms and roms2z only search the columns once for all
+    the variables of a time record, even if the grids are rebuilt for
+    every variable. The content key is computed once per grid object
+    and zeta (a grid modified in place must be rebuilt, or its
+    _vinterp_key attribute deleted). The cache holds at most
+    pyroms.remapping.vinterp.cache_size plans.
+    """
+
+    key = tuple(_grid_key(grd) for grd in grids) + tuple(key)
+
+    if key in _vinterp_cache:
+        _vinterp_cache.move_to_end(key)
+        return _vinterp_cache[key]
+
+    vi = build()
+    _vinterp_cache[key] = vi
+    while len(_vinterp_cache) > max(cache_size, 0):
+        _vinterp_cache.popitem(last=False)
+
+    return vi
+
+
+def clear_vertical_interp_cache():
+    """
+    clear_vertical_interp_cache()
+
+    Empty the process-wide VerticalInterp cache.
+    """
+
+    _vinterp_cache.clear()
@@ -0,0 +1,312 @@
+# encoding: utf-8
+
+import os
+import errno
+import time
+import socket
+import shutil
+import hashlib
+import tempfile
+
+import numpy as np
+
+from .compute_scrip_weights import read_remap_grid_file, \
+                                   write_scrip_weights, _compute_links
+from .make_remap_grid_file import write_remap_grid_file
+from .remap_operator import get_remap_operator
+
+
+# bump when the weights computed for a given key change
+_store_version = 2
+
+
+class WeightStore(object):
+    """
+    store = WeightStore(path=None, max_size=None)
+
+    Persistent, content addressed store of scrip weights files.
+
+    Weights files are named after a hash of the source and destination
+    grid centers, corners and masks, of the remapping method and of its
+    options, so the same weights are computed once and then shared by
+    all the scripts (and all the workers) using the store.
+
+    remap_file = store.weights_file(src_grid, dst_grid, map_method)
+    op = store.operator(src_grid, dst_grid, map_method)
+
+    src_grid and dst_grid are scrip grid files (as written by
+    make_remap_grid_file) or scrip grid descriptions (as returned by
+    get_remap_grid or read_remap_grid_file). On a miss the weights are
+    computed, with compute_scrip_weights for 'bilinear', 'distwgt' and
+    'nearest', with scrip for 'conservative' and 'bicubic', written to
+    a temporary file and atomically renamed in the store. A lock file
+    makes sure that concurrent workers asking for the same weights
+    wait for the first one instead of computing them again.
+
+    path is the store directory, default to the environment variable
+    PYROMS_WEIGHT_STORE or ~/.pyroms/weights. If max_size (in bytes)
+    is given, the least recently used weights files are removed once
+    the store grows above max_size.
+    """
+
+    def __init__(self, path=None, max_size=None, poll_interval=0.5, \
+                 lock_timeout=None):
+        if path is None:
+            path = os.getenv('PYROMS_WEIGHT_STORE')
+        if path is None:
+            path = os.path.join(os.path.expanduser('~'), '.pyroms', 'weights')
+        self.path = os.path.abspath(path)
+        self.max_size = max_size
+        self.poll_interval = poll_interval
+        self.lock_timeout = lock_timeout
+
+        try:
+            os.makedirs(self.path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def key(self, src_grid, dst_grid, map_method='bilinear', **options):
+        """
+        key = store.key(src_grid, dst_grid, map_method, **options)
+
+        Return the hash naming the weights of src_grid to dst_grid.
+        """
+
+        src = _load_grid(src_grid)
+        dst = _load_grid(dst_grid)
+
+        # only the content of the grids is hashed, in the same layout
+        # for a grid file and a get_remap_grid dictionary (the Cpos of
+        # the grid is given by its centers, corners and mask)
+        h = hashlib.sha1()
+        h.update(('pyroms weights %d' % _store_version).encode())
+        for grd in [src, dst]:
+            for var in ['dims', 'imask', 'center_lon', 'center_lat', \
+                        'corner_lon', 'corner_lat']:
+                if grd.get(var) is None:
+                    h.update(b'None')
+                    continue
+                val = np.ascontiguousarray(np.ma.getdata(grd[var]), \
+                          dtype='i8' if var in ['dims', 'imask'] else 'f8')
+                if var.startswith('corner'):
+                    val = val.reshape((-1, val.shape[-1]))
+                else:
+                    val = val.reshape(-1)
+                h.update(('%s %s' % (var, val.shape)).encode())
+                h.update(val.tobytes())
+        h.update(map_method.encode())
+        for opt in sorted(options):
+            h.update(('%s=%r' % (opt, options[opt])).encode())
+
+        return h.hexdigest()
+
+    def weights_file(self, src_grid, dst_grid, map_method='bilinear', \
+                     map_name=None, num_neighbors=4, \
+                     normalize_opt='fracarea', grid1_periodic=False, \
+                     nthreads=None):
+        """
+        remap_file = store.weights_file(src_grid, dst_grid, map_method)
+
+        Return the path of the weights file remapping src_grid to
+        dst_grid, computing and storing it if needed.
+        """
+
+        if map_method not in ['bilinear', 'distwgt', 'nearest', \
+                              'conservative', 'bicubic']:
+            raise ValueError('map_method must be bilinear, distwgt, ' \
+                             'nearest, conservative or bicubic')
+
+        src = _load_grid(src_grid)
+        dst = _load_grid(dst_grid)
+
+        options = {'normalize_opt': normalize_opt, \
+                   'grid1_periodic': bool(grid1_periodic)}
+        if map_method == 'distwgt':
+            options['num_neighbors'] = int(num_neighbors)
+        key = self.key(src, dst, map_method, **options)
+        remap_file = os.path.join(self.path, key + '.nc')
+
+        if map_name is None:
+            map_name = src['name'] + ' to ' + dst['name'] + ' ' + map_method
+
+        while not os.path.exists(remap_file):
+            lock = self._acquire(key)
+            if lock is None:
+                # someone else is computing these weights
+                time.sleep(self.poll_interval)
+                continue
+            try:
+                if not os.path.exists(remap_file):
+                    self._compute(remap_file, src, dst, map_method, \
+                                  map_name, num_neighbors, normalize_opt, \
+                                  grid1_periodic, nthreads)
+            finally:
+                os.remove(lock)
+            self.evict(keep=remap_file)
+
+        # the access time gives the least recently used files,
+        # the modification time is left untouched for get_remap_operator
+        try:
+            os.utime(remap_file, (time.time(), os.path.getmtime(remap_file)))
+        except OSError:
+            pass
+
+        return remap_file
+
+    def operator(self, src_grid, dst_grid, map_method='bilinear', **kwargs):
+        """
+        op = store.operator(src_grid, dst_grid, map_method, **kwargs)
+
+        Return the (cached) RemapOperator of store.weights_file.
+        """
+
+        return get_remap_operator(self.weights_file(src_grid, dst_grid, \
+                                                    map_method, **kwargs))
+
+    def files(self):
+        """
+        Return the weights files of the store, least recently used first.
+        """
+
+        files = [os.path.join(self.path, f) for f in os.listdir(self.path) \
+                 if f.endswith('.nc')]
+        stats = []
+        for f in files:
+            try:
+                stats.append((os.path.getatime(f), f))
+            except OSError:
+                pass
+        return [f for atime, f in sorted(stats)]
+
+    def size(self):
+        """
+        Return the size of the store in bytes.
+        """
+
+        size = 0
+        for f in self.files():
+            try:
+                size += os.path.getsize(f)
+            except OSError:
+                pass
+        return size
+
+    def evict(self, max_size=None, keep=None):
+        """
+        store.evict(max_size=None)
+
+        Remove the least recently used weights files until the store
+        is smaller than max_size (default to store.max_size).
+        """
+
+        if max_size is None:
+            max_size = self.max_size
+        if max_size is None:
+            return
+
+        files = self.files()
+        sizes = [os.path.getsize(f) if os.path.exists(f) else 0 \
+                 for f in files]
+        size = sum(sizes)
+        for f, fsize in zip(files, sizes):
+            if size <= max_size:
+                break
+            if keep is not None and os.path.abspath(f) == keep:
+                continue
+            try:
+                os.remove(f)
+            except OSError:
+                pass
+            size -= fsize
+
+    def clear(self):
+        """
+        Remove all the weights files of the store.
+        """
+
+        self.evict(max_size=0)
+
+    def _acquire(self, key):
+        # create the lock file of key, return its path or None if the
+        # lock is held by another (live) process
+        lock = os.path.join(self.path, key + '.lock')
+        try:
+            fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+            if self._stale(lock):
+                try:
+                    os.remove(lock)
+                except OSError:
+                    pass
+            return None
+        os.write(fd, ('%s %d' % (socket.gethostname(), os.getpid())).encode())
+        os.close(fd)
+        return lock
+
+    def _stale(self, lock):
+        # a lock is stale if its owner died on this host, or if it is
+        # older than lock_timeout
+        try:
+            with open(lock) as f:
+                host, pid = f.read().split()
+            age = time.time() - os.path.getmtime(lock)
+        except (OSError, ValueError):
+            # being written or already removed
+            return False
+        if self.lock_timeout is not None and age > self.lock_timeout:
+            return True
+        if host == socket.gethostname():
+            try:
+                os.kill(int(pid), 0)
+            except OSError as e:
+                return e.errno == errno.ESRCH
+        return False
+
+    def _compute(self, remap_file, src, dst, map_method, map_name, \
+                 num_neighbors, normalize_opt, grid1_periodic, nthreads):
+        # compute the weights in a private directory, then move them
+        # atomically to remap_file
+        tmpdir = tempfile.mkdtemp(prefix='.tmp_', dir=self.path)
+        try:
+            tmp_file = os.path.join(tmpdir, 'weights.nc')
+            if map_method in ['bilinear', 'distwgt', 'nearest']:
+                if map_method == 'nearest':
+                    map_method = 'distwgt'
+                    num_neighbors = 1
+                src_add, dst_add, wgts = _compute_links(src, dst, \
+                                             map_method, \
+                                             num_neighbors=num_neighbors, \
+                                             grid1_periodic=grid1_periodic, \
+                                             nthreads=nthreads)
+                write_scrip_weights(tmp_file, map_name, src, dst, src_add, \
+                                    dst_add, wgts, map_method, \
+                                    normalize_opt=normalize_opt)
+            else:
+                from .compute_remap_weights import compute_remap_weights
+                write_remap_grid_file(src, os.path.join(tmpdir, 'grid1.nc'))
+                write_remap_grid_file(dst, os.path.join(tmpdir, 'grid2.nc'))
+                # scrip reads and writes its namelist in the current
+                # directory
+                cwd = os.getcwd()
+                os.chdir(tmpdir)
+                try:
+                    compute_remap_weights('grid1.nc', 'grid2.nc', \
+                            'weights.nc', 'unused.nc', map_name, 'unused', \
+                            1, map_method, normalize_opt=normalize_opt, \
+                            grid1_periodic='.true.' if grid1_periodic \
+                                           else '.false.')
+                finally:
+                    os.chdir(cwd)
+            os.replace(tmp_file, remap_file)
+        finally:
+            shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _load_grid(grid):
+    # scrip grid description from a scrip grid file or a dictionary
+    if isinstance(grid, dict):
+        return grid
+    return read_remap_grid_file(grid)
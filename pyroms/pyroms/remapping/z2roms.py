@@ -3,10 +3,84 @@
 import numpy as np
 
 import pyroms
+from .vinterp import VerticalInterp, get_vertical_interp
+
+def z2roms_interp(grdz, grd, Cpos='rho', irange=None, jrange=None, \
+                  mode='linear'):
+    """
+    vi = z2roms_interp(grdz, grd)
+
+    optional switch:
+      - Cpos='rho', 'u', 'v' or 'w'  specify the C-grid position where
+                                     the variable rely
+      - irange                       specify grid sub-sample for i direction
+      - jrange                       specify grid sub-sample for j direction
+      - mode='linear' or 'spline'    specify the type of interpolation
+
+    Return the VerticalInterp used by z2roms to interpolate from z
+    vertical grid grdz to ROMS grid grd (first record of zeta). Plans
+    are cached, see pyroms.remapping.vinterp.get_vertical_interp.
+    """
+
+    if mode not in ['linear', 'spline']:
+        raise Warning('%s not supported, defaulting to linear' % mode)
+
+    if Cpos not in ['rho', 'u', 'v', 'w']:
+        raise Warning('%s bad position. Use depth at Arakawa-C \
+                             rho points instead.' % Cpos)
+
+    def build():
+        # only the depths of the window are computed, so the plan of a
+        # boundary strip costs in proportion to the strip
+        if Cpos == 'u':
+            mask = grd.hgrid.mask_u
+        elif Cpos == 'v':
+            mask = grd.hgrid.mask_v
+        else:
+            mask = grd.hgrid.mask_rho
+
+        Mm, Lm = mask.shape
+        i0, i1 = (0, Lm) if irange is None else irange
+        j0, j1 = (0, Mm) if jrange is None else jrange
+
+        def window(zs, j1, i1):
+            # first record of z_r or z_w on [j0:j1,i0:i1], z_r squeezes
+            # the strips one point wide
+            return zs[0,:,j0:j1,i0:i1].reshape((-1, j1-j0, i1-i0))
+
+        if Cpos == 'rho':
+            z = grdz.vgrid.z[:,j0:j1,i0:i1]
+            depth = window(grd.vgrid.z_r, j1, i1)
+        elif Cpos == 'u':
+            z = grdz.vgrid.z[:,j0:j1,i0:i1+1]
+            z = 0.5 * (z[:,:,:-1] + z[:,:,1:])
+            depth = window(grd.vgrid.z_r, j1, i1+1)
+            depth = 0.5 * (depth[:,:,:-1] + depth[:,:,1:])
+        elif Cpos == 'v':
+            z = grdz.vgrid.z[:,j0:j1+1,i0:i1]
+            z = 0.5 * (z[:,:-1,:] + z[:,1:,:])
+            depth = window(grd.vgrid.z_r, j1+1, i1)
+            depth = 0.5 * (depth[:,:-1,:] + depth[:,1:,:])
+        elif Cpos == 'w':
+            z = grdz.vgrid.z[:,j0:j1,i0:i1]
+            depth = window(grd.vgrid.z_w, j1, i1)
+
+        # copy the bottom and top levels far below and above
+        z = np.concatenate((-9999*np.ones((1,z.shape[1], z.shape[2])), \
+               z, \
+               100*np.ones((1,z.shape[1], z.shape[2]))), 0)
+
+        return VerticalInterp(z, depth, mask[j0:j1,i0:i1], mode=mode)
+
+    key = ('z2roms', Cpos, None if irange is None else tuple(irange), \
+           None if jrange is None else tuple(jrange), mode)
+
+    return get_vertical_interp([grdz, grd], key, build)
+
 
 def z2roms(varz, grdz, grd, Cpos='rho', irange=None, jrange=None, \
            spval=1e37, flood=True, dmax=0, cdepth=0, kk=0, \
-           mode='linear'):
+           mode='linear', vinterp=None, dtype=None):
     """
     var = z2roms(var, grdz, grd)
 
@@ -22,45 +96,22 @@ def z2roms(varz, grdz, grd, Cpos='rho', irange=None, jrange=None, \
                                      if depth<cdepth => no flooding
       - kk
       - mode='linear' or 'spline'    specify the type of interpolation
+      - vinterp=None                 VerticalInterp to use, default to
+                                     the cached z2roms_interp plan
+      - dtype=None                   dtype of var ('f4' or 'f8'), default
+                                     to pyroms.remapping.get_dtype()
 
     Interpolate the variable from z vertical grid grdz to ROMS grid grd
     """
-    from .. import _interp
-    from .. import _remapping
-
     varz = varz.copy()
 
     assert len(varz.shape) == 3, 'var must be 3D'
 
-    if mode=='linear':
-        imode=0
-    elif mode=='spline':
-        imode=1
-    else:
-        raise Warning('%s not supported, defaulting to linear' % mode)
-
-    if Cpos == 'rho':
-        z = grdz.vgrid.z[:]
-        depth = grd.vgrid.z_r[0,:]
-        mask = grd.hgrid.mask_rho
-    elif Cpos == 'u':
-        z = 0.5 * (grdz.vgrid.z[:,:,:-1] + grdz.vgrid.z[:,:,1:])
-        depth = 0.5 * (grd.vgrid.z_r[0,:,:,:-1] + grd.vgrid.z_r[0,:,:,1:])
-        mask = grd.hgrid.mask_u
-    elif Cpos == 'v':
-        z = 0.5 * (grdz.vgrid.z[:,:-1,:] + grdz.vgrid.z[:,1:,:])
-        depth = 0.5 * (grd.vgrid.z_r[0,:,:-1,:] + grd.vgrid.z_r[0,:,1:,:])
-        mask = grd.hgrid.mask_v
-    elif Cpos == 'w':
-        z = grdz.vgrid.z[:]
-        depth = grd.vgrid.z_w[0,:]
-        mask = grd.hgrid.mask_rho
-    else:
-        raise Warning('%s bad position. Use depth at Arakawa-C \
-                             rho points instead.' % Cpos)
+    if vinterp is None:
+        vinterp = z2roms_interp(grdz, grd, Cpos=Cpos, irange=irange, \
+                                jrange=jrange, mode=mode)
 
     nlev, Mm, Lm = varz.shape
-    Nm = depth.shape[0]
 
     if irange is None:
         irange = (0,Lm)
@@ -78,23 +129,13 @@ def z2roms(varz, grdz, grd, Cpos='rho', irange=None, jrange=None, \
     if flood:
         varz = pyroms.remapping.flood(varz, grdz, Cpos=Cpos, \
                  irange=irange, jrange=jrange, spval=spval, \
-                 dmax=dmax, cdepth=cdepth, kk=kk)
+                 dmax=dmax, cdepth=cdepth, kk=kk, dtype=dtype)
 
     varz = np.concatenate((varz[0:1,:,:], varz, varz[-1:,:,:]), 0)
-    z = np.concatenate((-9999*np.ones((1,z.shape[1], z.shape[2])), \
-           z, \
-           100*np.ones((1,z.shape[1], z.shape[2]))), 0)
-
-    var = np.ma.zeros((Nm, Mm, Lm))
-
-    for k in range(Nm):
-        var[k,:,:] = _interp.xhslice(varz, \
-                      z[:,jrange[0]:jrange[1], irange[0]:irange[1]], \
-                      depth[k,jrange[0]:jrange[1], irange[0]:irange[1]], \
-                      mask[jrange[0]:jrange[1], irange[0]:irange[1]], \
-                      imode, spval)
-        #mask
-        var = np.ma.masked_values(var, spval, rtol=1e-5)
-        #var[k,:,:] = np.ma.masked_where(mask == 0, var[k,:,:])
+
+    var = vinterp(varz, spval=spval, dtype=dtype)
+
+    #mask
+    var = np.ma.masked_values(var, spval, rtol=1e-5)
 
     return var
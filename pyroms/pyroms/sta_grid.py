@@ -4,7 +4,6 @@ import sys
 import os
 import numpy as np
 # from mpl_toolkits.basemap import Basemap
-import cartopy.crs as ccrs
 from datetime import datetime
 try:
   import netCDF4 as netCDF
@@ -73,6 +72,7 @@ def get_Stations_hgrid(gridid, sta_file):
         #geographical grid
         print('Load geographical grid from file')
         # proj = Basemap(projection='merc', resolution=None, lat_0=0, lon_0=0)
+        import cartopy.crs as ccrs
         proj = ccrs.Mercator()
 
         if 'lon_rho' in list(nc.variables.keys()) and 'lat_rho' in list(nc.variables.keys()):
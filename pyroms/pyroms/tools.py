@@ -5,7 +5,6 @@ import pyroms
 
 
 def zslice(var, depth, grd, Cpos='rho', vert=False, mode='linear'):
-    from . import _iso
     """
     zslice, lon, lat = zslice(var, depth, grd)
 
@@ -22,12 +21,7 @@ def zslice(var, depth, grd, Cpos='rho', vert=False, mode='linear'):
     verticies (to be used with pcolor)
     """
 
-    if mode=='linear':
-        imode=0
-    elif mode=='spline':
-        imode=1
-    else:
-        imode=0
+    if mode not in ['linear', 'spline']:
         raise Warning('%s not supported, defaulting to linear' % mode)
 
 
@@ -119,7 +113,8 @@ def zslice(var, depth, grd, Cpos='rho', vert=False, mode='linear'):
     depth = -abs(depth)
     depth = depth * np.ones(z.shape[1:])
 
-    zslice = _iso.zslice(z, var, depth, imode)
+    vi = pyroms.remapping.VerticalInterp(z, depth, mode=mode)
+    zslice = vi(var, spval=1e20)[0]
 
     # mask land
     zslice = np.ma.masked_where(mask == 0, zslice)
@@ -2,9 +2,8 @@
 
 import sys
 import numpy as np
-import matplotlib as mpl
+# matplotlib and cartopy are imported by the functions that use them
 # from mpl_toolkits.basemap import Basemap
-import cartopy.crs as ccrs
 
 import time
 from datetime import datetime
@@ -40,146 +39,231 @@ def get_lonlat(iindex, jindex, grd, Cpos='rho'):
     return lon[jindex, iindex], lat[jindex, iindex]
 
 
+class _SpatialIndex(object):
+    # KD-tree of the Cpos points of a horizontal grid. Geographic points
+    # are put on the unit sphere, so the nearest point is the nearest
+    # along a great circle and the search is not affected by the
+    # longitude wrap or the convergence of the meridians.
+
+    def __init__(self, x, y, spherical):
+        from scipy.spatial import cKDTree
+        self.x = x
+        self.y = y
+        self.spherical = spherical
+        self.shape = x.shape
+        self.tree = cKDTree(self._points(np.ma.getdata(x), \
+                                         np.ma.getdata(y)))
+
+    def _points(self, x, y):
+        x = np.asarray(x, dtype='f8').reshape(-1)
+        y = np.asarray(y, dtype='f8').reshape(-1)
+        if self.spherical:
+            lon = np.deg2rad(x)
+            lat = np.deg2rad(y)
+            coslat = np.cos(lat)
+            return np.c_[coslat * np.cos(lon), coslat * np.sin(lon), \
+                         np.sin(lat)]
+        else:
+            return np.c_[x, y]
+
+    def query(self, x, y, k=1):
+        # flat index of the k nearest points, -1 for nan positions
+        pts = self._points(x, y)
+        valid = np.all(np.isfinite(pts), axis=1)
+        idx = -np.ones((len(pts), k), dtype=np.int64)
+        if np.any(valid):
+            k = min(k, self.tree.n)
+            _, near = self.tree.query(pts[valid], k=k)
+            idx[valid,:k] = np.reshape(near, (-1, k))
+        return idx
+
+
+def _get_spatial_index(grd, Cpos):
+    # spatial index of the Cpos points of grd (ROMS_Grid, CGrid_geo or
+    # CGrid), built on first use and kept by the horizontal grid
+    hgrid = getattr(grd, 'hgrid', grd)
+
+    if Cpos not in ['rho', 'u', 'v', 'psi', 'vert']:
+        raise Warning('%s bad position. Cpos must be rho, psi, u, v or vert.' \
+                      % Cpos)
+
+    if getattr(hgrid, 'lon_' + Cpos, None) is not None:
+        x = getattr(hgrid, 'lon_' + Cpos)
+        y = getattr(hgrid, 'lat_' + Cpos)
+        spherical = True
+    else:
+        x = getattr(hgrid, 'x_' + Cpos)
+        y = getattr(hgrid, 'y_' + Cpos)
+        spherical = False
+
+    indexes = hgrid.__dict__.setdefault('_spatial_index', {})
+    index = indexes.get(Cpos)
+    # the coordinates may have been replaced since the index was built
+    if index is None or index.x is not x or index.y is not y:
+        index = _SpatialIndex(x, y, spherical)
+        indexes[Cpos] = index
+
+    return index
+
+
+def clear_spatial_index(grd):
+    """
+    clear_spatial_index(grd)
+
+    Drop the spatial indexes kept by grd for get_ij, get_ij_many,
+    locate_cells and find_nearestgridpoints. They are rebuilt on
+    next use, e.g. after the grid coordinates have been modified
+    in place.
+    """
+
+    hgrid = getattr(grd, 'hgrid', grd)
+    hgrid.__dict__.pop('_spatial_index', None)
+
+
+def get_ij_many(longitude, latitude, grd, Cpos='rho'):
+    """
+    i, j = get_ij_many(longitude, latitude, grd)
+
+    optional switch:
+      - Cpos='rho', 'u', 'v', 'psi'  specify the C-grid position of the
+        or 'vert'                    grid points
+
+    return the indices of the closest grid points from the points
+    (longitude,latitude) in degree, arrays of any shape. i and j are
+    integer arrays of the shape of longitude, -1 where the position
+    is not finite. For a cartesian grid, longitude and latitude are
+    the x and y positions.
+
+    The points are searched in a KD-tree of the grid points (on the
+    unit sphere for a geographic grid), built the first time Cpos is
+    used with grd and kept by grd, so locating many points costs in
+    proportion to log(grid size) per point.
+    """
+
+    index = _get_spatial_index(grd, Cpos)
+    shape = np.shape(longitude)
+
+    near = index.query(longitude, latitude)[:,0]
+    jindex, iindex = np.divmod(near, index.shape[1])
+    iindex[near < 0] = -1
+    jindex[near < 0] = -1
+
+    return iindex.reshape(shape), jindex.reshape(shape)
+
+
 def get_ij(longitude, latitude, grd, Cpos='rho'):
     """
     i, j = get_ij(longitude, latitude, grd)
 
     return the index of the closest point on the grid from the
-    point (longitude,latitude) in degree
+    point (longitude,latitude) in degree. See get_ij_many to
+    locate many points at once.
     """
 
-    if Cpos == 'u':
-        lon = grd.hgrid.lon_u[:,:]
-        lat = grd.hgrid.lat_u[:,:]
-    elif Cpos == 'v':
-        lon = grd.hgrid.lon_v[:,:]
-        lat = grd.hgrid.lat_v[:,:]
-    elif Cpos == 'rho':
-        lon = grd.hgrid.lon_rho[:,:]
-        lat = grd.hgrid.lat_rho[:,:]
-    elif Cpos == 'psi':
-        lon = grd.hgrid.lon_psi[:,:]
-        lat = grd.hgrid.lat_psi[:,:]
-    else:
-        raise Warning('%s bad position. Cpos must be rho, psi, u or v.' % Cpos)
+    iindex, jindex = get_ij_many(longitude, latitude, grd, Cpos=Cpos)
 
-    lon = lon[:,:] - longitude
-    lat = lat[:,:] - latitude
+    return iindex.flat[0], jindex.flat[0]
 
-    diff = (lon * lon) + (lat * lat)
 
-    jindex, iindex = np.where(diff==diff.min())
+def _inside_cells(index, x, y, jc, ic):
+    # True where point (x,y) is inside cell (jc,ic) of the grid of
+    # index, the cell with the points (jc,ic), (jc,ic+1), (jc+1,ic+1)
+    # and (jc+1,ic) as corners. Crossing number test of the quadrilateral
+    # in the plane of the coordinates, relative to the point.
+    Mp, Lp = index.shape
+    valid = (jc >= 0) & (jc < Mp-1) & (ic >= 0) & (ic < Lp-1)
+    jc = np.where(valid, jc, 0)
+    ic = np.where(valid, ic, 0)
 
-    return iindex[0], jindex[0]
+    cj = jc[:,np.newaxis] + np.array([0, 0, 1, 1])
+    ci = ic[:,np.newaxis] + np.array([0, 1, 1, 0])
+    xc = np.asarray(np.ma.getdata(index.x)[cj,ci], dtype='f8') - x[:,np.newaxis]
+    yc = np.asarray(np.ma.getdata(index.y)[cj,ci], dtype='f8') - y[:,np.newaxis]
+    if index.spherical:
+        xc = (xc + 180.) % 360. - 180.
 
+    xn = np.roll(xc, -1, axis=1)
+    yn = np.roll(yc, -1, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cross = ((yc > 0) != (yn > 0)) & \
+                (xc - yc * (xn - xc) / (yn - yc) > 0)
 
+    return valid & (np.sum(cross, axis=1) % 2 == 1)
 
-def find_nearestgridpoints(longitude, latitude, grd, Cpos='rho'):
 
+def locate_cells(longitude, latitude, grd, Cpos='vert', k=4):
+    """
+    i, j = locate_cells(longitude, latitude, grd)
+
+    optional switch:
+      - Cpos='vert', 'rho', 'u', 'v' specify the C-grid position of the
+        or 'psi'                     cell corners
+      - k=4                          number of closest grid points whose
+                                     cells are searched
+
+    return the indices of the grid cells containing the points
+    (longitude,latitude) in degree, arrays of any shape. Cell (i,j)
+    has the Cpos points (i,j), (i+1,j), (i+1,j+1) and (i,j+1) as
+    corners (the rho cell (i,j) for Cpos='vert'). i and j are integer
+    arrays of the shape of longitude, -1 where the point is not in the
+    grid.
+
+    The cells around the closest grid point are tested first, then the
+    cells around the next closest ones (up to k) for the points that
+    were not found, the search uses the spatial index of get_ij_many.
+    """
 
-    if type(grd).__name__ == 'ROMS_Grid':
+    index = _get_spatial_index(grd, Cpos)
+    shape = np.shape(longitude)
+    x = np.asarray(longitude, dtype='f8').reshape(-1)
+    y = np.asarray(latitude, dtype='f8').reshape(-1)
+    iindex = -np.ones(len(x), dtype=np.int64)
+    jindex = -np.ones(len(x), dtype=np.int64)
+
+    near = index.query(x, y, k=k)
+    # cells around a grid point, in the order of find_nearestgridpoints
+    dj = [0, -1, -1, 0]
+    di = [0, 0, -1, -1]
+    for n in range(near.shape[1]):
+        todo = np.where((iindex < 0) & (near[:,n] >= 0))[0]
+        if len(todo) == 0:
+            break
+        jn, iin = np.divmod(near[todo,n], index.shape[1])
+        for c in range(4):
+            inside = _inside_cells(index, x[todo], y[todo], \
+                                   jn + dj[c], iin + di[c])
+            found = todo[inside]
+            iindex[found] = iin[inside] + di[c]
+            jindex[found] = jn[inside] + dj[c]
+            todo = todo[~inside]
+            jn = jn[~inside]
+            iin = iin[~inside]
+
+    return iindex.reshape(shape), jindex.reshape(shape)
 
-        if Cpos == 'u':
-            lon = grd.hgrid.lon_u[:,:]
-            lat = grd.hgrid.lat_u[:,:]
-        elif Cpos == 'v':
-            lon = grd.hgrid.lon_v[:,:]
-            lat = grd.hgrid.lat_v[:,:]
-        elif Cpos == 'rho':
-            lon = grd.hgrid.lon_rho[:,:]
-            lat = grd.hgrid.lat_rho[:,:]
-        elif Cpos == 'vert':
-            lon = grd.hgrid.lon_vert[:,:]
-            lat = grd.hgrid.lat_vert[:,:]
-        else:
-            raise Warning('%s bad position. Cpos must be rho, u or v.' % Cpos)
 
+def find_nearestgridpoints(longitude, latitude, grd, Cpos='rho'):
+    """
+    iindex, jindex = find_nearestgridpoints(longitude, latitude, grd)
 
-    if type(grd).__name__ == 'CGrid_geo':
+    return the indices [i, i+1] and [j, j+1] of the corners of the grid
+    cell containing the point (longitude,latitude) in degree, [] and []
+    if the point is not in the grid. See locate_cells to locate many
+    points at once.
+    """
 
-        if Cpos == 'u':
-            lon = grd.lon_u[:,:]
-            lat = grd.lat_u[:,:]
-        elif Cpos == 'v':
-            lon = grd.lon_v[:,:]
-            lat = grd.lat_v[:,:]
-        elif Cpos == 'rho':
-            lon = grd.lon_rho[:,:]
-            lat = grd.lat_rho[:,:]
-        elif Cpos == 'vert':
-            lon = grd.lon_vert[:,:]
-            lat = grd.lat_vert[:,:]
-        else:
-            raise Warning('%s bad position. Cpos must be rho, u or v.' % Cpos)
-
-
-    dlon = lon[:,:] - longitude
-    dlat = lat[:,:] - latitude
-
-    diff = (dlon * dlon) + (dlat * dlat)
-
-    jidx, iidx = np.where(diff==diff.min())
-
-    iidx = iidx[0] # take element 1 in case min dist is not unique
-    jidx = jidx[0]
-
-    try:
-
-        iindex = [iidx, iidx+1, iidx+1, iidx]
-        jindex = [jidx, jidx, jidx+1, jidx+1]
-        xp = lon[jindex, iindex]
-        yp = lat[jindex, iindex]
-        verts = []
-        for n in range(4):
-            verts.append([xp[n], yp[n]])
-        #inside = pnpoly(longitude, latitude, verts)
-        inside = mpl.path.Path(verts).contains_point([longitude, latitude])
-
-        if inside == 0:
-            iindex = [iidx, iidx+1, iidx+1, iidx]
-            jindex = [jidx-1, jidx-1, jidx, jidx]
-            xp = lon[jindex, iindex]
-            yp = lat[jindex, iindex]
-            verts = []
-            for n in range(4):
-                verts.append([xp[n], yp[n]])
-            #inside = pnpoly(longitude, latitude, verts)
-            inside = mpl.path.Path(verts).contains_point([longitude, latitude])
-
-            if inside == 0:
-                iindex = [iidx-1, iidx, iidx, iidx-1]
-                jindex = [jidx-1, jidx-1, jidx, jidx]
-                xp = lon[jindex, iindex]
-                yp = lat[jindex, iindex]
-                verts = []
-                for n in range(4):
-                    verts.append([xp[n], yp[n]])
-                #inside = pnpoly(longitude, latitude, verts)
-                inside = mpl.path.Path(verts).contains_point([longitude, latitude])
-
-                if inside == 0:
-                    iindex = [iidx-1, iidx, iidx, iidx-1]
-                    jindex = [jidx, jidx, jidx+1, jidx+1]
-                    xp = lon[jindex, iindex]
-                    yp = lat[jindex, iindex]
-                    verts = []
-                    for n in range(4):
-                        verts.append([xp[n], yp[n]])
-                    #inside = pnpoly(longitude, latitude, verts)
-                    inside = mpl.path.Path(verts).contains_point([longitude, latitude])
-
-                    if inside == 0:
-                        raise ValueError('well where is it then?')
-
-        iindex = iindex[:2]
-        jindex = jindex[1:3]
-
-    except:
+    if Cpos not in ['rho', 'u', 'v', 'vert']:
+        raise Warning('%s bad position. Cpos must be rho, u or v.' % Cpos)
+
+    iidx, jidx = locate_cells(longitude, latitude, grd, Cpos=Cpos)
+    iidx = int(iidx.flat[0])
+    jidx = int(jidx.flat[0])
+
+    if iidx < 0:
         #print 'point (%f, %f) is not in the grid' %(longitude, latitude)
-        iindex = []
-        jindex = []
+        return [], []
 
-    return iindex, jindex
+    return [iidx, iidx+1], [jidx, jidx+1]
 
 
 
@@ -248,6 +332,8 @@ def get_grid_proj(grd, type='merc', resolution='h', **kwargs):
 
     return a Basemap object that can be use for plotting
     """
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs
 
     lon_min = grd.hgrid.lon_vert.min()
     lon_max = grd.hgrid.lon_vert.max()
@@ -376,6 +462,66 @@ def get_surface(varz, mask, spval=1e37):
     return surface
 
 
+def get_column_range(varz, mask, spval=1e37):
+    """
+    first, last = get_column_range(varz, mask, spval=1e37)
+
+    Return the indices of the first and last levels of varz (z,y,x)
+    holding a value (not spval, nan or masked) for all the columns
+    where mask is 1. Like get_bottom and get_surface, without the
+    compiled _interp module. Columns without any value, or where mask
+    is not 1, get -1.
+    """
+
+    assert len(varz.shape) == 3, 'var must be 3D'
+
+    nlev = varz.shape[0]
+    valid = ~np.ma.getmaskarray(varz)
+    data = np.ma.getdata(varz)
+    with np.errstate(invalid='ignore'):
+        valid &= abs((data - spval) / spval) > 1e-5
+
+    col = (np.asarray(mask) == 1) & valid.any(axis=0)
+    first = np.where(col, valid.argmax(axis=0), -1)
+    last = np.where(col, (nlev - 1) - valid[::-1].argmax(axis=0), -1)
+
+    return first, last
+
+
+def fill_columns(varz, mask, spval=1e37, first=True, last=True):
+    """
+    varz = fill_columns(varz, mask, spval=1e37, first=True, last=True)
+
+    Vertical extrapolation of varz (z,y,x) in all the columns where
+    mask is 1, in a single pass:
+      - first=True      the levels before the first level holding a
+                        value take this value
+      - last=True       the levels after the last level holding a
+                        value take this value
+
+    When level 0 is the bottom (z grids of pyroms) first extends the
+    deepest value down and last the shallowest value up. When level 0
+    is the surface (SODA, GLORYS, HYCOM data) last extends the deepest
+    value down. Columns without any value are left unchanged.
+    """
+
+    kfirst, klast = get_column_range(varz, mask, spval=spval)
+    col = kfirst >= 0
+    kfirst = np.maximum(kfirst, 0)[np.newaxis]
+    klast = np.maximum(klast, 0)[np.newaxis]
+
+    varz = np.array(varz)
+    k = np.arange(varz.shape[0]).reshape((-1, 1, 1))
+    if first:
+        vfirst = np.take_along_axis(varz, kfirst, axis=0)
+        varz = np.where(col & (k < kfirst), vfirst, varz)
+    if last:
+        vlast = np.take_along_axis(varz, klast, axis=0)
+        varz = np.where(col & (k > klast), vlast, varz)
+
+    return varz
+
+
 def move2grid(varin, init_grid, final_grid):
     '''
     tempu = move2grid(temp, 'rho', 'u')
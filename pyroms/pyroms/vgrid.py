@@ -10,6 +10,11 @@ __docformat__ = "restructuredtext en"
 
 import numpy as np
 import warnings
+from collections import OrderedDict
+
+
+# number of zeta records whose depths are kept by z_r and z_w
+cache_size = 2
 
 
 class s_coordinate(object):
@@ -20,9 +25,13 @@ class s_coordinate(object):
     return an object that can be indexed to return depths
 
     s = s_coordinate(h, theta_b, theta_s, Tcline, N)
+
+    With dtype='f4' the depths s.z_r and s.z_w are computed in single
+    precision.
     """
 
-    def __init__(self, h, theta_b, theta_s, Tcline, N, hraw=None, zeta=None):
+    def __init__(self, h, theta_b, theta_s, Tcline, N, hraw=None, zeta=None, \
+                 dtype='f8'):
         self.hraw = hraw
         self.h = np.asarray(h)
         self.hmin = h.min()
@@ -53,8 +62,8 @@ class s_coordinate(object):
         self._get_Cs_r()
         self._get_Cs_w()
 
-        self.z_r = z_r(self.h, self.hc, self.N, self.s_rho, self.Cs_r, self.zeta, self.Vtrans)
-        self.z_w = z_w(self.h, self.hc, self.Np, self.s_w, self.Cs_w, self.zeta, self.Vtrans)
+        self.z_r = z_r(self.h, self.hc, self.N, self.s_rho, self.Cs_r, self.zeta, self.Vtrans, dtype=dtype)
+        self.z_w = z_w(self.h, self.hc, self.Np, self.s_w, self.Cs_w, self.zeta, self.Vtrans, dtype=dtype)
 
 
     def _get_s_rho(self):
@@ -85,6 +94,24 @@ class s_coordinate(object):
         else:
             self.Cs_w = self.s_w
 
+    def iter_z_r(self, chunk=1, trange=None):
+        """
+        for tidx, z_r in s.iter_z_r(chunk=1, trange=None):
+
+        Iterate over the depths of rho points by blocks of chunk zeta
+        records, see z_r.iter.
+        """
+        return self.z_r.iter(chunk=chunk, trange=trange)
+
+    def iter_z_w(self, chunk=1, trange=None):
+        """
+        for tidx, z_w in s.iter_z_w(chunk=1, trange=None):
+
+        Iterate over the depths of w points by blocks of chunk zeta
+        records, see z_w.iter.
+        """
+        return self.z_w.iter(chunk=chunk, trange=trange)
+
 
 
 class s_coordinate_2(s_coordinate):
@@ -97,7 +124,8 @@ class s_coordinate_2(s_coordinate):
     s = s_coordinate_2(h, theta_b, theta_s, Tcline, N)
     """
 
-    def __init__(self, h, theta_b, theta_s, Tcline, N, hraw=None, zeta=None):
+    def __init__(self, h, theta_b, theta_s, Tcline, N, hraw=None, zeta=None, \
+                 dtype='f8'):
         self.hraw = hraw
         self.h = np.asarray(h)
         self.hmin = h.min()
@@ -128,8 +156,8 @@ class s_coordinate_2(s_coordinate):
         self._get_Cs_r()
         self._get_Cs_w()
 
-        self.z_r = z_r(self.h, self.hc, self.N, self.s_rho, self.Cs_r, self.zeta, self.Vtrans)
-        self.z_w = z_w(self.h, self.hc, self.Np, self.s_w, self.Cs_w, self.zeta, self.Vtrans)
+        self.z_r = z_r(self.h, self.hc, self.N, self.s_rho, self.Cs_r, self.zeta, self.Vtrans, dtype=dtype)
+        self.z_w = z_w(self.h, self.hc, self.Np, self.s_w, self.Cs_w, self.zeta, self.Vtrans, dtype=dtype)
 
 
     def _get_s_rho(self):
@@ -181,7 +209,8 @@ class s_coordinate_4(s_coordinate):
     s = s_coordinate_4(h, theta_b, theta_s, Tcline, N)
     """
 
-    def __init__(self, h, theta_b, theta_s, Tcline, N, hraw=None, zeta=None):
+    def __init__(self, h, theta_b, theta_s, Tcline, N, hraw=None, zeta=None, \
+                 dtype='f8'):
         self.hraw = hraw
         self.h = np.asarray(h)
         self.hmin = h.min()
@@ -209,8 +238,8 @@ class s_coordinate_4(s_coordinate):
         self._get_Cs_r()
         self._get_Cs_w()
 
-        self.z_r = z_r(self.h, self.hc, self.N, self.s_rho, self.Cs_r, self.zeta, self.Vtrans)
-        self.z_w = z_w(self.h, self.hc, self.Np, self.s_w, self.Cs_w, self.zeta, self.Vtrans)
+        self.z_r = z_r(self.h, self.hc, self.N, self.s_rho, self.Cs_r, self.zeta, self.Vtrans, dtype=dtype)
+        self.z_w = z_w(self.h, self.hc, self.Np, self.s_w, self.Cs_w, self.zeta, self.Vtrans, dtype=dtype)
 
 
     def _get_s_rho(self):
@@ -258,7 +287,8 @@ class s_coordinate_5(s_coordinate):
     Brian Powell's surface stretching.
     """
 
-    def __init__(self, h, theta_b, theta_s, Tcline, N, hraw=None, zeta=None):
+    def __init__(self, h, theta_b, theta_s, Tcline, N, hraw=None, zeta=None, \
+                 dtype='f8'):
         self.hraw = hraw
         self.h = np.asarray(h)
         self.hmin = h.min()
@@ -286,8 +316,8 @@ class s_coordinate_5(s_coordinate):
         self._get_Cs_r()
         self._get_Cs_w()
 
-        self.z_r = z_r(self.h, self.hc, self.N, self.s_rho, self.Cs_r, self.zeta, self.Vtrans)
-        self.z_w = z_w(self.h, self.hc, self.Np, self.s_w, self.Cs_w, self.zeta, self.Vtrans)
+        self.z_r = z_r(self.h, self.hc, self.N, self.s_rho, self.Cs_r, self.zeta, self.Vtrans, dtype=dtype)
+        self.z_w = z_w(self.h, self.hc, self.Np, self.s_w, self.Cs_w, self.zeta, self.Vtrans, dtype=dtype)
 
     def _get_s_rho(self):
         lev = np.arange(1, self.N+1) - .5
@@ -327,100 +357,241 @@ class s_coordinate_5(s_coordinate):
             self.Cs_w = csur
 
 
-class z_r(object):
-    """
-    return an object that can be indexed to return depths of rho point
+def _basic_index(key, shape):
+    # key as a tuple of len(shape) slices (integers become length one
+    # slices), None if key uses advanced indexing. The integers are
+    # checked against the known (not None) dimensions of shape
+    ndim = len(shape)
+    if not isinstance(key, tuple):
+        key = (key,)
+    if any(k is Ellipsis for k in key):
+        n = key.index(Ellipsis)
+        key = key[:n] + (slice(None),) * (ndim - len(key) + 1) + key[n+1:]
+    if len(key) > ndim:
+        return None
+    index = []
+    for k, n in zip(key + (slice(None),) * (ndim - len(key)), shape):
+        if isinstance(k, slice):
+            index.append(k)
+        elif isinstance(k, (int, np.integer)) and not isinstance(k, bool):
+            if n is not None and not -n <= k < n:
+                raise IndexError('index %d is out of bounds for axis ' \
+                                 'with size %d' % (k, n))
+            index.append(slice(k, k+1 if k != -1 else None))
+        else:
+            return None
+    return tuple(index)
+
 
-    z_r = z_r(h, hc, N, s_rho, Cs_r, zeta, Vtrans)
+class _z_levels(object):
+    """
+    Depths of the levels s, Cs of a s-coordinate, computed when indexed.
+
+    The depths are computed with broadcasting, for the requested times,
+    levels and points only. The full depths of the last cache_size
+    zeta records indexed are kept, so indexing again the same record
+    (z_r[0,:] for every variable) does not recompute them. A cached
+    record is only reused if the zeta values it has been computed with
+    did not change.
     """
 
-    def __init__(self, h, hc, N, s_rho, Cs_r, zeta, Vtrans):
-        self.h = h
-        self.hc = hc
-        self.N = N
-        self.s_rho = s_rho
-        self.Cs_r = Cs_r
+    def _setup(self, zeta, Vtrans, dtype):
         self.zeta = zeta
         self.Vtrans = Vtrans
+        self.dtype = dtype
+        self._cache = OrderedDict()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_cache'] = OrderedDict()
+        return state
+
+    def _depths(self, zeta, s, Cs, hidx):
+        # (nt, nk) + h[hidx].shape depths for the (nt,) + h[hidx].shape
+        # zeta and the levels s, Cs
+        dtype = np.dtype(self.dtype)
+        h = np.asarray(self.h[hidx], dtype=dtype)
+        hc = dtype.type(self.hc)
+        shape = (1, -1) + (1,) * h.ndim
+        s = np.asarray(s, dtype=dtype).reshape(shape)
+        Cs = np.asarray(Cs, dtype=dtype).reshape(shape)
+        zeta = np.asarray(np.ma.getdata(zeta), dtype=dtype)[:,np.newaxis]
+        nt = zeta.shape[0]
+        z = np.empty((nt, s.shape[1]) + h.shape, dtype=dtype)
+        # in place operations (same arithmetic as the level by level
+        # formulas), the depths of a single record are computed in z
+        z0 = z if nt == 1 else np.empty(z.shape[1:], dtype=dtype)[np.newaxis]
+        if self.Vtrans == 1:
+            np.multiply(h - hc, Cs, out=z0)
+            z0 += hc * s
+            t = z0 / h
+            t += 1.0
+            if nt == 1:
+                t *= zeta
+                z += t
+            else:
+                np.multiply(zeta, t, out=z)
+                z += z0
+        elif self.Vtrans == 2 or self.Vtrans == 4 or self.Vtrans == 5:
+            np.multiply(h, Cs, out=z0)
+            z0 += hc * s
+            z0 /= hc + h
+            if nt == 1:
+                z *= zeta + h
+                z += zeta
+            else:
+                np.multiply(zeta + h, z0, out=z)
+                z += zeta
+        else:
+            raise ValueError('Vtransform %s not supported' % self.Vtrans)
+        return z
+
+    def _record(self, t, kidx, hidx):
+        # depths of the levels kidx and points hidx for the zeta record
+        # t (None if zeta is not time dependent), through the cache
+        if t is None:
+            zeta = np.ma.getdata(self.zeta[hidx])
+        else:
+            zeta = np.ma.getdata(self.zeta[(t,) + hidx])
+
+        key = None if t is None else int(t)
+        if key in self._cache:
+            zeta0, z = self._cache[key]
+            if np.array_equal(zeta0[hidx], zeta, equal_nan=True):
+                self._cache.move_to_end(key)
+                return np.array(z[(kidx,) + hidx])
+            del self._cache[key]
+
+        s, Cs = self._levels()
+        if all(i == slice(None) for i in hidx) and cache_size > 0:
+            z = self._depths(zeta[np.newaxis], s, Cs, hidx)[0]
+            self._cache[key] = (np.array(zeta), z)
+            while len(self._cache) > cache_size:
+                self._cache.popitem(last=False)
+            return np.array(z[kidx])
+
+        return self._depths(zeta[np.newaxis], s[kidx], Cs[kidx], hidx)[0]
+
+    def iter(self, chunk=1, trange=None):
+        """
+        for tidx, z in z_r.iter(chunk=1, trange=None):
+
+        Iterate over the zeta records trange (default to all of them)
+        by blocks of chunk records, yielding the time indices tidx of
+        the block and its (len(tidx), N) + h.shape depths. Only one
+        block of zeta and depths is read and computed at a time, so a
+        netCDF (or MFDataset) zeta spanning years of history files can
+        be processed with bounded memory. The blocks are not cached.
+        """
+
+        chunk = max(int(chunk), 1)
+        if len(self.zeta.shape) > len(self.h.shape):
+            ntime = self.zeta.shape[0]
+        else:
+            ntime = 1
+        if trange is None:
+            trange = range(ntime)
+        trange = np.arange(ntime)[np.asarray(trange, dtype=int)]
+
+        s, Cs = self._levels()
+        hidx = (slice(None),) * self.h.ndim
+        for n in range(0, len(trange), chunk):
+            tidx = trange[n:n+chunk]
+            if ntime == 1 and len(self.zeta.shape) == len(self.h.shape):
+                zeta = np.ma.getdata(self.zeta[:])[np.newaxis]
+            elif np.all(np.diff(tidx) == 1):
+                # contiguous records are read at once
+                zeta = np.ma.getdata(self.zeta[tidx[0]:tidx[-1]+1])
+            else:
+                zeta = np.stack([np.ma.getdata(self.zeta[t]) for t in tidx])
+            yield tidx, self._depths(zeta, s, Cs, hidx)
 
     def __getitem__(self, key):
 
-        if isinstance(key, tuple) and len(self.zeta.shape) > len(self.h.shape):
-            zeta = self.zeta[key[0]]
-            res_index = (slice(None),) + key[1:]
-        elif len(self.zeta.shape) > len(self.h.shape):
-            zeta = self.zeta[key]
-            res_index = slice(None)
+        ndim = 2 + self.h.ndim
+        nt = 1
+        if len(self.zeta.shape) > len(self.h.shape):
+            if isinstance(key, tuple):
+                tkey = key[0]
+                key = (slice(None),) + key[1:]
+            else:
+                tkey = key
+                key = slice(None)
+            if not isinstance(tkey, (int, np.integer)):
+                nt = None
         else:
-            zeta = self.zeta
-            res_index = key
+            tkey = None
 
-        if self.h.ndim == zeta.ndim:       # Assure a time-dimension exists
-            zeta = zeta[np.newaxis, :]
+        shape = (nt, len(self._levels()[0])) + self.h.shape
+        index = _basic_index(key, shape)
+        if index is None:
+            # advanced indexing, compute the requested records and index
+            full = (slice(None),) * ndim
+            return np.squeeze(self._get(tkey, full)[key])
 
-        ti = zeta.shape[0]
-        z_r = np.empty((ti, self.N) + self.h.shape, 'd')
-        if self.Vtrans == 1:
-            for n in range(ti):
-                for  k in range(self.N):
-                    z0 = self.hc * self.s_rho[k] + (self.h - self.hc) * self.Cs_r[k]
-                    z_r[n,k,:] = z0 + zeta[n,:] * (1.0 + z0 / self.h)
-        elif self.Vtrans == 2 or self.Vtrans == 4 or self.Vtrans == 5:
-            for n in range(ti):
-                for  k in range(self.N):
-                    z0 = (self.hc * self.s_rho[k] + self.h * self.Cs_r[k]) / \
-                          (self.hc + self.h)
-                    z_r[n,k,:] = zeta[n,:] + (zeta[n,:] + self.h) * z0
+        return np.squeeze(self._get(tkey, index))
+
+    def _get(self, tkey, index):
+        # (nt, nk) + h.shape array of the depths of the zeta records
+        # tkey, indexed by the tuple of slices index
+        tidx, kidx, hidx = index[0], index[1], index[2:]
+        if tkey is None or (isinstance(tkey, (int, np.integer)) and \
+                            not isinstance(tkey, bool)):
+            return self._record(tkey, kidx, hidx)[np.newaxis][tidx]
 
-        return np.squeeze(z_r[res_index])
+        zeta = np.ma.getdata(self.zeta[tkey])
+        if zeta.ndim == self.h.ndim:
+            zeta = zeta[np.newaxis]
+        s, Cs = self._levels()
+        return self._depths(zeta[(tidx,) + hidx], s[kidx], Cs[kidx], hidx)
 
 
-class z_w(object):
+class z_r(_z_levels):
     """
-    return an object that can be indexed to return depths of w point
+    return an object that can be indexed to return depths of rho point
 
-    z_w = z_w(h, hc, Np, s_w, Cs_w, zeta, Vtrans)
+    z_r = z_r(h, hc, N, s_rho, Cs_r, zeta, Vtrans, dtype='f8')
+
+    Only the requested subset is computed (z_r[t, k] or
+    z_r[t, :, j0:j1, i0:i1]), the full depths of the last zeta
+    records indexed are cached. dtype='f4' halves the memory of the
+    depths of large grids.
     """
 
-    def __init__(self, h, hc, Np, s_w, Cs_w, zeta, Vtrans):
+    def __init__(self, h, hc, N, s_rho, Cs_r, zeta, Vtrans, dtype='f8'):
         self.h = h
         self.hc = hc
-        self.Np = Np
-        self.s_w = s_w
-        self.Cs_w = Cs_w
-        self.zeta = zeta
-        self.Vtrans = Vtrans
+        self.N = N
+        self.s_rho = s_rho
+        self.Cs_r = Cs_r
+        self._setup(zeta, Vtrans, dtype)
 
-    def __getitem__(self, key):
+    def _levels(self):
+        return np.asarray(self.s_rho), np.asarray(self.Cs_r)
 
-        if isinstance(key, tuple) and len(self.zeta.shape) > len(self.h.shape):
-            zeta = self.zeta[key[0]]
-            res_index = (slice(None),) + key[1:]
-        elif len(self.zeta.shape) > len(self.h.shape):
-            zeta = self.zeta[key]
-            res_index = slice(None)
-        else:
-            zeta = self.zeta
-            res_index = key
 
-        if self.h.ndim == zeta.ndim:       # Assure a time-dimension exists
-            zeta = zeta[np.newaxis, :]
+class z_w(_z_levels):
+    """
+    return an object that can be indexed to return depths of w point
 
-        ti = zeta.shape[0]
-        z_w = np.empty((ti, self.Np) + self.h.shape, 'd')
-        if self.Vtrans == 1:
-            for n in range(ti):
-                for  k in range(self.Np):
-                    z0 = self.hc * self.s_w[k] + (self.h - self.hc) * self.Cs_w[k]
-                    z_w[n,k,:] = z0 + zeta[n,:] * (1.0 + z0 / self.h)
-        elif self.Vtrans == 2 or self.Vtrans == 4 or self.Vtrans == 5:
-            for n in range(ti):
-                for  k in range(self.Np):
-                    z0 = (self.hc * self.s_w[k] + self.h * self.Cs_w[k]) / \
-                          (self.hc + self.h)
-                    z_w[n,k,:] = zeta[n,:] + (zeta[n,:] + self.h) * z0
+    z_w = z_w(h, hc, Np, s_w, Cs_w, zeta, Vtrans, dtype='f8')
+
+    Only the requested subset is computed (z_w[t, k] or
+    z_w[t, :, j0:j1, i0:i1]), the full depths of the last zeta
+    records indexed are cached. dtype='f4' halves the memory of the
+    depths of large grids.
+    """
+
+    def __init__(self, h, hc, Np, s_w, Cs_w, zeta, Vtrans, dtype='f8'):
+        self.h = h
+        self.hc = hc
+        self.Np = Np
+        self.s_w = s_w
+        self.Cs_w = Cs_w
+        self._setup(zeta, Vtrans, dtype)
 
-        return np.squeeze(z_w[res_index])
+    def _levels(self):
+        return np.asarray(self.s_w), np.asarray(self.Cs_w)
 
 
 
@@ -434,6 +605,7 @@ class z_coordinate(object):
     def __init__(self, h, depth, N):
         self.h = np.asarray(h)
         self.N = int(N)
+        self.depth = np.asarray(depth)
 
         ndim = len(h.shape)
 #       print(h.shape, ndim)
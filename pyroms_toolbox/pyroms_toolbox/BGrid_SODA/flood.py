@@ -93,11 +93,6 @@ def flood(varz, Bgrd, Bpos='t', irange=None, jrange=None, \
     # drop the deepest values down
     idx = np.where(np.isnan(varz) == 1)
     varz[idx] = spval
-    bottom = pyroms.utility.get_bottom(varz[::-1,:,:], mask, spval=spval)
-    bottom = (nlev-1) - bottom
-    for i in range(Lm):
-        for j in range(Mm):
-            if mask[j,i] == 1:
-                varz[int(bottom[j,i]):,j,i] = varz[int(bottom[j,i]),j,i]
+    varz = pyroms.utility.fill_columns(varz, mask, spval=spval, first=False)
 
     return varz
@@ -35,14 +35,8 @@ def get_nc_BGrid_SODA(grdfile, name='SODA_2.1.6_CORAL', area='global', \
     nc_mask_uv = nc.variables['MASK_UV']
     mask_uv = np.array(~nc_mask_uv[:].mask, dtype='int')
 
-    bottom = pyroms.utility.get_bottom(nc_mask_t[::-1,:,:], mask_t[0,:], spval=nc_mask_t.missing_value)
-    nlev = mask_t.shape[0]
-    bottom = (nlev-1) - bottom
-    h = np.zeros(mask_t[0,:].shape)
-    for i in range(mask_t[0,:].shape[1]):
-        for j in range(mask_t[0,:].shape[0]):
-            if mask_t[0,j,i] == 1:
-                h[j,i] = depth_bnds[int(bottom[j,i])]
+    _, bottom = pyroms.utility.get_column_range(nc_mask_t[:], mask_t[0,:], spval=nc_mask_t.missing_value)
+    h = np.where(bottom >= 0, depth_bnds[bottom], 0.)
 
     if area == 'global':
         #add one row in the north and the south
@@ -3,6 +3,8 @@
 import numpy as np
 #from pyroms import _remapping
 
+import pyroms
+
 
 def flood2d(varz, Cgrd, Cpos='t', irange=None, jrange=None, \
           spval=-9.99e+33, dmax=0):
@@ -21,7 +23,6 @@ def flood2d(varz, Cgrd, Cpos='t', irange=None, jrange=None, \
     Flood varz on Cgrd
     """
 
-    import creep
     varz = varz.copy()
     varz = np.array(varz)
 
@@ -72,8 +73,6 @@ def flood2d(varz, Cgrd, Cpos='t', irange=None, jrange=None, \
     c2 = np.isnan(varz[:,:]) == 1
     c3 = np.ones(mask.shape).astype(bool)
     c = c1 & c3
-    print("shapes", varz.shape, c1[946,1053], c2[946,1053], c3[946,1053], c[946,1053], varz[946,1053])
-    print("shapes", varz.shape, c1[950,1060], c2[950,1060], c3[950,1060], c[950,1060], varz[950,1060])
     idxnan = np.where(c == True)
     idx = np.where(c2 == False)
     if list(idx[0]):
@@ -85,7 +84,7 @@ def flood2d(varz, Cgrd, Cpos='t', irange=None, jrange=None, \
         dry[:,1] = idxnan[1]+1
 
 #       varz[:] = _remapping.flood(varz[:], wet, dry, x, y, dmax)
-        varz[:] = creep.cslf(varz[:],spval,-200.,200.)
+        varz[:] = pyroms.remapping.creeping_sea(varz[:], spval=spval, \
+                                                validmin=-200., validmax=200.)
 
-    print("after flood", varz.shape, varz[946,1053])
     return varz
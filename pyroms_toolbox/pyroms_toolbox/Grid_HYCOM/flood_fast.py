@@ -1,12 +1,9 @@
 # encoding: utf-8
 
 import numpy as np
-from pyroms import _remapping_fast
 
 import pyroms
 
-import creep
-
 def flood_fast(varz, grd, pos='t', irange=None, jrange=None, \
           spval=1.2676506e+30, dxy=5, cdepth=0, kk=0):
     """
@@ -61,46 +58,15 @@ def flood_fast(varz, grd, pos='t', irange=None, jrange=None, \
     h = h[jrange[0]:jrange[1], irange[0]:irange[1]]
     mask = mask[jrange[0]:jrange[1], irange[0]:irange[1]]
 
-    # Finding nearest values in horizontal
-    # critical deph => no change if depth is less than specified value
-    cdepth = abs(cdepth)
-    if cdepth != 0:
-        idx = np.where(h >= cdepth)
-        msk = np.zeros(mask.shape)
-        msk[idx] = 1
-    else:
-        msk = mask.copy()
-    for k in range(nlev-1,-1,-1):
-        c1 = np.array(msk, dtype=bool)
-        c2 = np.isnan(varz[k,:,:]) == 1
-        if kk == 0:
-            c3 = np.ones(mask.shape).astype(bool)
-        else:
-            c3 = np.isnan(varz[max(k-kk,0),:,:]) == 0
-        c = c1 & c2 & c3
-        idxnan = np.where(c == True)
-        idx = np.where(c2 == False)
-        if list(idx[0]):
-            wet_mask = np.zeros(mask.shape)
-            wet_mask[idx] = 1
-            dry = np.zeros((len(idxnan[0]),2))
-            dry[:,0] = idxnan[0]+1
-            dry[:,1] = idxnan[1]+1
-
-            idx = np.where(np.isnan(varz[k]) == 1)
-            varz[k][idx] = spval
-            #varz[k,:] = _remapping_fast.flood(varz[k,:], dry, wet_mask, dxy)
-            varz[k,:] = creep.cslf(varz[k,:],spval,-200.,200.)
-            print(k, varz[k,:].min() , varz[k,:].max())
+    # creeping sea extrapolation of all the levels at once
+    idx = np.where(np.isnan(varz) == 1)
+    varz[idx] = spval
+    varz = pyroms.remapping.creeping_sea(varz, spval=spval, \
+                                         validmin=-200., validmax=200.)
 
     # drop the deepest values down
     idx = np.where(np.isnan(varz) == 1)
     varz[idx] = spval
-    bottom = pyroms.utility.get_bottom(varz[::-1,:,:], mask, spval=spval)
-    bottom = (nlev-1) - bottom
-    for i in range(Lm):
-        for j in range(Mm):
-            if mask[j,i] == 1:
-                varz[int(bottom[j,i]):,j,i] = varz[int(bottom[j,i]),j,i]
+    varz = pyroms.utility.fill_columns(varz, mask, spval=spval, first=False)
 
     return varz
@@ -38,14 +38,8 @@ def get_nc_Grid_HYCOM(grdfile, name='GLBa0.08_NEP'):
         depth_bnds[i] = 0.5 * (depth[i-1] + depth[i])
     depth_bnds[-1] = 5750
 
-    bottom = pyroms.utility.get_bottom(var[::-1,:,:], mask_t[0], spval=var.fill_value)
-    nlev = len(depth)
-    bottom = (nlev-1) - bottom
-    h = np.zeros(mask_t[0,:].shape)
-    for i in range(mask_t[0,:].shape[1]):
-        for j in range(mask_t[0,:].shape[0]):
-            if mask_t[0,j,i] == 1:
-                h[j,i] = depth_bnds[int(bottom[j,i])+1]
+    _, bottom = pyroms.utility.get_column_range(var, mask_t[0], spval=var.fill_value)
+    h = np.where(bottom >= 0, depth_bnds[bottom+1], 0.)
 
 
     geod = pyproj.Geod(ellps='WGS84')
@@ -42,14 +42,8 @@ def get_nc_Grid_HYCOM2(grdfile, name='GLBv0.08_Arctic4'):
         depth_bnds[i] = 0.5 * (depth[i-1] + depth[i])
     depth_bnds[-1] = 5750
 
-    bottom = pyroms.utility.get_bottom(var[::-1,:,:], mask_t[0], spval=var.fill_value)
-    nlev = len(depth)
-    bottom = (nlev-1) - bottom
-    h = np.zeros(mask_t[0,:].shape)
-    for i in range(mask_t[0,:].shape[1]):
-        for j in range(mask_t[0,:].shape[0]):
-            if mask_t[0,j,i] == 1:
-                h[j,i] = depth_bnds[int(bottom[j,i])+1]
+    _, bottom = pyroms.utility.get_column_range(var, mask_t[0], spval=var.fill_value)
+    h = np.where(bottom >= 0, depth_bnds[bottom+1], 0.)
 
     angle = np.zeros((lat.shape[0], lon.shape[0]))
 
@@ -1,5 +1,4 @@
 import numpy as np
-from matplotlib.mlab import psd
 from scipy.signal import get_window 
 
 
@@ -65,6 +64,7 @@ class PCA(object):
         by the function "window". "overlap" gives the length of the overlap between 
         blocks. The PSD of each segment are then averaged.
         """
+        from matplotlib.mlab import psd
         nECs, nt = self.ECs.shape
         if blocks_length == 0:
             blocks_length = nt
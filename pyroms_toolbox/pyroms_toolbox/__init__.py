@@ -9,68 +9,111 @@ NetCDF I/O is based on the NetCDF4-python package.
 '''
 
 
-from .iview import iview
-from .jview import jview
-from .lonview import lonview
-from .latview import latview
-from .sview import sview
-from .zview import zview
-from .isoview import isoview
-from .twoDview import twoDview
-from .transectview import transectview
-from .quiver import quiver
-from . import seawater
-from .N2 import N2
-from .O2_saturation import O2_saturation
-from . import shapiro_filter
-from .rx0 import rx0
-from .rx1 import rx1
-from .rvalue import rvalue
-from .get_coast_line import get_coast_line
-from .get_coast_line_from_mask import get_coast_line_from_mask
-from .get_ijcoast_line import get_ijcoast_line
-from .plot_coast_line import plot_coast_line
-from .plot_coast_line_from_mask import plot_coast_line_from_mask
-from .plot_ijcoast_line import plot_ijcoast_line
-from .lsq_phase_amplitude import lsq_phase_amplitude
-# from .remapping import remapping
-# from .remapping_bound import remapping_bound
-# from .remapping_bound_sig import remapping_bound_sig
-# from .remapping_tensor import remapping_tensor
-from .nc_create_roms_file import nc_create_roms_file
-from .nc_create_roms_bdry_file import nc_create_roms_bdry_file
-# from .average import average
-# from .plot_mask import plot_mask
-# from . import BGrid_GFDL
-from .smooth_1D import smooth_1D
-# from . import BGrid_SODA
-from .get_littoral import get_littoral
-from .get_littoral2 import get_littoral2
-# from ._move_runoff import move_runoff
-# from ._move_river_t import move_river_t
-from .TS_diagram import TS_diagram
-from .date2jday import date2jday
-from .jday2date import jday2date
-from .iso2gregorian import iso2gregorian
-from .gregorian2iso import gregorian2iso
-# from . import BGrid_POP
-from .low_pass_filter import low_pass_filter
-from .PCA import PCA, center, standardize
-from .compute_eke import compute_eke
-from .compute_moc import compute_moc
-#from plot_Robinson_pyngl import plot_Robinson_pyngl
-# from .get_cell_area import get_cell_area
-from .laplacian import laplacian
-from .vorticity import vorticity
-from .strain_norm import strain_norm
-from .strain_norm_old import strain_norm_old
-from .shift_SODA_data import shift_SODA_data
-# from . import Grid_HYCOM
-# from . import CGrid_GLORYS
-from .mld_from_temp import mld_from_temp
-from .mld_from_dens import mld_from_dens
-from .ocean_in import ocean_in
+import sys as _sys
+import types as _types
+import importlib as _importlib
 
+# public name -> submodule defining it (None for the submodules exported
+# as such). They are imported on first access, so that the plotting
+# functions only load matplotlib and cartopy when they are used.
+_lazy = {
+    'iview': 'iview',
+    'jview': 'jview',
+    'lonview': 'lonview',
+    'latview': 'latview',
+    'sview': 'sview',
+    'zview': 'zview',
+    'isoview': 'isoview',
+    'twoDview': 'twoDview',
+    'transectview': 'transectview',
+    'quiver': 'quiver',
+    'seawater': None,
+    'N2': 'N2',
+    'O2_saturation': 'O2_saturation',
+    'shapiro_filter': None,
+    'rx0': 'rx0',
+    'rx1': 'rx1',
+    'rvalue': 'rvalue',
+    'get_coast_line': 'get_coast_line',
+    'get_coast_line_from_mask': 'get_coast_line_from_mask',
+    'get_ijcoast_line': 'get_ijcoast_line',
+    'plot_coast_line': 'plot_coast_line',
+    'plot_coast_line_from_mask': 'plot_coast_line_from_mask',
+    'plot_ijcoast_line': 'plot_ijcoast_line',
+    'lsq_phase_amplitude': 'lsq_phase_amplitude',
+    # 'remapping': 'remapping',
+    # 'remapping_bound': 'remapping_bound',
+    # 'remapping_bound_sig': 'remapping_bound_sig',
+    # 'remapping_tensor': 'remapping_tensor',
+    'nc_create_roms_file': 'nc_create_roms_file',
+    'nc_create_roms_bdry_file': 'nc_create_roms_bdry_file',
+    'BdryWriter': 'bdry_writer',
+    # 'average': 'average',
+    # 'plot_mask': 'plot_mask',
+    # 'BGrid_GFDL': None,
+    'smooth_1D': 'smooth_1D',
+    # 'BGrid_SODA': None,
+    'get_littoral': 'get_littoral',
+    'get_littoral2': 'get_littoral2',
+    # 'move_runoff': '_move_runoff',
+    # 'move_river_t': '_move_river_t',
+    'TS_diagram': 'TS_diagram',
+    'date2jday': 'date2jday',
+    'jday2date': 'jday2date',
+    'iso2gregorian': 'iso2gregorian',
+    'gregorian2iso': 'gregorian2iso',
+    # 'BGrid_POP': None,
+    'low_pass_filter': 'low_pass_filter',
+    'PCA': 'PCA',
+    'center': 'PCA',
+    'standardize': 'PCA',
+    'compute_eke': 'compute_eke',
+    'compute_moc': 'compute_moc',
+    # 'plot_Robinson_pyngl': 'plot_Robinson_pyngl',
+    # 'get_cell_area': 'get_cell_area',
+    'laplacian': 'laplacian',
+    'vorticity': 'vorticity',
+    'strain_norm': 'strain_norm',
+    'strain_norm_old': 'strain_norm_old',
+    'shift_SODA_data': 'shift_SODA_data',
+    # 'Grid_HYCOM': None,
+    # 'CGrid_GLORYS': None,
+    'mld_from_temp': 'mld_from_temp',
+    'mld_from_dens': 'mld_from_dens',
+    'ocean_in': 'ocean_in',
+}
+
+__all__ = list(_lazy)
+
+
+def __getattr__(name):
+    if name not in _lazy:
+        raise AttributeError('module %r has no attribute %r' \
+                             % (__name__, name))
+    if _lazy[name] is None:
+        return _importlib.import_module('.' + name, __name__)
+    module = _importlib.import_module('.' + _lazy[name], __name__)
+    value = getattr(module, name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_lazy))
+
+
+class _LazyModule(_types.ModuleType):
+    # importing a submodule binds it to its name on the package, keep
+    # the function of the same name (pyroms_toolbox.zview is the zview
+    # function, not the zview module)
+    def __setattr__(self, name, value):
+        if isinstance(value, _types.ModuleType) and _lazy.get(name) == name \
+                and value.__name__ == __name__ + '.' + name:
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+_sys.modules[__name__].__class__ = _LazyModule
 
 
 __authors__ = ['Frederic Castruccio (frederic@marine.rutgers.edu)']
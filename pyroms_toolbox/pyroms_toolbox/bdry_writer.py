@@ -0,0 +1,145 @@
+# encoding: utf-8
+
+import os
+import numpy as np
+try:
+  import netCDF4 as netCDF
+except:
+  import netCDF3 as netCDF
+
+from .nc_create_roms_bdry_file import nc_create_roms_bdry_file
+
+
+class _BdryVariable(object):
+    # bdry.variables[name], the records written with an integer index
+    # are buffered, everything else goes to the netCDF variable
+
+    def __init__(self, writer, name):
+        object.__setattr__(self, '_writer', writer)
+        object.__setattr__(self, '_name', name)
+
+    def __getattr__(self, attr):
+        return getattr(self._writer.nc.variables[self._name], attr)
+
+    def __setattr__(self, attr, value):
+        self._writer.nc.variables[self._name].setncattr(attr, value)
+
+    def __getitem__(self, index):
+        self._writer.flush(self._name)
+        return self._writer.nc.variables[self._name][index]
+
+    def __setitem__(self, index, value):
+        self._writer.write(self._name, index, value)
+
+
+class _BdryVariables(object):
+
+    def __init__(self, writer):
+        self._writer = writer
+
+    def __getitem__(self, name):
+        if name not in self._writer.nc.variables:
+            raise KeyError(name)
+        return _BdryVariable(self._writer, name)
+
+    def __contains__(self, name):
+        return name in self._writer.nc.variables
+
+    def keys(self):
+        return self._writer.nc.variables.keys()
+
+
+class BdryWriter(object):
+    """
+    bdry = BdryWriter(filename, grd=None, ocean_time=None, nbuffer=32)
+
+    Boundary file written by several variable producers (zeta, temp,
+    salt, u/v, ...) at once. If grd and ocean_time are given, filename
+    is first created with nc_create_roms_bdry_file, otherwise it must
+    already exist. bdry is used as the netCDF4 Dataset of the file:
+
+      bdry.createVariable(name, datatype, dimensions, fill_value=None)
+      bdry.variables[name].attribute = value
+      bdry.variables[name][nt] = slab
+
+    but the slabs written to a time record nt (integer) are buffered,
+    per variable, and written in bulk, one contiguous block of records
+    at a time, once nbuffer records of a variable are waiting or on
+    bdry.flush() and bdry.close(). The boundary slabs are small, so
+    this replaces many small writes by a few large ones, and the
+    producers do not need a temporary file each to be merged after.
+
+    bdry can be used as a context manager, the file is closed on exit.
+    """
+
+    def __init__(self, filename, grd=None, ocean_time=None, nbuffer=32):
+        if grd is not None and ocean_time is not None:
+            if os.path.exists(filename) is True:
+                os.remove(filename)
+            nc_create_roms_bdry_file(filename, grd, ocean_time)
+        self.filename = filename
+        self.nbuffer = nbuffer
+        self.nc = netCDF.Dataset(filename, 'a', format='NETCDF3_64BIT')
+        self.variables = _BdryVariables(self)
+        self._buffer = {}
+
+    def createVariable(self, varname, datatype, dimensions, fill_value=None):
+        if varname not in self.nc.variables:
+            self.nc.createVariable(varname, datatype, dimensions, \
+                                   fill_value=fill_value)
+        return self.variables[varname]
+
+    def write(self, varname, index, value):
+        """
+        bdry.write(varname, index, value)
+
+        Same as bdry.variables[varname][index] = value.
+        """
+        if isinstance(index, (int, np.integer)) and index >= 0:
+            records = self._buffer.setdefault(varname, {})
+            records[int(index)] = np.ma.array(value, copy=True)
+            if len(records) >= self.nbuffer:
+                self.flush(varname)
+        else:
+            self.flush(varname)
+            self.nc.variables[varname][index] = value
+
+    def flush(self, varname=None):
+        """
+        bdry.flush(varname=None)
+
+        Write the buffered records of varname, or of all the variables.
+        """
+        if varname is None:
+            names = list(self._buffer.keys())
+        else:
+            names = [varname]
+        for name in names:
+            records = self._buffer.pop(name, None)
+            if not records:
+                continue
+            var = self.nc.variables[name]
+            times = sorted(records.keys())
+            # contiguous blocks of records
+            start = 0
+            for n in range(1, len(times) + 1):
+                if n == len(times) or times[n] != times[n-1] + 1:
+                    block = times[start:n]
+                    var[block[0]:block[-1]+1] = \
+                        np.ma.stack([records[t].reshape(var.shape[1:]) \
+                                     for t in block])
+                    start = n
+
+    def sync(self):
+        self.flush()
+        self.nc.sync()
+
+    def close(self):
+        self.flush()
+        self.nc.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -1,5 +1,4 @@
 import numpy as np
-import matplotlib.pyplot as plt
 
 
 def lsq_phase_amplitude(omega,ue,un,t):
@@ -0,0 +1,170 @@
+# encoding: utf-8
+
+import multiprocessing
+import multiprocessing.util
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import pyroms
+
+
+class _RecordVariable(object):
+    # nc.variables[name] of a Record, attributes and data are logged
+
+    def __init__(self, record, name):
+        object.__setattr__(self, '_record', record)
+        object.__setattr__(self, '_name', name)
+
+    def __setattr__(self, attr, value):
+        self._record.ops.append(('attr', self._name, attr, value))
+
+    def __setitem__(self, index, value):
+        self._record.ops.append(('data', self._name, index, \
+                                 np.copy(value, subok=True)))
+
+
+class _RecordVariables(object):
+
+    def __init__(self, record):
+        self._record = record
+
+    def __getitem__(self, name):
+        return _RecordVariable(self._record, name)
+
+
+class Record(object):
+    """
+    rec = Record()
+
+    Stand-in for the destination netCDF4 Dataset of the remapping
+    functions. The variable definitions, attributes and data written
+    to rec with
+
+      rec.createVariable(name, datatype, dimensions, fill_value=None)
+      rec.variables[name].attribute = value
+      rec.variables[name][index] = data
+
+    are logged, so the time records can be computed by worker processes
+    and written to the destination file by a single one.
+
+    rec.replay(nc)
+
+    apply the log to the netCDF4 Dataset nc. Variables already defined
+    in nc are kept with their attributes.
+    """
+
+    def __init__(self):
+        self.ops = []
+        self.variables = _RecordVariables(self)
+
+    def createVariable(self, varname, datatype, dimensions, fill_value=None):
+        self.ops.append(('create', varname, datatype, tuple(dimensions), \
+                         fill_value))
+        return self.variables[varname]
+
+    def replay(self, nc):
+        created = set()
+        for op in self.ops:
+            if op[0] == 'create':
+                name, datatype, dimensions, fill_value = op[1:]
+                if name not in nc.variables:
+                    nc.createVariable(name, datatype, dimensions, \
+                                      fill_value=fill_value)
+                    created.add(name)
+            elif op[0] == 'attr':
+                name, attr, value = op[1:]
+                if name in created:
+                    nc.variables[name].setncattr(attr, value)
+            else:
+                name, index, value = op[1:]
+                nc.variables[name][index] = value
+
+
+# function, arguments and source DatasetPool of the records computed
+# by a worker process, set once per worker by _init_worker
+_worker = None
+
+
+def _init_worker(func, kwargs):
+    global _worker
+    _worker = (func, kwargs, pyroms.io.DatasetPool())
+
+
+def _start_worker(func, kwargs):
+    # initializer of the pool processes, the source files are closed
+    # when the worker exits
+    _init_worker(func, kwargs)
+    pool = _worker[2]
+    multiprocessing.util.Finalize(pool, pool.close, exitpriority=10)
+
+
+def _close_worker():
+    global _worker
+    if _worker is not None:
+        _worker[2].close()
+    _worker = None
+
+
+def _run_record(unit):
+    func, kwargs, pool = _worker
+    rec = Record()
+    func(rec, *unit, pool=pool, **kwargs)
+    return rec
+
+
+def map_records(func, units, kwargs, nprocs=1):
+    """
+    for unit, rec in map_records(func, units, kwargs, nprocs=1):
+        rec.replay(nc)
+
+    Compute the time records func(rec, *unit, pool=pool, **kwargs) of
+    the work units (file, time index, ...) and yield their Record in
+    the order of units. pool is the pyroms.io.DatasetPool func reads
+    the source files from, one per process, so every source file is
+    opened once per process and closed when the records are done.
+
+    With nprocs > 1 the records are computed by a pool of nprocs
+    processes. kwargs (grids, weights files, options) is given once to
+    every worker, which keeps its remap operators and vertical
+    interpolation plans from one record to the next. At most
+    2 * nprocs records are in flight, so the memory stays bounded
+    whatever the number of units. Workers are forked when the platform
+    allows it, otherwise func and kwargs must be picklable. Grids shared
+    with pyroms.grid.share_ROMS_grid are given to the workers as a
+    reference to their memory mapped arrays, not as a copy.
+    """
+
+    units = list(units)
+
+    if nprocs is None or nprocs <= 1:
+        _init_worker(func, kwargs)
+        try:
+            for unit in units:
+                yield unit, _run_record(unit)
+        finally:
+            _close_worker()
+        return
+
+    if 'fork' in multiprocessing.get_all_start_methods():
+        ctx = multiprocessing.get_context('fork')
+    else:
+        ctx = multiprocessing.get_context()
+
+    with ProcessPoolExecutor(max_workers=nprocs, mp_context=ctx, \
+                             initializer=_start_worker, \
+                             initargs=(func, kwargs)) as executor:
+        todo = iter(units)
+        pending = deque()
+        for unit in todo:
+            pending.append((unit, executor.submit(_run_record, unit)))
+            if len(pending) >= 2 * nprocs:
+                break
+        while pending:
+            unit, future = pending.popleft()
+            rec = future.result()
+            for nxt in todo:
+                pending.append((nxt, executor.submit(_run_record, nxt)))
+                break
+            yield unit, rec